@@ -0,0 +1,33 @@
+"""History keyset indexes - (owner, created_at, id) for cursor pagination
+
+Revision ID: 003_history_keyset_indexes
+Revises: 002_google_auth
+Create Date: 2026-10-17 10:00:00
+
+"""
+from alembic import op
+
+revision = "003_history_keyset_indexes"
+down_revision = "002_google_auth"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_trip_requests_user_id_created_at_id", "trip_requests", ["user_id", "created_at", "id"]),
+    ("ix_trip_requests_user_id_status_created_at_id", "trip_requests", ["user_id", "status", "created_at", "id"]),
+    ("ix_trip_offers_driver_id_created_at_id", "trip_offers", ["driver_id", "created_at", "id"]),
+    ("ix_trip_offers_driver_id_status_created_at_id", "trip_offers", ["driver_id", "status", "created_at", "id"]),
+]
+
+
+def upgrade():
+    # Build without blocking writes on large history tables
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _ in INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,34 @@
+"""Driver location bounding-box index for scheduled matching
+
+Revision ID: 004_driver_location_bbox_index
+Revises: 003_history_keyset_indexes
+Create Date: 2026-10-17 11:00:00
+
+"""
+from alembic import op
+
+revision = "004_driver_location_bbox_index"
+down_revision = "003_history_keyset_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_drivers_status_last_known_lat_lon",
+            "drivers",
+            ["status", "last_known_lat", "last_known_lon"],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_drivers_status_last_known_lat_lon",
+            table_name="drivers",
+            postgresql_concurrently=True,
+            if_exists=True
+        )
@@ -0,0 +1,47 @@
+"""Driver availability time ranges - tstzrange + GiST exclusion constraint
+
+Revision ID: 005_availability_time_range
+Revises: 004_driver_location_bbox_index
+Create Date: 2026-10-17 12:00:00
+
+"""
+from alembic import op
+
+revision = "005_availability_time_range"
+down_revision = "004_driver_location_bbox_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Lets the GiST index combine driver_id equality with range overlap
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+
+    op.execute("""
+        ALTER TABLE driver_availability_blocks
+        ADD COLUMN time_range tstzrange
+        GENERATED ALWAYS AS (tstzrange(start_time, end_time, '[)')) STORED
+    """)
+    op.create_check_constraint(
+        "ck_driver_availability_blocks_valid_range",
+        "driver_availability_blocks",
+        "end_time > start_time"
+    )
+
+    # The constraint's GiST index also serves overlap lookups; fails if overlapping blocks already exist
+    op.execute("""
+        ALTER TABLE driver_availability_blocks
+        ADD CONSTRAINT ex_driver_availability_blocks_no_overlap
+        EXCLUDE USING gist (driver_id WITH =, time_range WITH &&)
+    """)
+
+    op.drop_index("ix_driver_availability_blocks_start_time", table_name="driver_availability_blocks")
+    op.drop_index("ix_driver_availability_blocks_end_time", table_name="driver_availability_blocks")
+
+
+def downgrade():
+    op.create_index("ix_driver_availability_blocks_start_time", "driver_availability_blocks", ["start_time"])
+    op.create_index("ix_driver_availability_blocks_end_time", "driver_availability_blocks", ["end_time"])
+    op.drop_constraint("ex_driver_availability_blocks_no_overlap", "driver_availability_blocks")
+    op.drop_constraint("ck_driver_availability_blocks_valid_range", "driver_availability_blocks", type_="check")
+    op.drop_column("driver_availability_blocks", "time_range")
@@ -0,0 +1,50 @@
+"""Trip reminders - one row per (trip request, offset) reminder sent
+
+Revision ID: 006_trip_reminders
+Revises: 005_availability_time_range
+Create Date: 2026-10-17 13:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "006_trip_reminders"
+down_revision = "005_availability_time_range"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "trip_reminders",
+        sa.Column("trip_request_id", sa.Integer(), sa.ForeignKey("trip_requests.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("offset_minutes", sa.Integer(), nullable=False),
+        sa.Column("sent_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.PrimaryKeyConstraint("trip_request_id", "offset_minutes"),
+    )
+
+    # Carry over reminders already sent under the fixed 60/15 minute flags
+    op.execute("""
+        INSERT INTO trip_reminders (trip_request_id, offset_minutes)
+        SELECT id, 60 FROM trip_requests WHERE reminder_60min_sent
+        UNION ALL
+        SELECT id, 15 FROM trip_requests WHERE reminder_15min_sent
+    """)
+
+    op.drop_column("trip_requests", "reminder_60min_sent")
+    op.drop_column("trip_requests", "reminder_15min_sent")
+
+
+def downgrade():
+    op.add_column("trip_requests", sa.Column("reminder_60min_sent", sa.Boolean(), nullable=True))
+    op.add_column("trip_requests", sa.Column("reminder_15min_sent", sa.Boolean(), nullable=True))
+    op.execute("""
+        UPDATE trip_requests SET
+            reminder_60min_sent = EXISTS (
+                SELECT 1 FROM trip_reminders r WHERE r.trip_request_id = trip_requests.id AND r.offset_minutes = 60
+            ),
+            reminder_15min_sent = EXISTS (
+                SELECT 1 FROM trip_reminders r WHERE r.trip_request_id = trip_requests.id AND r.offset_minutes = 15
+            )
+    """)
+    op.drop_table("trip_reminders")
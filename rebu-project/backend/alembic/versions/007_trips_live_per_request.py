@@ -0,0 +1,33 @@
+"""Trips per request - unique only among live trips so a request can be rematched
+
+Revision ID: 007_trips_live_per_request
+Revises: 006_trip_reminders
+Create Date: 2026-10-17 14:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "007_trips_live_per_request"
+down_revision = "006_trip_reminders"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_trips_trip_request_id_live",
+        "trips",
+        ["trip_request_id"],
+        unique=True,
+        postgresql_where=sa.text("status <> 'CANCELLED'")
+    )
+    op.drop_index("ix_trips_trip_request_id", table_name="trips")
+    op.create_index("ix_trips_trip_request_id", "trips", ["trip_request_id"])
+
+
+def downgrade():
+    # Fails if a request already has a cancelled trip plus a replacement
+    op.drop_index("ix_trips_trip_request_id", table_name="trips")
+    op.create_index("ix_trips_trip_request_id", "trips", ["trip_request_id"], unique=True)
+    op.drop_index("ix_trips_trip_request_id_live", table_name="trips")
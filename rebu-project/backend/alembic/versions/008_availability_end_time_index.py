@@ -0,0 +1,35 @@
+"""Availability end_time index - backs the batched cleanup of past blocks
+
+Revision ID: 008_availability_end_time_index
+Revises: 007_trips_live_per_request
+Create Date: 2026-10-17 15:00:00
+
+"""
+from alembic import op
+
+revision = "008_availability_end_time_index"
+down_revision = "007_trips_live_per_request"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The cleanup deletes oldest-first by end_time; build without blocking bookings
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_driver_availability_blocks_end_time",
+            "driver_availability_blocks",
+            ["end_time"],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_driver_availability_blocks_end_time",
+            table_name="driver_availability_blocks",
+            postgresql_concurrently=True,
+            if_exists=True
+        )
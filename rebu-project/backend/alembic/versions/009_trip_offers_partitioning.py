@@ -0,0 +1,125 @@
+"""Trip offers partitioning - monthly RANGE (created_at) partitions
+
+Revision ID: 009_trip_offers_partitioning
+Revises: 008_availability_end_time_index
+Create Date: 2026-10-17 16:00:00
+
+Rewrites trip_offers under an exclusive lock: run it in a maintenance window.
+Old months are then dropped (or archived) by the trip_offer_partition_job.
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "009_trip_offers_partitioning"
+down_revision = "008_availability_end_time_index"
+branch_labels = None
+depends_on = None
+
+PARTITIONS_AHEAD = 2
+
+COLUMNS = (
+    "id, trip_request_id, driver_id, offered_fare, estimated_arrival_minutes, "
+    "status, created_at, expires_at, responded_at"
+)
+
+OLD_INDEXES = [
+    "ix_trip_offers_trip_request_id",
+    "ix_trip_offers_driver_id",
+    "ix_trip_offers_status",
+    "ix_trip_offers_driver_id_created_at_id",
+    "ix_trip_offers_driver_id_status_created_at_id",
+]
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def upgrade():
+    conn = op.get_bind()
+
+    op.execute("ALTER TABLE trip_offers RENAME TO trip_offers_unpartitioned")
+    op.execute("ALTER TABLE trip_offers_unpartitioned RENAME CONSTRAINT trip_offers_pkey TO trip_offers_unpartitioned_pkey")
+    for name in OLD_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+
+    # The partition key must be part of the primary key
+    op.execute("""
+        CREATE TABLE trip_offers (
+            id integer NOT NULL DEFAULT nextval('trip_offers_id_seq'::regclass),
+            trip_request_id integer NOT NULL REFERENCES trip_requests (id),
+            driver_id integer NOT NULL REFERENCES drivers (id),
+            offered_fare double precision NOT NULL,
+            estimated_arrival_minutes integer,
+            status offerstatus,
+            created_at timestamptz NOT NULL DEFAULT now(),
+            expires_at timestamptz NOT NULL,
+            responded_at timestamptz,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute("ALTER SEQUENCE trip_offers_id_seq OWNED BY trip_offers.id")
+
+    # id is covered by the primary key and driver_id by the keyset indexes;
+    # status, created_at and expires_at alone are never searched on
+    op.create_index("ix_trip_offers_trip_request_id", "trip_offers", ["trip_request_id"])
+    op.create_index("ix_trip_offers_driver_id_created_at_id", "trip_offers", ["driver_id", "created_at", "id"])
+    op.create_index(
+        "ix_trip_offers_driver_id_status_created_at_id", "trip_offers", ["driver_id", "status", "created_at", "id"]
+    )
+
+    oldest = conn.scalar(sa.text(
+        "SELECT date_trunc('month', coalesce(min(created_at), now()))::date FROM trip_offers_unpartitioned"
+    ))
+    current = conn.scalar(sa.text("SELECT date_trunc('month', now())::date"))
+    month = oldest
+    while month <= _add_months(current, PARTITIONS_AHEAD):
+        next_month = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE trip_offers_p{month:%Y_%m} PARTITION OF trip_offers "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')"
+        )
+        month = next_month
+
+    op.execute(f"""
+        INSERT INTO trip_offers ({COLUMNS})
+        SELECT id, trip_request_id, driver_id, offered_fare, estimated_arrival_minutes,
+               status, coalesce(created_at, now()), expires_at, responded_at
+        FROM trip_offers_unpartitioned
+    """)
+    op.execute("DROP TABLE trip_offers_unpartitioned")
+
+
+def downgrade():
+    op.execute("ALTER TABLE trip_offers RENAME TO trip_offers_partitioned")
+    op.execute("ALTER TABLE trip_offers_partitioned RENAME CONSTRAINT trip_offers_pkey TO trip_offers_partitioned_pkey")
+    for name in OLD_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+
+    op.execute("""
+        CREATE TABLE trip_offers (
+            id integer NOT NULL DEFAULT nextval('trip_offers_id_seq'::regclass) PRIMARY KEY,
+            trip_request_id integer NOT NULL REFERENCES trip_requests (id),
+            driver_id integer NOT NULL REFERENCES drivers (id),
+            offered_fare double precision NOT NULL,
+            estimated_arrival_minutes integer,
+            status offerstatus,
+            created_at timestamptz DEFAULT now(),
+            expires_at timestamptz NOT NULL,
+            responded_at timestamptz
+        )
+    """)
+    op.execute(f"INSERT INTO trip_offers ({COLUMNS}) SELECT {COLUMNS} FROM trip_offers_partitioned")
+    op.execute("ALTER SEQUENCE trip_offers_id_seq OWNED BY trip_offers.id")
+    op.execute("DROP TABLE trip_offers_partitioned")
+
+    op.create_index("ix_trip_offers_trip_request_id", "trip_offers", ["trip_request_id"])
+    op.create_index("ix_trip_offers_driver_id", "trip_offers", ["driver_id"])
+    op.create_index("ix_trip_offers_status", "trip_offers", ["status"])
+    op.create_index("ix_trip_offers_driver_id_created_at_id", "trip_offers", ["driver_id", "created_at", "id"])
+    op.create_index(
+        "ix_trip_offers_driver_id_status_created_at_id", "trip_offers", ["driver_id", "status", "created_at", "id"]
+    )
@@ -0,0 +1,43 @@
+"""Wallet numeric amounts - exact cents for the ledger and balances
+
+Revision ID: 010_wallet_numeric
+Revises: 009_trip_offers_partitioning
+Create Date: 2026-10-17 17:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "010_wallet_numeric"
+down_revision = "009_trip_offers_partitioning"
+branch_labels = None
+depends_on = None
+
+COLUMNS = [
+    ("drivers", "wallet_balance"),
+    ("wallet_transactions", "amount"),
+    ("wallet_transactions", "balance_after"),
+    ("trips", "commission_amount"),
+]
+
+
+def upgrade():
+    for table, name in COLUMNS:
+        op.alter_column(
+            table,
+            name,
+            type_=sa.Numeric(12, 2),
+            existing_type=sa.Float(),
+            postgresql_using=f"round({name}::numeric, 2)"
+        )
+
+
+def downgrade():
+    for table, name in COLUMNS:
+        op.alter_column(
+            table,
+            name,
+            type_=sa.Float(),
+            existing_type=sa.Numeric(12, 2),
+            postgresql_using=f"{name}::double precision"
+        )
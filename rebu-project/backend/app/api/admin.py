@@ -4,8 +4,8 @@ Additional API Routers - Users, Drivers, Admin
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
-from app.core.security import require_user, require_driver, require_admin
+from app.core.database import get_db, get_read_db
+from app.core.security import require_user, require_driver, require_admin, invalidate_principal
 
 # ========== USERS ROUTER ==========
 users = APIRouter()
@@ -100,7 +100,7 @@ admin = APIRouter()
 @admin.get("/dashboard")
 async def get_dashboard_stats(
     current_user = Depends(require_admin),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get admin dashboard statistics"""
     from app.models import User, Driver, Trip, TripStatus
@@ -139,6 +139,7 @@ async def approve_driver(
     driver.status = DriverStatus.ACTIVE
     driver.is_verified = True
     db.commit()
+    invalidate_principal("DRIVER", driver_id)
     
     return {"message": f"Driver {driver_id} approved"}
 
@@ -177,4 +178,4 @@ async def register_driver_payment(
 __all__ = ['users', 'drivers', 'admin']
 
 # Create router alias for imports
-router = users  # For users.py
+router = admin  # For admin.py
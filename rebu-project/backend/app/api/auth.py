@@ -7,8 +7,9 @@ from datetime import datetime
 
 from app.core.database import get_db
 from app.core.security import (
-    get_password_hash, verify_password,
-    create_access_token, create_refresh_token,decode_token
+    get_password_hash_async, verify_password_async,
+    create_access_token, create_refresh_token,decode_token,
+    invalidate_principal
 )
 from app.schemas.auth import (
     UserRegister, DriverRegister, LoginRequest,
@@ -48,7 +49,7 @@ async def register_user(
         )
     
     # Create user
-    password_hash = get_password_hash(data.password)
+    password_hash = await get_password_hash_async(data.password)
     user = user_repo.create(
         email=data.email,
         phone=data.phone,
@@ -82,7 +83,7 @@ async def register_driver(
         )
     
     # Create driver
-    password_hash = get_password_hash(data.password)
+    password_hash = await get_password_hash_async(data.password)
     license_expiry = datetime.fromisoformat(data.license_expiry_date)
     
     driver = driver_repo.create(
@@ -115,7 +116,7 @@ async def login(
     
     # Try user first
     user = user_repo.get_by_email(data.email)
-    if user and verify_password(data.password, user.password_hash):
+    if user and await verify_password_async(data.password, user.password_hash):
         access_token = create_access_token({"sub": str(user.id), "role": "USER"})
         refresh_token = create_refresh_token({"sub": str(user.id), "role": "USER"})
         
@@ -129,7 +130,7 @@ async def login(
     
     # Try driver
     driver = driver_repo.get_by_email(data.email)
-    if driver and verify_password(data.password, driver.password_hash):
+    if driver and await verify_password_async(data.password, driver.password_hash):
         access_token = create_access_token({"sub":str(driver.id), "role": "DRIVER"})
         refresh_token = create_refresh_token({"sub": str(driver.id), "role": "DRIVER"})
         
@@ -189,6 +190,7 @@ async def update_fcm_token(
     entity = current_user["entity"]
     entity.fcm_token = data.fcm_token
     db.commit()
+    invalidate_principal(current_user["role"], current_user["id"])
     
     return {"message": "FCM token updated"}
 
@@ -4,8 +4,9 @@ Additional API Routers - Users, Drivers, Admin
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
-from app.core.security import require_user, require_driver, require_admin
+from app.core.database import get_db, get_read_db
+from app.core.security import require_user, require_driver, require_admin, require_driver_principal
+from app.schemas.driver_location import LocationBatchRequest
 
 # ========== USERS ROUTER ==========
 users = APIRouter()
@@ -49,33 +50,47 @@ async def get_current_driver_profile(
 async def update_driver_location(
     lat: float,
     lon: float,
-    current_user = Depends(require_driver),
+    current_user = Depends(require_driver_principal),
     db: Session = Depends(get_db)
 ):
-    """Update driver's current location"""
-    from app.core.redis_client import redis_client
-    from datetime import datetime
+    """
+    Update driver's current location
+    Redis is updated right away; the DB copy is flushed in the background
+    """
+    from app.services.location_service import LocationService
     
-    driver_id = current_user["id"]
-    driver = current_user["entity"]
+    location_service = LocationService(db)
+    await location_service.record_location(current_user["id"], current_user["status"], lat, lon)
     
-    # Update in Redis for real-time queries
-    redis_client.add_driver_location(driver_id, lat, lon)
-    redis_client.set_driver_status(driver_id, driver.status.value)
+    return {"message": "Location updated"}
+
+
+@drivers.post("/location/batch")
+async def update_driver_location_batch(
+    data: LocationBatchRequest,
+    current_user = Depends(require_driver_principal),
+    db: Session = Depends(get_db)
+):
+    """
+    Replay GPS points buffered by the driver app (e.g. after reconnecting)
+    The newest point becomes the live location; all points extend the trip trail
+    """
+    from app.services.location_service import LocationService
     
-    # Update in DB (backup)
-    driver.last_known_lat = lat
-    driver.last_known_lon = lon
-    driver.last_location_update = datetime.utcnow()
-    db.commit()
+    location_service = LocationService(db)
+    await location_service.record_location_batch(
+        current_user["id"],
+        current_user["status"],
+        [(p.lat, p.lon, p.recorded_at) for p in data.points]
+    )
     
-    return {"message": "Location updated"}
+    return {"message": "Locations updated", "accepted": len(data.points)}
 
 
 @drivers.get("/wallet")
 async def get_wallet_info(
     current_user = Depends(require_driver),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get driver wallet balance and transactions"""
     from app.services.wallet_service import WalletService
@@ -177,4 +192,4 @@ async def register_driver_payment(
 __all__ = ['users', 'drivers', 'admin']
 
 # Create router alias for imports
-router = users  # For users.py
+router = drivers  # For drivers.py
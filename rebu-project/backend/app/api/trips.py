@@ -5,8 +5,10 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import Optional
 
-from app.core.database import get_db
-from app.core.security import require_user, require_driver, get_current_user
+from app.core.database import get_db, get_async_db, get_async_read_db
+from app.core.redis_client import async_redis_client
+from app.core.pagination import clamp_limit, decode_cursor, build_page
+from app.core.security import require_user_principal, require_driver_principal, get_current_principal
 from app.schemas.trip_request import (
     CreateOnDemandTripRequest,
     CreateScheduledTripRequest,
@@ -14,23 +16,37 @@ from app.schemas.trip_request import (
 )
 from app.services.trip_service import TripService
 from app.services.matching_service import MatchingService
+from app.services.matching_queue import matching_queue, MatchingQueueFull
+from app.services.notification_service import NotificationService, get_notification_service
+from app.repositories.async_repositories import (
+    AsyncTripRequestRepository, AsyncTripOfferRepository, AsyncTripRepository
+)
 
 
 router = APIRouter()
 
 
+def _matching_unavailable(detail: str) -> HTTPException:
+    """503 telling the client to retry once matching has room again"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=detail,
+        headers={"Retry-After": "5"}
+    )
+
+
 @router.post("/request/on-demand", response_model=TripRequestResponse)
 async def create_on_demand_trip(
     request: CreateOnDemandTripRequest,
-    current_user = Depends(require_user),
-    db: Session = Depends(get_db)
+    current_user = Depends(require_user_principal),
+    db: Session = Depends(get_db),
+    notification_service: NotificationService = Depends(get_notification_service)
 ):
     """
     Create an ON_DEMAND trip request
-    Immediately starts searching for nearby drivers
+    Matching runs on the worker pool; answers 503 while its backlog is full or unreachable
     """
-    trip_service = TripService(db)
-    matching_service = MatchingService(db)
+    trip_service = TripService(db, notification_service)
     
     # Create trip request
     trip_request = trip_service.create_on_demand_trip(
@@ -42,11 +58,18 @@ async def create_on_demand_trip(
         cargo_weight_kg=request.cargo_weight_kg
     )
     
-    # Start matching process (Wave 1)
-    drivers = await matching_service.find_drivers_for_on_demand_trip(trip_request, wave_number=1)
-    
-    if drivers:
-        await matching_service.send_offers_to_drivers(trip_request, drivers)
+    # Start matching process (Wave 1); the worker queues the later waves
+    try:
+        await matching_queue.enqueue(trip_request.id, wave_number=1)
+    except MatchingQueueFull:
+        # The request will not be matched: cancel it rather than leave it unserved
+        trip_service.cancel_pending_request(trip_request)
+        raise _matching_unavailable("Matching is at capacity, please retry shortly")
+    except Exception as e:
+        # Redis is down: inline matching would need it too (claims, pending offers, waves)
+        print(f"❌ Matching queue unavailable for trip request {trip_request.id}: {e!r}")
+        trip_service.cancel_pending_request(trip_request)
+        raise _matching_unavailable("Matching is unavailable, please retry shortly")
     
     return trip_request
 
@@ -54,7 +77,7 @@ async def create_on_demand_trip(
 @router.post("/request/scheduled", response_model=TripRequestResponse)
 async def create_scheduled_trip(
     request: CreateScheduledTripRequest,
-    current_user = Depends(require_user),
+    current_user = Depends(require_user_principal),
     db: Session = Depends(get_db)
 ):
     """
@@ -80,13 +103,11 @@ async def create_scheduled_trip(
 @router.get("/request/{trip_request_id}", response_model=TripRequestResponse)
 async def get_trip_request(
     trip_request_id: int,
-    current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user = Depends(get_current_principal),
+    db = Depends(get_async_read_db)
 ):
     """Get trip request details"""
-    trip_service = TripService(db)
-    
-    trip_request = trip_service.get_trip_request(trip_request_id)
+    trip_request = await AsyncTripRequestRepository(db).get_by_id(trip_request_id)
     
     if not trip_request:
         raise HTTPException(status_code=404, detail="Trip request not found")
@@ -100,10 +121,9 @@ async def get_trip_request(
     
     if role == "DRIVER":
         # Driver can view if they have an offer or are pre-assigned
-        from app.repositories.trip_offer_repository import TripOfferRepository
-        offer_repo = TripOfferRepository(db)
-        
-        has_offer = offer_repo.has_offer_for_driver(trip_request_id, user_id)
+        has_offer = await AsyncTripOfferRepository(db).has_offer_for_driver(
+            trip_request_id, user_id, since=trip_request.created_at
+        )
         is_pre_assigned = trip_request.pre_assigned_driver_id == user_id
         
         if not has_offer and not is_pre_assigned:
@@ -115,15 +135,16 @@ async def get_trip_request(
 @router.post("/offer/{offer_id}/accept")
 async def accept_offer(
     offer_id: int,
-    current_user = Depends(require_driver),
-    db: Session = Depends(get_db)
+    current_user = Depends(require_driver_principal),
+    db: Session = Depends(get_db),
+    notification_service: NotificationService = Depends(get_notification_service)
 ):
     """
     Driver accepts a trip offer
     Uses distributed lock to prevent double acceptance
     """
-    matching_service = MatchingService(db)
-    trip_service = TripService(db)
+    matching_service = MatchingService(db, notification_service)
+    trip_service = TripService(db, notification_service)
     
     driver_id = current_user["id"]
     
@@ -136,11 +157,16 @@ async def accept_offer(
             detail="Offer not available (expired or already accepted by another driver)"
         )
     
-    # Create trip
-    trip = trip_service.create_trip_from_request(
-        trip_request_id=offer.trip_request_id,
-        driver_id=driver_id
-    )
+    # Create trip (or return it, when this is a retry of a completed accept)
+    try:
+        trip = trip_service.create_trip_from_request(
+            trip_request_id=offer.trip_request_id,
+            driver_id=driver_id
+        )
+    except ValueError as e:
+        # A no-op unless this driver still holds the claim (the match was undone)
+        await async_redis_client.release_trip_claim(offer.trip_request_id, driver_id)
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     
     return {
         "message": "Offer accepted successfully",
@@ -152,16 +178,14 @@ async def accept_offer(
 @router.post("/offer/{offer_id}/reject")
 async def reject_offer(
     offer_id: int,
-    current_user = Depends(require_driver),
-    db: Session = Depends(get_db)
+    current_user = Depends(require_driver_principal),
+    db = Depends(get_async_db)
 ):
     """Driver rejects a trip offer"""
-    from app.repositories.trip_offer_repository import TripOfferRepository
-    
-    offer_repo = TripOfferRepository(db)
+    offer_repo = AsyncTripOfferRepository(db)
     driver_id = current_user["id"]
     
-    offer = offer_repo.get_by_id(offer_id)
+    offer = await offer_repo.get_by_id(offer_id)
     
     if not offer or offer.driver_id != driver_id:
         raise HTTPException(status_code=404, detail="Offer not found")
@@ -169,7 +193,7 @@ async def reject_offer(
     if offer.is_expired:
         raise HTTPException(status_code=400, detail="Offer already expired")
     
-    offer_repo.update_status(offer_id, "REJECTED")
+    await offer_repo.update_status(offer_id, "REJECTED")
     
     return {"message": "Offer rejected"}
 
@@ -177,45 +201,58 @@ async def reject_offer(
 @router.get("/my-requests")
 async def get_my_trip_requests(
     status: Optional[str] = None,
-    current_user = Depends(require_user),
-    db: Session = Depends(get_db)
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    current_user = Depends(require_user_principal),
+    db = Depends(get_async_read_db)
 ):
-    """Get user's trip requests"""
-    from app.repositories.trip_request_repository import TripRequestRepository
-    
-    trip_request_repo = TripRequestRepository(db)
+    """
+    Get user's trip requests, newest first
+    Pass the returned next_cursor to fetch the following page
+    """
+    trip_request_repo = AsyncTripRequestRepository(db)
     user_id = current_user["id"]
+    limit = clamp_limit(limit)
     
-    trip_requests = trip_request_repo.get_by_user_id(user_id, status=status)
+    trip_requests = await trip_request_repo.get_by_user_id(
+        user_id, status=status, limit=limit + 1, before=decode_cursor(cursor)
+    )
     
-    return {"total": len(trip_requests), "items": trip_requests}
+    return build_page(trip_requests, limit)
 
 
 @router.get("/my-offers")
 async def get_my_offers(
     status: Optional[str] = None,
-    current_user = Depends(require_driver),
-    db: Session = Depends(get_db)
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    current_user = Depends(require_driver_principal),
+    db = Depends(get_async_read_db)
 ):
-    """Get driver's trip offers"""
-    from app.repositories.trip_offer_repository import TripOfferRepository
-    
-    offer_repo = TripOfferRepository(db)
+    """
+    Get driver's trip offers, newest first
+    Pass the returned next_cursor to fetch the following page
+    """
+    offer_repo = AsyncTripOfferRepository(db)
     driver_id = current_user["id"]
+    limit = clamp_limit(limit)
     
-    offers = offer_repo.get_by_driver_id(driver_id, status=status)
+    offers = await offer_repo.get_by_driver_id(
+        driver_id, status=status, limit=limit + 1, before=decode_cursor(cursor)
+    )
     
-    return {"total": len(offers), "items": offers}
+    return build_page(offers, limit)
 
 
 @router.post("/{trip_id}/start")
 async def start_trip(
     trip_id: int,
-    current_user = Depends(require_driver),
-    db: Session = Depends(get_db)
+    current_user = Depends(require_driver_principal),
+    db: Session = Depends(get_db),
+    notification_service: NotificationService = Depends(get_notification_service)
 ):
     """Driver starts trip (picked up cargo)"""
-    trip_service = TripService(db)
+    trip_service = TripService(db, notification_service)
     driver_id = current_user["id"]
     
     trip = trip_service.start_trip(trip_id, driver_id)
@@ -227,14 +264,15 @@ async def start_trip(
 async def complete_trip(
     trip_id: int,
     final_fare: float,
-    current_user = Depends(require_driver),
-    db: Session = Depends(get_db)
+    current_user = Depends(require_driver_principal),
+    db: Session = Depends(get_db),
+    notification_service: NotificationService = Depends(get_notification_service)
 ):
     """
     Driver completes trip
     Automatically charges commission to driver's wallet
     """
-    trip_service = TripService(db)
+    trip_service = TripService(db, notification_service)
     driver_id = current_user["id"]
     
     trip = trip_service.complete_trip(trip_id, driver_id, final_fare)
@@ -249,13 +287,11 @@ async def complete_trip(
 @router.get("/{trip_id}")
 async def get_trip(
     trip_id: int,
-    current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user = Depends(get_current_principal),
+    db = Depends(get_async_read_db)
 ):
     """Get trip details"""
-    trip_service = TripService(db)
-    
-    trip = trip_service.get_trip(trip_id)
+    trip = await AsyncTripRepository(db).get_by_id(trip_id)
     
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
@@ -1,11 +1,12 @@
 """
 Additional API Routers - Users, Drivers, Admin
 """
+from typing import Optional
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
-from app.core.security import require_user, require_driver, require_admin
+from app.core.security import require_user, require_driver, require_admin, require_user_principal
 
 # ========== USERS ROUTER ==========
 users = APIRouter()
@@ -21,16 +22,21 @@ async def get_current_user_profile(
 
 @users.get("/trips")
 async def get_user_trips(
-    current_user = Depends(require_user),
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    current_user = Depends(require_user_principal),
     db: Session = Depends(get_db)
 ):
-    """Get user's trip history"""
+    """Get user's trip history, newest first (cursor-paginated)"""
     from app.repositories import TripRequestRepository
+    from app.core.pagination import clamp_limit, decode_cursor, build_page
     
     trip_request_repo = TripRequestRepository(db)
-    trips = trip_request_repo.get_by_user_id(current_user["id"])
+    limit = clamp_limit(limit)
+    trips = trip_request_repo.get_by_user_id(current_user["id"], limit=limit + 1, before=decode_cursor(cursor))
+    page = build_page(trips, limit)
     
-    return {"trips": trips}
+    return {"trips": page["items"], "next_cursor": page["next_cursor"]}
 
 
 # ========== DRIVERS ROUTER ==========
@@ -19,6 +19,14 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 1 day
     REFRESH_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 15
+    PRINCIPAL_CACHE_MAX_SIZE: int = 10000
+
+    # Password hashing (argon2); hashes run on a bounded thread pool off the event loop
+    PASSWORD_HASH_MAX_WORKERS: int = 4
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST_KIB: int = 65536
+    ARGON2_PARALLELISM: int = 4
     
    # Database
     DATABASE_URL: Optional[str] = None  # <- para Neon/Render
@@ -38,6 +46,27 @@ class Settings(BaseSettings):
             f"@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
         )
     
+    # Async engine (asyncpg) for the async repositories; off = sync sessions in the threadpool
+    DATABASE_ASYNC_ENABLED: bool = False
+    
+    # Read replicas for read-only endpoints (round-robin); empty = read from the primary
+    DATABASE_REPLICA_URLS: list[str] = []
+    # After a principal writes, its reads stay on the primary for this long (0 = off)
+    READ_YOUR_WRITES_SECONDS: int = 5
+    
+    @property
+    def async_db_url(self) -> str:
+        return self.to_async_url(self.db_url)
+    
+    @staticmethod
+    def to_async_url(url: str) -> str:
+        for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+            if url.startswith(prefix):
+                url = "postgresql+asyncpg://" + url[len(prefix):]
+                break
+        # asyncpg takes ssl=..., not libpq's sslmode=...
+        return url.replace("sslmode=", "ssl=")
+    
     # Redis
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
@@ -54,19 +83,78 @@ class Settings(BaseSettings):
     FIREBASE_CREDENTIALS_PATH: Optional[str] = None
     FCM_SERVER_KEY: Optional[str] = None
     
+    # Notification outbox
+    NOTIFICATION_TRANSPORT: str = "fcm"  # fcm | stub (local load testing)
+    NOTIFICATION_QUEUE_MAX_SIZE: int = 10000
+    NOTIFICATION_WORKERS: int = 4
+    NOTIFICATION_BATCH_SIZE: int = 500  # FCM send_each limit
+    NOTIFICATION_MAX_RETRIES: int = 3
+    NOTIFICATION_RETRY_BASE_SECONDS: float = 1.0
+    NOTIFICATION_STUB_LATENCY_MS: int = 50
+    NOTIFICATION_STUB_FAILURE_RATE: float = 0.0
+    
     # Matching Configuration
     MATCHING_RADIUS_KM: float = 10.0  # Initial search radius
     MATCHING_WAVE_1_RADIUS_KM: float = 3.0
     MATCHING_WAVE_2_RADIUS_KM: float = 5.0
     MATCHING_WAVE_3_RADIUS_KM: float = 10.0
     MATCHING_WAVE_DELAY_SECONDS: int = 30  # Delay between waves
+    MATCHING_WAVE_COUNT: int = 3  # Last wave to run; unmatched requests then wait for expiry
+    MATCHING_WAVE_POLL_SECONDS: float = 1.0  # How often the scheduler checks Redis for due waves
+    MATCHING_WAVE_BATCH_SIZE: int = 100
+    
+    # Matching worker pool fed from a Redis stream
+    MATCHING_WORKERS: int = 4  # Consumers per process; 0 leaves matching to a dedicated worker process
+    MATCHING_QUEUE_MAX_LENGTH: int = 10000  # Trip creation answers 503 beyond this backlog
+    MATCHING_QUEUE_BLOCK_MS: int = 1000
+    MATCHING_QUEUE_CLAIM_IDLE_SECONDS: int = 60  # Retake jobs of consumers that died mid-job
+    
+    # In-process driver geo index (Redis drivers:online stays the source of truth).
+    # Pings update the grid of the process that receives them; every process also
+    # resyncs from Redis each DRIVER_GEO_INDEX_REBUILD_SECONDS, background workers or not.
+    # In the docker-compose split the worker service never receives pings, so its
+    # grid can be up to DRIVER_GEO_INDEX_REBUILD_SECONDS stale.
+    DRIVER_GEO_INDEX_ENABLED: bool = False
+    DRIVER_GEO_INDEX_CELL_KM: float = 1.0
+    DRIVER_GEO_INDEX_REBUILD_SECONDS: int = 30
+    
+    # Driver location write-behind (Redis live store, periodic bulk DB flush)
+    DRIVER_LOCATION_FLUSH_INTERVAL_SECONDS: int = 10
+    DRIVER_LOCATION_FLUSH_BATCH_SIZE: int = 500
+    DRIVER_LOCATION_BUFFER_MAX_SIZE: int = 100000
+    DRIVER_TRAIL_MAX_POINTS: int = 5000  # GPS trail kept per driver for trip distance
+    DRIVER_TRAIL_TTL_SECONDS: int = 60 * 60 * 6
+    DRIVER_ONLINE_WINDOW_SECONDS: int = 300  # A location ping this recent counts as online
+    DRIVER_OFFLINE_SWEEP_SECONDS: int = 60  # How often quiet drivers are dropped from drivers:online
     
     OFFER_EXPIRY_SECONDS: int = 60  # Driver has 60s to accept
+    OFFER_CLAIM_TTL_SECONDS: int = 300  # Winner's claim on a trip request; same-driver retries reuse it
+    TRIP_OFFER_LOOKUP_HOURS: int = 24  # Accept/reject look offers up by id this far back only
+    TRIP_OFFER_PARTITIONS_AHEAD: int = 2  # Monthly trip_offers partitions kept created in advance
+    TRIP_OFFER_RETENTION_MONTHS: int = 6  # Older monthly partitions are dropped
+    TRIP_OFFER_ARCHIVE_PARTITIONS: bool = False  # Detach old partitions as archived_* tables instead
     TRIP_REQUEST_EXPIRY_MINUTES: int = 15  # On-demand expires in 15 min
+    TRIP_EXPIRY_POLL_SECONDS: float = 1.0  # How often due expiry timers are checked in Redis
+    TRIP_EXPIRY_BATCH_SIZE: int = 500
+    TRIP_EXPIRY_RETRY_SECONDS: float = 5.0  # Timers popped but not expired (row locked, clock skew) fire again after this
+    TRIP_EXPIRY_SWEEP_MINUTES: int = 15  # Fallback DB sweep for timers lost in Redis
     
     # Scheduled Trips
-    SCHEDULED_REMINDER_MINUTES: list[int] = [60, 15]  # T-60min and T-15min
+    SCHEDULED_REMINDER_MINUTES: list[int] = [60, 15]  # T-60min and T-15min; any offsets work
+    SCHEDULED_REMINDER_INTERVAL_SECONDS: int = 60
+    SCHEDULED_REMINDER_GRACE_MINUTES: int = 10  # Late reminders (e.g. after downtime) are skipped past this
+    SCHEDULED_REMINDER_BATCH_SIZE: int = 500
     SCHEDULED_CONFIRM_WINDOW_MINUTES: int = 30  # Confirm 30min before
+    SCHEDULED_REMATCH_RADIUS_KM: float = 50.0
+    SCHEDULED_REMATCH_OFFER_COUNT: int = 10  # Replacement drivers offered an auto-rematched trip
+    SCHEDULED_REMATCH_ROUND_SECONDS: int = 60  # Time between rounds of replacement offers
+    SCHEDULED_REMATCH_CUTOFF_MINUTES: int = 10  # Unmatched rematches are cancelled this long before the start
+    
+    # Past availability block cleanup
+    AVAILABILITY_RETENTION_HOURS: int = 24
+    AVAILABILITY_CLEANUP_BATCH_SIZE: int = 1000  # Rows per DELETE transaction
+    AVAILABILITY_CLEANUP_PAUSE_SECONDS: float = 0.2  # Between batches, to spread WAL and lock load
+    AVAILABILITY_CLEANUP_MAX_BATCHES: int = 500  # Per run; the rest waits for the next run
     
     # Commission Rates by Subscription
     COMMISSION_FREE: float = 0.15  # 15%
@@ -78,11 +166,17 @@ class Settings(BaseSettings):
     WALLET_CREDIT_LIMIT_PRO: float = 1000.0
     WALLET_CREDIT_LIMIT_PREMIUM: float = 2000.0
     
+    # History pagination
+    PAGINATION_DEFAULT_LIMIT: int = 50
+    PAGINATION_MAX_LIMIT: int = 200
+    
     # CORS
     BACKEND_CORS_ORIGINS: list[str] = ["http://localhost:3000", "http://localhost:8080"]
     
     # Workers
     ENABLE_BACKGROUND_WORKERS: bool = True
+    WORKER_LEADER_LEASE_SECONDS: int = 15  # Cluster jobs run only in the process holding this Redis lease
+    WORKER_LEADER_RENEW_SECONDS: int = 5
 
     # Google Client ID
     GOOGLE_CLIENT_ID: Optional[str] = None
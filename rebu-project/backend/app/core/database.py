@@ -1,7 +1,12 @@
 """
 Database connection and session management
 """
-from sqlalchemy import create_engine
+import itertools
+from contextvars import ContextVar
+from typing import Optional, Union
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 
@@ -20,6 +25,25 @@ engine = create_engine(
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Read replicas, picked round-robin by the read-only dependencies
+replica_engines = [
+    create_engine(url, pool_pre_ping=True, pool_size=10, max_overflow=20, echo=False)
+    for url in settings.DATABASE_REPLICA_URLS
+]
+ReplicaSessionLocals = [
+    sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+    for replica_engine in replica_engines
+]
+_next_replica = itertools.cycle(range(len(replica_engines)))
+
+# Async engine, created on first use when DATABASE_ASYNC_ENABLED
+async_engine: Optional[AsyncEngine] = None
+AsyncSessionLocal: Optional[async_sessionmaker] = None
+AsyncReplicaSessionLocals: list[async_sessionmaker] = []
+
+# "ROLE:id" of the authenticated principal for the current request, set by app.core.security
+request_principal: ContextVar[Optional[str]] = ContextVar("request_principal", default=None)
+
 # Base class for models
 Base = declarative_base()
 
@@ -36,6 +60,145 @@ def get_db() -> Session:
         db.close()
 
 
+def get_async_engine() -> AsyncEngine:
+    """Create the asyncpg engine and session factories once"""
+    global async_engine, AsyncSessionLocal, AsyncReplicaSessionLocals
+    
+    if async_engine is None:
+        async_engine = create_async_engine(
+            settings.async_db_url,
+            pool_pre_ping=True,
+            pool_size=10,
+            max_overflow=20,
+            echo=False
+        )
+        # Keep loaded attributes readable after commit; lazy refreshes would need a greenlet
+        AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+        AsyncReplicaSessionLocals = [
+            async_sessionmaker(
+                create_async_engine(settings.to_async_url(url), pool_pre_ping=True, pool_size=10, max_overflow=20),
+                expire_on_commit=False,
+                autoflush=False
+            )
+            for url in settings.DATABASE_REPLICA_URLS
+        ]
+    return async_engine
+
+
+async def dispose_async_engine():
+    """Close pooled asyncpg connections on shutdown"""
+    global async_engine, AsyncSessionLocal, AsyncReplicaSessionLocals
+    
+    if async_engine is not None:
+        await async_engine.dispose()
+        for session_factory in AsyncReplicaSessionLocals:
+            await session_factory.kw["bind"].dispose()
+        async_engine = None
+        AsyncSessionLocal = None
+        AsyncReplicaSessionLocals = []
+
+
+async def get_async_db() -> Union[AsyncSession, Session]:
+    """
+    Dependency for the async repositories
+    Yields an AsyncSession with DATABASE_ASYNC_ENABLED, otherwise a sync Session
+    whose queries the async repositories run in the threadpool
+    """
+    if settings.DATABASE_ASYNC_ENABLED:
+        get_async_engine()
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
+
+
+def _read_your_writes_key(principal: str) -> str:
+    return f"rw:{principal}"
+
+
+async def _use_replica() -> bool:
+    """Replicas are configured and the current principal has no recent writes"""
+    if not replica_engines:
+        return False
+    
+    principal = request_principal.get()
+    if principal is None or settings.READ_YOUR_WRITES_SECONDS <= 0:
+        return True
+    
+    from app.core.redis_client import async_redis_client
+    try:
+        return not await async_redis_client.client.exists(_read_your_writes_key(principal))
+    except Exception as e:
+        print(f"⚠️  Read-your-writes check failed, reading from primary: {e}")
+        return False
+
+
+async def get_read_db() -> Session:
+    """
+    Dependency for read-only endpoints: a replica session, or the primary
+    when no replica is configured or the principal wrote in the last READ_YOUR_WRITES_SECONDS
+    Declare it after the auth dependency so the principal is known
+    """
+    session_factory = ReplicaSessionLocals[next(_next_replica)] if await _use_replica() else SessionLocal
+    db = session_factory()
+    try:
+        yield db
+    finally:
+        await run_in_threadpool(db.close)
+
+
+async def get_async_read_db() -> Union[AsyncSession, Session]:
+    """get_async_db routed like get_read_db"""
+    if not settings.DATABASE_ASYNC_ENABLED:
+        async for db in get_read_db():
+            yield db
+        return
+    
+    get_async_engine()
+    session_factory = AsyncSessionLocal
+    if await _use_replica():
+        session_factory = AsyncReplicaSessionLocals[next(_next_replica)]
+    async with session_factory() as db:
+        yield db
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_flush_writes(session, flush_context):
+    session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_statement_writes(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["has_writes"] = True
+
+
+@event.listens_for(Session, "after_rollback")
+def _clear_writes(session):
+    session.info.pop("has_writes", None)
+
+
+@event.listens_for(Session, "after_commit")
+def _remember_principal_writes(session):
+    """Pin the writing principal's reads to the primary while replicas catch up"""
+    if not session.info.pop("has_writes", False):
+        return
+    
+    principal = request_principal.get()
+    if principal is None or not replica_engines or settings.READ_YOUR_WRITES_SECONDS <= 0:
+        return
+    
+    from app.core.redis_client import redis_client
+    try:
+        redis_client.client.set(_read_your_writes_key(principal), 1, ex=settings.READ_YOUR_WRITES_SECONDS)
+    except Exception as e:
+        print(f"⚠️  Failed to record write for read-your-writes: {e}")
+
+
 def init_db():
     """Initialize database (create all tables)"""
     # Import all models here to ensure they're registered
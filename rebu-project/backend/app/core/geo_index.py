@@ -0,0 +1,146 @@
+"""
+In-process spatial grid index of online drivers
+"""
+import math
+import threading
+import time
+from typing import Optional
+
+from app.core.config import settings
+
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in km"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class DriverGeoIndex:
+    """
+    Uniform lat/lon grid of online driver positions.
+    Mirrors Redis `drivers:online` (the source of truth) inside the process:
+    fed by location pings and periodically rebuilt from Redis.
+    """
+
+    def __init__(self, cell_size_km: float = 1.0):
+        self.cell_deg = cell_size_km / KM_PER_DEGREE_LAT
+        self._cells: dict[tuple[int, int], set[int]] = {}
+        self._positions: dict[int, tuple[float, float]] = {}
+        self._lock = threading.RLock()
+        self.last_rebuild_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def upsert(self, driver_id: int, lat: float, lon: float):
+        """Insert or move a driver"""
+        cell = self._cell(lat, lon)
+        with self._lock:
+            previous = self._positions.get(driver_id)
+            if previous is not None:
+                previous_cell = self._cell(*previous)
+                if previous_cell != cell:
+                    self._discard(previous_cell, driver_id)
+            self._positions[driver_id] = (lat, lon)
+            self._cells.setdefault(cell, set()).add(driver_id)
+
+    def remove(self, driver_id: int):
+        """Remove a driver from the index"""
+        with self._lock:
+            previous = self._positions.pop(driver_id, None)
+            if previous is not None:
+                self._discard(self._cell(*previous), driver_id)
+
+    def _discard(self, cell: tuple[int, int], driver_id: int):
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(driver_id)
+            if not members:
+                del self._cells[cell]
+
+    def get_location(self, driver_id: int) -> Optional[tuple[float, float]]:
+        """Get indexed location (lat, lon)"""
+        return self._positions.get(driver_id)
+
+    def get_nearby_drivers(
+        self,
+        lat: float,
+        lon: float,
+        radius_km: float,
+        count: Optional[int] = None
+    ) -> list[dict]:
+        """
+        Find drivers within radius, nearest first
+        Same shape as RedisClient.get_nearby_drivers
+        """
+        lat_span = radius_km / KM_PER_DEGREE_LAT
+        cos_lat = max(math.cos(math.radians(lat)), 0.01)
+        lon_span = radius_km / (KM_PER_DEGREE_LAT * cos_lat)
+
+        min_row, min_col = self._cell(lat - lat_span, lon - lon_span)
+        max_row, max_col = self._cell(lat + lat_span, lon + lon_span)
+
+        results = []
+        with self._lock:
+            for row in range(min_row, max_row + 1):
+                for col in range(min_col, max_col + 1):
+                    for driver_id in self._cells.get((row, col), ()):
+                        d_lat, d_lon = self._positions[driver_id]
+                        distance = haversine_km(lat, lon, d_lat, d_lon)
+                        if distance <= radius_km:
+                            results.append({"driver_id": driver_id, "distance_km": distance})
+
+        results.sort(key=lambda r: r["distance_km"])
+        return results[:count] if count else results
+
+    def get_k_nearest(self, lat: float, lon: float, k: int, max_radius_km: float) -> list[dict]:
+        """Find the k nearest drivers, widening the search ring up to max_radius_km"""
+        radius_km = min(self.cell_deg * KM_PER_DEGREE_LAT, max_radius_km)
+        while True:
+            results = self.get_nearby_drivers(lat, lon, radius_km, count=k)
+            if len(results) >= k or radius_km >= max_radius_km:
+                return results
+            radius_km = min(radius_km * 2, max_radius_km)
+
+    def rebuild(self, locations: dict[int, tuple[float, float]]):
+        """Replace the whole index with {driver_id: (lat, lon)}"""
+        cells: dict[tuple[int, int], set[int]] = {}
+        for driver_id, (lat, lon) in locations.items():
+            cells.setdefault(self._cell(lat, lon), set()).add(driver_id)
+
+        with self._lock:
+            self._cells = cells
+            self._positions = dict(locations)
+            self.last_rebuild_at = time.time()
+
+    def rebuild_from_redis(self) -> int:
+        """
+        Reload the index from Redis `drivers:online`, leaving out drivers
+        without a ping in the last DRIVER_ONLINE_WINDOW_SECONDS
+        """
+        from app.core.redis_client import redis_client
+
+        locations = redis_client.get_all_driver_locations()
+        last_seen = redis_client.get_driver_last_seen(list(locations))
+        online_since = time.time() - settings.DRIVER_ONLINE_WINDOW_SECONDS
+        self.rebuild({
+            driver_id: location
+            for driver_id, location in locations.items()
+            if (last_seen.get(driver_id) or 0) >= online_since
+        })
+        return len(self)
+
+
+# Singleton instance
+driver_geo_index = DriverGeoIndex(cell_size_km=settings.DRIVER_GEO_INDEX_CELL_KM)
@@ -0,0 +1,74 @@
+"""
+In-process metrics: counters, gauges and latency samples
+"""
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Optional
+
+
+class Metrics:
+    """Lightweight per-process metrics registry exposed on /metrics"""
+
+    def __init__(self, max_samples: int = 1000):
+        self._lock = threading.Lock()
+        self._max_samples = max_samples
+        self.counters: dict[str, float] = defaultdict(float)
+        self.gauges: dict[str, float] = {}
+        self.timings: dict[str, deque] = {}
+
+    def incr(self, name: str, value: float = 1):
+        """Increment a counter"""
+        with self._lock:
+            self.counters[name] += value
+
+    def set_gauge(self, name: str, value: float):
+        """Set a gauge to its current value"""
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name: str, value_ms: float):
+        """Record a latency sample in milliseconds"""
+        with self._lock:
+            samples = self.timings.get(name)
+            if samples is None:
+                samples = self.timings[name] = deque(maxlen=self._max_samples)
+            samples.append(value_ms)
+
+    @contextmanager
+    def timer(self, name: str):
+        """Time a block and record it under name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000)
+
+    def snapshot(self) -> dict:
+        """Current counters, gauges and latency summaries"""
+        with self._lock:
+            timings = {name: self._summarize(samples) for name, samples in self.timings.items()}
+            return {
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "timings_ms": timings,
+            }
+
+    @staticmethod
+    def _summarize(samples: deque) -> Optional[dict]:
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        last = len(ordered) - 1
+        return {
+            "count": len(ordered),
+            "avg": round(sum(ordered) / len(ordered), 3),
+            "p50": round(ordered[int(last * 0.50)], 3),
+            "p95": round(ordered[int(last * 0.95)], 3),
+            "max": round(ordered[-1], 3),
+        }
+
+
+# Singleton instance
+metrics = Metrics()
@@ -0,0 +1,49 @@
+"""
+Keyset (cursor) pagination on (created_at, id), newest first
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+
+
+def clamp_limit(limit: Optional[int]) -> int:
+    """Page size bounded by PAGINATION_MAX_LIMIT"""
+    if not limit or limit < 1:
+        return settings.PAGINATION_DEFAULT_LIMIT
+    return min(limit, settings.PAGINATION_MAX_LIMIT)
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Opaque cursor pointing just past a row"""
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[tuple[datetime, int]]:
+    """Decode a cursor into (created_at, id)"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def build_page(rows: list[Any], limit: int) -> dict:
+    """
+    Page from rows fetched with limit + 1
+    The extra row only signals that another page exists
+    """
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return {"total": len(items), "items": items, "next_cursor": next_cursor}
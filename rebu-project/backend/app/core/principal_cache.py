@@ -0,0 +1,60 @@
+"""
+Short-TTL cache of authenticated principals
+"""
+import threading
+import time
+from typing import Optional
+
+from app.core.config import settings
+
+
+class PrincipalCache:
+    """
+    Per-process cache of resolved principals keyed by (role, id)
+    Entries expire after ttl_seconds; status or FCM token changes invalidate explicitly
+    """
+
+    def __init__(self, ttl_seconds: float = 15, max_size: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: dict[tuple[str, int], tuple[float, dict]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, role: str, principal_id: int) -> Optional[dict]:
+        key = (role, principal_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            return principal
+
+    def set(self, role: str, principal_id: int, principal: dict):
+        key = (role, principal_id)
+        with self._lock:
+            self._entries.pop(key, None)
+            if len(self._entries) >= self.max_size:
+                # Dicts keep insertion order: drop the oldest entry
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, principal)
+
+    def invalidate(self, role: str, principal_id: int):
+        with self._lock:
+            self._entries.pop((role, principal_id), None)
+            if role == "USER":
+                # Admins are users with a flag
+                self._entries.pop(("ADMIN", principal_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Singleton instance
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    max_size=settings.PRINCIPAL_CACHE_MAX_SIZE
+)
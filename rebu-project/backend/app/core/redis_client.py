@@ -2,10 +2,188 @@
 Redis client for geospatial queries, locks, and caching
 """
 import redis
-from typing import Optional
+import redis.asyncio as aioredis
+from typing import Iterable, Optional
 from app.core.config import settings
 
 
+DRIVERS_GEO_KEY = "drivers:online"
+DRIVER_LOCATION_BUFFER_KEY = "drivers:location:pending"
+DRIVER_LOCATION_LAST_TS_KEY = "drivers:location:last_ts"  # HASH driver_id -> newest applied ping timestamp
+MATCHING_WAVES_KEY = "matching:waves"              # ZSET trip_request_id -> due timestamp
+MATCHING_WAVE_NUMBERS_KEY = "matching:waves:next"  # HASH trip_request_id -> wave number to run
+MATCHING_STREAM_KEY = "matching:jobs"              # STREAM of matching jobs for the worker pool
+MATCHING_STREAM_GROUP = "matchers"
+TRIP_EXPIRY_KEY = "trip_requests:expiry"           # ZSET trip_request_id -> expires_at timestamp
+
+# Outcomes of buffering a location ping for the DB write-behind flush
+LOCATION_BUFFERED = 1
+LOCATION_COALESCED = 0        # Replaced an older unflushed ping for the same driver
+LOCATION_DROPPED_STALE = -1   # Older than the newest ping already applied
+LOCATION_DROPPED_FULL = -2    # Buffer at capacity
+
+# KEYS[1] buffer hash, KEYS[2] geo set, KEYS[3] last-applied hash; ARGV: driver_id, "lat,lon,ts", ts, max_size, lon, lat
+# Stale pings are ignored entirely; the live position is updated even when the buffer is full.
+# The last-applied timestamp outlives the flush, so pings replayed after it are still caught
+BUFFER_LOCATION_SCRIPT = """
+local last_ts = tonumber(redis.call('HGET', KEYS[3], ARGV[1]))
+if last_ts and last_ts > tonumber(ARGV[3]) then
+    return -1
+end
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[3])
+redis.call('GEOADD', KEYS[2], ARGV[5], ARGV[6], ARGV[1])
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 1 then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+    return 0
+end
+if redis.call('HLEN', KEYS[1]) >= tonumber(ARGV[4]) then
+    return -2
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+return 1
+"""
+
+# KEYS[1] geo set, KEYS[2] last-applied hash; ARGV: cutoff ts, driver ids...
+# Removes the drivers whose newest ping is older than the cutoff (or unknown); returns their ids
+REMOVE_OFFLINE_DRIVERS_SCRIPT = """
+local removed = {}
+local cutoff = tonumber(ARGV[1])
+for i = 2, #ARGV do
+    local last_ts = tonumber(redis.call('HGET', KEYS[2], ARGV[i]))
+    if not last_ts or last_ts < cutoff then
+        redis.call('ZREM', KEYS[1], ARGV[i])
+        redis.call('HDEL', KEYS[2], ARGV[i])
+        table.insert(removed, ARGV[i])
+    end
+end
+return removed
+"""
+
+# KEYS[1] buffer hash; returns and clears every buffered ping atomically
+TAKE_LOCATIONS_SCRIPT = """
+local data = redis.call('HGETALL', KEYS[1])
+redis.call('DEL', KEYS[1])
+return data
+"""
+
+# Outcomes of claiming a trip request for an accepting driver
+CLAIM_WON = 1
+CLAIM_NO_OFFER = 0    # Driver has no pending offer (expired, cleared or never sent)
+CLAIM_TAKEN = -1      # Another driver already claimed the trip
+
+# KEYS[1] pending offers set, KEYS[2] claim key; ARGV: driver_id, claim_ttl_seconds
+# Returns {outcome, other driver ids that had pending offers...}; repeating a won claim is a no-op
+CLAIM_OFFER_SCRIPT = """
+local holder = redis.call('GET', KEYS[2])
+if holder then
+    if holder == ARGV[1] then
+        return {1}
+    end
+    return {-1}
+end
+if redis.call('SISMEMBER', KEYS[1], ARGV[1]) == 0 then
+    return {0}
+end
+local result = {1}
+for _, driver_id in ipairs(redis.call('SMEMBERS', KEYS[1])) do
+    if driver_id ~= ARGV[1] then
+        table.insert(result, driver_id)
+    end
+end
+redis.call('SET', KEYS[2], ARGV[1], 'EX', ARGV[2])
+redis.call('DEL', KEYS[1])
+return result
+"""
+
+# KEYS[1] pending offers set, KEYS[2] claim key; ARGV: driver_id, offers_ttl_seconds, drivers to restore...
+# Only the claim holder can release; restores the pending offers the claim removed
+RELEASE_CLAIM_SCRIPT = """
+if redis.call('GET', KEYS[2]) ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[2])
+if #ARGV > 2 then
+    redis.call('SADD', KEYS[1], unpack(ARGV, 3))
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 1
+"""
+
+# KEYS[1] wave delay zset, KEYS[2] wave number hash; ARGV: now, limit
+# Pops due entries atomically so each wave runs in exactly one process; returns {id, wave, ...}
+TAKE_DUE_WAVES_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+if #due == 0 then
+    return {}
+end
+redis.call('ZREM', KEYS[1], unpack(due))
+local waves = redis.call('HMGET', KEYS[2], unpack(due))
+redis.call('HDEL', KEYS[2], unpack(due))
+local result = {}
+for i, trip_request_id in ipairs(due) do
+    table.insert(result, trip_request_id)
+    table.insert(result, waves[i] or '0')
+end
+return result
+"""
+
+# KEYS[1] timer zset; ARGV: now, limit
+# Pops due members atomically so each timer fires in exactly one process
+TAKE_DUE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+if #due > 0 then
+    redis.call('ZREM', KEYS[1], unpack(due))
+end
+return due
+"""
+
+# KEYS[1] lease key; ARGV: holder token, ttl_ms
+# Takes a free lease or extends one this holder already owns; returns 1 while held
+ACQUIRE_LEASE_SCRIPT = """
+local holder = redis.call('GET', KEYS[1])
+if holder == ARGV[1] then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    return 1
+end
+if holder then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+return 1
+"""
+
+# KEYS[1] lease key; ARGV: holder token; only the holder can release
+RELEASE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _lease_key(name: str) -> str:
+    return f"lease:{name}"
+
+
+def _pending_offers_key(trip_request_id: int) -> str:
+    return f"offers:trip:{trip_request_id}"
+
+
+def _trip_lock_key(trip_request_id: int) -> str:
+    return f"lock:trip_request:{trip_request_id}"
+
+
+def _driver_trail_key(driver_id: int) -> str:
+    return f"driver:trail:{driver_id}"
+
+
+def _parse_nearby(results) -> list[dict]:
+    return [
+        {"driver_id": int(driver_id), "distance_km": float(distance)}
+        for driver_id, distance in results
+    ]
+
+
 class RedisClient:
     """Redis client wrapper for Rebu operations"""
     
@@ -16,15 +194,19 @@ class RedisClient:
             socket_timeout=5,
             socket_connect_timeout=5,
         )
+        self._take_locations = self.client.register_script(TAKE_LOCATIONS_SCRIPT)
+        self._remove_offline_drivers = self.client.register_script(REMOVE_OFFLINE_DRIVERS_SCRIPT)
+        self._acquire_lease = self.client.register_script(ACQUIRE_LEASE_SCRIPT)
+        self._release_lease = self.client.register_script(RELEASE_LEASE_SCRIPT)
     
     # Geospatial operations for driver location
     def add_driver_location(self, driver_id: int, lat: float, lon: float) -> int:
         """Add driver to geospatial index"""
-        return self.client.geoadd("drivers:online", (lon, lat, str(driver_id)))
+        return self.client.geoadd(DRIVERS_GEO_KEY, (lon, lat, str(driver_id)))
     
     def remove_driver_location(self, driver_id: int) -> int:
         """Remove driver from geospatial index"""
-        return self.client.zrem("drivers:online", str(driver_id))
+        return self.client.zrem(DRIVERS_GEO_KEY, str(driver_id))
     
     def get_nearby_drivers(self, lat: float, lon: float, radius_km: float, count: Optional[int] = None) -> list[dict]:
         """
@@ -32,7 +214,7 @@ class RedisClient:
         Returns: [{"driver_id": "123", "distance": 1.5}, ...]
         """
         results = self.client.georadius(
-            "drivers:online",
+            DRIVERS_GEO_KEY,
             lon, lat,
             radius_km,
             unit="km",
@@ -41,49 +223,158 @@ class RedisClient:
             sort="ASC"  # Nearest first
         )
         
-        return [
-            {"driver_id": int(driver_id), "distance_km": float(distance)}
-            for driver_id, distance in results
-        ]
+        return _parse_nearby(results)
     
     def get_driver_location(self, driver_id: int) -> Optional[tuple[float, float]]:
         """Get driver's current location (lon, lat)"""
-        result = self.client.geopos("drivers:online", str(driver_id))
+        result = self.client.geopos(DRIVERS_GEO_KEY, str(driver_id))
         if result and result[0]:
             lon, lat = result[0]
             return (float(lon), float(lat))
         return None
     
+    def remove_offline_drivers(self, cutoff: float, batch_size: int = 1000) -> list[int]:
+        """
+        Drop drivers with no location ping since cutoff from drivers:online
+        Checked and removed atomically per batch, so a fresh ping is never lost
+        """
+        driver_ids = self.client.zrange(DRIVERS_GEO_KEY, 0, -1)
+        removed = []
+        
+        for start in range(0, len(driver_ids), batch_size):
+            batch = driver_ids[start:start + batch_size]
+            removed += self._remove_offline_drivers(
+                keys=[DRIVERS_GEO_KEY, DRIVER_LOCATION_LAST_TS_KEY],
+                args=[cutoff, *batch]
+            )
+        
+        return [int(driver_id) for driver_id in removed]
+    
+    def get_all_driver_locations(self, batch_size: int = 1000) -> dict[int, tuple[float, float]]:
+        """
+        Get every online driver's location
+        Returns: {driver_id: (lat, lon)}
+        """
+        driver_ids = self.client.zrange(DRIVERS_GEO_KEY, 0, -1)
+        locations = {}
+        
+        for start in range(0, len(driver_ids), batch_size):
+            batch = driver_ids[start:start + batch_size]
+            positions = self.client.geopos(DRIVERS_GEO_KEY, *batch)
+            for driver_id, position in zip(batch, positions):
+                if position:
+                    lon, lat = position
+                    locations[int(driver_id)] = (float(lat), float(lon))
+        
+        return locations
+    
+    def take_buffered_driver_locations(self) -> dict[int, tuple[float, float, float]]:
+        """
+        Atomically take every location ping waiting for the DB flush
+        Returns: {driver_id: (lat, lon, recorded_at_epoch)}
+        """
+        data = self._take_locations(keys=[DRIVER_LOCATION_BUFFER_KEY])
+        locations = {}
+        for driver_id, payload in zip(data[::2], data[1::2]):
+            lat, lon, recorded_at = payload.split(",")
+            locations[int(driver_id)] = (float(lat), float(lon), float(recorded_at))
+        return locations
+    
+    def restore_buffered_driver_locations(self, locations: dict[int, tuple[float, float, float]]):
+        """Put back pings that failed to flush, unless a newer ping arrived meanwhile"""
+        pipe = self.client.pipeline(transaction=False)
+        for driver_id, (lat, lon, recorded_at) in locations.items():
+            pipe.hsetnx(DRIVER_LOCATION_BUFFER_KEY, str(driver_id), f"{lat},{lon},{recorded_at}")
+        pipe.execute()
+    
+    def get_driver_trail(self, driver_id: int, since: Optional[float] = None) -> list[tuple[float, float, float]]:
+        """
+        Get the driver's GPS trail in chronological order
+        Returns: [(lat, lon, recorded_at_epoch), ...]
+        """
+        points = []
+        for entry in self.client.lrange(_driver_trail_key(driver_id), 0, -1):
+            lat, lon, recorded_at = (float(x) for x in entry.split(","))
+            if since is None or recorded_at >= since:
+                points.append((lat, lon, recorded_at))
+        points.sort(key=lambda p: p[2])
+        return points
+    
     # Locks for preventing double acceptance
     def acquire_trip_lock(self, trip_request_id: int, timeout_seconds: int = 10) -> bool:
         """
         Try to acquire lock for trip request
         Returns True if lock acquired, False if already locked
         """
-        lock_key = f"lock:trip_request:{trip_request_id}"
-        return self.client.set(lock_key, "1", ex=timeout_seconds, nx=True)
+        return self.client.set(_trip_lock_key(trip_request_id), "1", ex=timeout_seconds, nx=True)
     
     def release_trip_lock(self, trip_request_id: int):
         """Release lock for trip request"""
-        lock_key = f"lock:trip_request:{trip_request_id}"
-        self.client.delete(lock_key)
+        self.client.delete(_trip_lock_key(trip_request_id))
+    
+    # Matching waves (see AsyncRedisClient for the consumer side)
+    def schedule_matching_waves(self, trip_request_ids: list[int], wave_number: int, due_at: float):
+        """Queue a matching wave for many trip requests at due_at (epoch seconds)"""
+        if not trip_request_ids:
+            return
+        members = [str(trip_request_id) for trip_request_id in trip_request_ids]
+        pipe = self.client.pipeline(transaction=True)
+        pipe.zadd(MATCHING_WAVES_KEY, {member: due_at for member in members})
+        pipe.hset(MATCHING_WAVE_NUMBERS_KEY, mapping={member: wave_number for member in members})
+        pipe.execute()
+    
+    # Trip request expiry timers
+    def schedule_trip_expiry(self, trip_request_id: int, expires_at_ts: float):
+        """Fire the expiry of a trip request at expires_at_ts (epoch seconds)"""
+        self.client.zadd(TRIP_EXPIRY_KEY, {str(trip_request_id): expires_at_ts})
+    
+    def clear_expired_trip_requests(self, trip_request_ids: list[int]):
+        """Drop locks, pending offers, waves and timers of expired trip requests in one round trip"""
+        if not trip_request_ids:
+            return
+        members = [str(trip_request_id) for trip_request_id in trip_request_ids]
+        pipe = self.client.pipeline(transaction=False)
+        pipe.delete(*(_trip_lock_key(trip_request_id) for trip_request_id in trip_request_ids))
+        pipe.delete(*(_pending_offers_key(trip_request_id) for trip_request_id in trip_request_ids))
+        pipe.zrem(MATCHING_WAVES_KEY, *members)
+        pipe.hdel(MATCHING_WAVE_NUMBERS_KEY, *members)
+        pipe.zrem(TRIP_EXPIRY_KEY, *members)
+        pipe.execute()
+    
+    # Leases for cluster-wide singletons (e.g. the background job leader)
+    def acquire_lease(self, name: str, holder: str, ttl_seconds: float) -> bool:
+        """Take or renew a lease; False while another holder owns it"""
+        return bool(self._acquire_lease(keys=[_lease_key(name)], args=[holder, int(ttl_seconds * 1000)]))
+    
+    def release_lease(self, name: str, holder: str) -> bool:
+        """Give up a lease early so another process can take over"""
+        return bool(self._release_lease(keys=[_lease_key(name)], args=[holder]))
     
     # Offer tracking
     def add_pending_offer(self, trip_request_id: int, driver_id: int, expiry_seconds: int = 60):
         """Track that an offer was sent to a driver"""
-        key = f"offers:trip:{trip_request_id}"
-        self.client.sadd(key, str(driver_id))
-        self.client.expire(key, expiry_seconds + 60)  # Keep a bit longer than offer expiry
+        self.add_pending_offers(trip_request_id, [driver_id], expiry_seconds)
+    
+    def add_pending_offers(self, trip_request_id: int, driver_ids: Iterable[int], expiry_seconds: int = 60):
+        """Track offers sent to several drivers in one round trip"""
+        members = [str(did) for did in driver_ids]
+        if not members:
+            return
+        key = _pending_offers_key(trip_request_id)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.sadd(key, *members)
+        pipe.expire(key, expiry_seconds + 60)  # Keep a bit longer than offer expiry
+        pipe.execute()
     
     def get_pending_offers(self, trip_request_id: int) -> set[int]:
         """Get all drivers who have pending offers for this trip"""
-        key = f"offers:trip:{trip_request_id}"
+        key = _pending_offers_key(trip_request_id)
         driver_ids = self.client.smembers(key)
         return {int(did) for did in driver_ids}
     
     def clear_pending_offers(self, trip_request_id: int):
         """Clear all pending offers for a trip"""
-        key = f"offers:trip:{trip_request_id}"
+        key = _pending_offers_key(trip_request_id)
         self.client.delete(key)
     
     # Driver status cache
@@ -97,6 +388,16 @@ class RedisClient:
         key = f"driver:status:{driver_id}"
         return self.client.get(key)
     
+    def get_driver_last_seen(self, driver_ids: list[int]) -> dict[int, Optional[float]]:
+        """Timestamp of each driver's newest applied location ping; None if never seen"""
+        if not driver_ids:
+            return {}
+        timestamps = self.client.hmget(DRIVER_LOCATION_LAST_TS_KEY, [str(driver_id) for driver_id in driver_ids])
+        return {
+            driver_id: float(ts) if ts is not None else None
+            for driver_id, ts in zip(driver_ids, timestamps)
+        }
+    
     # Trip state cache
     def set_trip_state(self, trip_id: int, state: dict, ttl_seconds: int = 3600):
         """Cache trip state for quick access"""
@@ -132,5 +433,293 @@ class RedisClient:
             return False
 
 
-# Singleton instance
+
+class AsyncRedisClient:
+    """
+    Non-blocking Redis client for async endpoints and the matching hot path
+    Batched variants pipeline several commands into one round trip
+    """
+    
+    def __init__(self):
+        self.client = aioredis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            socket_timeout=5,
+            socket_connect_timeout=5,
+        )
+        self._buffer_location = self.client.register_script(BUFFER_LOCATION_SCRIPT)
+        self._claim_offer = self.client.register_script(CLAIM_OFFER_SCRIPT)
+        self._release_claim = self.client.register_script(RELEASE_CLAIM_SCRIPT)
+        self._take_due_waves = self.client.register_script(TAKE_DUE_WAVES_SCRIPT)
+        self._take_due = self.client.register_script(TAKE_DUE_SCRIPT)
+    
+    # Geospatial operations for driver location
+    async def add_driver_location(self, driver_id: int, lat: float, lon: float) -> int:
+        """Add driver to geospatial index"""
+        return await self.client.geoadd(DRIVERS_GEO_KEY, (lon, lat, str(driver_id)))
+    
+    async def update_driver_location(
+        self,
+        driver_id: int,
+        lat: float,
+        lon: float,
+        status: str,
+        recorded_at: float,
+        buffer_max_size: int,
+        trail: Optional[list[tuple[float, float, float]]] = None,
+        trail_max_points: int = 5000,
+        trail_ttl_seconds: int = 21600,
+        status_ttl_seconds: int = 300
+    ) -> int:
+        """
+        Update driver position and cached status, buffer the ping for the
+        DB write-behind flush and append trail points [(lat, lon, ts)],
+        all in one round trip
+        Returns one of the LOCATION_* buffer outcomes
+        """
+        pipe = self.client.pipeline(transaction=False)
+        pipe.set(f"driver:status:{driver_id}", status, ex=status_ttl_seconds)
+        await self._buffer_location(
+            keys=[DRIVER_LOCATION_BUFFER_KEY, DRIVERS_GEO_KEY, DRIVER_LOCATION_LAST_TS_KEY],
+            args=[driver_id, f"{lat},{lon},{recorded_at}", recorded_at, buffer_max_size, lon, lat],
+            client=pipe
+        )
+        if trail:
+            trail_key = _driver_trail_key(driver_id)
+            pipe.rpush(trail_key, *[f"{p_lat},{p_lon},{p_ts}" for p_lat, p_lon, p_ts in trail])
+            pipe.ltrim(trail_key, -trail_max_points, -1)
+            pipe.expire(trail_key, trail_ttl_seconds)
+        results = await pipe.execute()
+        return results[1]
+    
+    async def remove_driver_location(self, driver_id: int) -> int:
+        """Remove driver from geospatial index"""
+        return await self.client.zrem(DRIVERS_GEO_KEY, str(driver_id))
+    
+    async def get_nearby_drivers(
+        self,
+        lat: float,
+        lon: float,
+        radius_km: float,
+        count: Optional[int] = None
+    ) -> list[dict]:
+        """
+        Find drivers within radius
+        Returns: [{"driver_id": 123, "distance_km": 1.5}, ...]
+        """
+        results = await self.client.georadius(
+            DRIVERS_GEO_KEY,
+            lon, lat,
+            radius_km,
+            unit="km",
+            withdist=True,
+            count=count,
+            sort="ASC"
+        )
+        return _parse_nearby(results)
+    
+    async def get_nearby_drivers_with_pending_offers(
+        self,
+        trip_request_id: int,
+        lat: float,
+        lon: float,
+        radius_km: float,
+        count: Optional[int] = None
+    ) -> tuple[list[dict], set[int]]:
+        """
+        Geo lookup plus pending-offer read for a trip in one round trip
+        Returns: (nearby drivers, driver IDs that already have an offer)
+        """
+        pipe = self.client.pipeline(transaction=False)
+        pipe.georadius(
+            DRIVERS_GEO_KEY,
+            lon, lat,
+            radius_km,
+            unit="km",
+            withdist=True,
+            count=count,
+            sort="ASC"
+        )
+        pipe.smembers(_pending_offers_key(trip_request_id))
+        nearby, pending = await pipe.execute()
+        return _parse_nearby(nearby), {int(did) for did in pending}
+    
+    # Locks for preventing double acceptance
+    async def acquire_trip_lock(self, trip_request_id: int, timeout_seconds: int = 10) -> bool:
+        """
+        Try to acquire lock for trip request
+        Returns True if lock acquired, False if already locked
+        """
+        return bool(await self.client.set(_trip_lock_key(trip_request_id), "1", ex=timeout_seconds, nx=True))
+    
+    async def release_trip_lock(self, trip_request_id: int):
+        """Release lock for trip request"""
+        await self.client.delete(_trip_lock_key(trip_request_id))
+    
+    async def claim_trip_offer(
+        self,
+        trip_request_id: int,
+        driver_id: int,
+        claim_ttl_seconds: int
+    ) -> tuple[int, list[int]]:
+        """
+        Atomically claim a trip request for a driver holding a pending offer
+        and remove its pending offers; one round trip
+        Returns (CLAIM_* outcome, other drivers whose offers were pending)
+        """
+        result = await self._claim_offer(
+            keys=[_pending_offers_key(trip_request_id), _trip_lock_key(trip_request_id)],
+            args=[driver_id, claim_ttl_seconds]
+        )
+        return int(result[0]), [int(did) for did in result[1:]]
+    
+    async def is_trip_claimed(self, trip_request_id: int) -> bool:
+        """Whether a driver already claimed (accepted) the trip request"""
+        return bool(await self.client.exists(_trip_lock_key(trip_request_id)))
+    
+    async def release_trip_claim(
+        self,
+        trip_request_id: int,
+        driver_id: int,
+        restore_driver_ids: Iterable[int] = (),
+        expiry_seconds: int = 60
+    ) -> bool:
+        """Release a claim held by driver_id and put back the pending offers it removed"""
+        return bool(await self._release_claim(
+            keys=[_pending_offers_key(trip_request_id), _trip_lock_key(trip_request_id)],
+            args=[driver_id, expiry_seconds + 60, *restore_driver_ids]
+        ))
+    
+    # Offer tracking
+    async def add_pending_offers(
+        self,
+        trip_request_id: int,
+        driver_ids: Iterable[int],
+        expiry_seconds: int = 60
+    ):
+        """Track offers sent to several drivers in one round trip"""
+        members = [str(did) for did in driver_ids]
+        if not members:
+            return
+        key = _pending_offers_key(trip_request_id)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.sadd(key, *members)
+        pipe.expire(key, expiry_seconds + 60)  # Keep a bit longer than offer expiry
+        await pipe.execute()
+    
+    async def get_pending_offers(self, trip_request_id: int) -> set[int]:
+        """Get all drivers who have pending offers for this trip"""
+        driver_ids = await self.client.smembers(_pending_offers_key(trip_request_id))
+        return {int(did) for did in driver_ids}
+    
+    async def clear_pending_offers(self, trip_request_id: int):
+        """Clear all pending offers for a trip"""
+        await self.client.delete(_pending_offers_key(trip_request_id))
+    
+    # Matching wave delay queue
+    async def schedule_matching_wave(self, trip_request_id: int, wave_number: int, due_at: float):
+        """Queue the next matching wave of a trip request for due_at (epoch seconds)"""
+        pipe = self.client.pipeline(transaction=True)
+        pipe.zadd(MATCHING_WAVES_KEY, {str(trip_request_id): due_at})
+        pipe.hset(MATCHING_WAVE_NUMBERS_KEY, str(trip_request_id), wave_number)
+        await pipe.execute()
+    
+    async def take_due_matching_waves(self, now: float, limit: int) -> list[tuple[int, int]]:
+        """Pop up to limit due waves as [(trip_request_id, wave_number)]"""
+        result = await self._take_due_waves(
+            keys=[MATCHING_WAVES_KEY, MATCHING_WAVE_NUMBERS_KEY],
+            args=[now, limit]
+        )
+        return [(int(result[i]), int(result[i + 1])) for i in range(0, len(result), 2)]
+    
+    async def cancel_matching_waves(self, trip_request_id: int):
+        """Drop any queued wave of a trip request"""
+        pipe = self.client.pipeline(transaction=True)
+        pipe.zrem(MATCHING_WAVES_KEY, str(trip_request_id))
+        pipe.hdel(MATCHING_WAVE_NUMBERS_KEY, str(trip_request_id))
+        await pipe.execute()
+    
+    async def take_due_trip_expiries(self, now: float, limit: int) -> list[int]:
+        """Pop up to limit trip request ids whose expiry timer is due"""
+        result = await self._take_due(keys=[TRIP_EXPIRY_KEY], args=[now, limit])
+        return [int(trip_request_id) for trip_request_id in result]
+    
+    async def schedule_trip_expiries(self, trip_request_ids: Iterable[int], due_at: float):
+        """Put popped expiry timers back, due at due_at (epoch seconds)"""
+        mapping = {str(trip_request_id): due_at for trip_request_id in trip_request_ids}
+        if mapping:
+            await self.client.zadd(TRIP_EXPIRY_KEY, mapping)
+    
+    # Matching job stream
+    async def ensure_matching_stream_group(self):
+        """Create the consumer group (and stream) if missing"""
+        try:
+            await self.client.xgroup_create(MATCHING_STREAM_KEY, MATCHING_STREAM_GROUP, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+    
+    async def get_matching_stream_length(self) -> int:
+        return await self.client.xlen(MATCHING_STREAM_KEY)
+    
+    async def add_matching_job(self, fields: dict) -> str:
+        return await self.client.xadd(MATCHING_STREAM_KEY, fields)
+    
+    async def read_matching_jobs(self, consumer: str, count: int, block_ms: int) -> list[tuple[str, dict]]:
+        """New jobs for this consumer, waiting up to block_ms"""
+        response = await self.client.xreadgroup(
+            MATCHING_STREAM_GROUP, consumer, {MATCHING_STREAM_KEY: ">"}, count=count, block=block_ms
+        )
+        return [message for _, messages in response or [] for message in messages]
+    
+    async def claim_stale_matching_jobs(self, consumer: str, min_idle_ms: int, count: int) -> list[tuple[str, dict]]:
+        """Take over jobs left unacknowledged by a dead consumer"""
+        response = await self.client.xautoclaim(
+            MATCHING_STREAM_KEY, MATCHING_STREAM_GROUP, consumer, min_idle_ms, start_id="0-0", count=count
+        )
+        return [message for message in response[1] if message[1] is not None]
+    
+    async def ack_matching_job(self, message_id: str):
+        """Acknowledge and delete a finished job so XLEN tracks the backlog"""
+        pipe = self.client.pipeline(transaction=False)
+        pipe.xack(MATCHING_STREAM_KEY, MATCHING_STREAM_GROUP, message_id)
+        pipe.xdel(MATCHING_STREAM_KEY, message_id)
+        await pipe.execute()
+    
+    # Driver status cache
+    async def set_driver_status(self, driver_id: int, status: str, ttl_seconds: int = 300):
+        """Cache driver status (ONLINE, OFFLINE, BUSY)"""
+        await self.client.set(f"driver:status:{driver_id}", status, ex=ttl_seconds)
+    
+    async def get_driver_status(self, driver_id: int) -> Optional[str]:
+        """Get cached driver status"""
+        return await self.client.get(f"driver:status:{driver_id}")
+    
+    # General cache operations
+    async def set_cache(self, key: str, value: str, ttl_seconds: int = 300):
+        """Set cache value"""
+        await self.client.set(key, value, ex=ttl_seconds)
+    
+    async def get_cache(self, key: str) -> Optional[str]:
+        """Get cache value"""
+        return await self.client.get(key)
+    
+    async def delete_cache(self, key: str):
+        """Delete cache value"""
+        await self.client.delete(key)
+    
+    async def ping(self) -> bool:
+        """Check if Redis is connected"""
+        try:
+            return await self.client.ping()
+        except Exception:
+            return False
+    
+    async def close(self):
+        """Close the connection pool"""
+        await self.client.aclose()
+
+
+# Singleton instances
 redis_client = RedisClient()
+async_redis_client = AsyncRedisClient()
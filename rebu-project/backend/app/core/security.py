@@ -1,6 +1,8 @@
 """
 Security utilities: JWT tokens, password hashing, authentication
 """
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, Any
 from jose import jwt, JWTError
@@ -10,13 +12,27 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import get_db, request_principal
+from app.core.metrics import metrics
+from app.core.principal_cache import principal_cache
 from app.repositories.user_repository import UserRepository
 from app.repositories.driver_repository import DriverRepository
 
 
 # Password hashing
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__time_cost=settings.ARGON2_TIME_COST,
+    argon2__memory_cost=settings.ARGON2_MEMORY_COST_KIB,
+    argon2__parallelism=settings.ARGON2_PARALLELISM
+)
+
+# argon2-cffi releases the GIL, so a small thread pool keeps hashing off the event loop
+password_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_MAX_WORKERS,
+    thread_name_prefix="password-hash"
+)
 
 # HTTP Bearer token
 security = HTTPBearer()
@@ -30,6 +46,25 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def _run_password_hashing(metric: str, func, *args):
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    try:
+        return await loop.run_in_executor(password_hash_executor, func, *args)
+    finally:
+        metrics.observe(metric, (loop.time() - started) * 1000)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the password hash pool"""
+    return await _run_password_hashing("auth.password_verify_ms", verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the password hash pool"""
+    return await _run_password_hashing("auth.password_hash_ms", get_password_hash, password)
+
+
 def create_access_token(data: dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
@@ -66,13 +101,9 @@ def decode_token(token: str) -> dict[str, Any]:
         )
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-):
-    """Get current authenticated user from token"""
-    token = credentials.credentials
-    payload = decode_token(token)
+def _get_token_principal(credentials: HTTPAuthorizationCredentials) -> tuple[str, int]:
+    """Get (role, id) from a verified access token"""
+    payload = decode_token(credentials.credentials)
     
     if payload.get("type") != "access":
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token type")
@@ -87,20 +118,24 @@ async def get_current_user(
     if user_id is None or role is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
     
-    # Fetch user or driver based on role
+    return role, user_id
+
+
+def _load_entity(db: Session, role: str, user_id: int):
+    """Fetch the user or driver behind a principal"""
     if role == "USER":
         user_repo = UserRepository(db)
         user = user_repo.get_by_id(user_id)
         if user is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-        return {"id": user.id, "role": "USER", "entity": user}
+        return user
     
     elif role == "DRIVER":
         driver_repo = DriverRepository(db)
         driver = driver_repo.get_by_id(user_id)
         if driver is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Driver not found")
-        return {"id": driver.id, "role": "DRIVER", "entity": driver}
+        return driver
     
     elif role == "ADMIN":
         # For now, admins are users with special flag
@@ -108,14 +143,59 @@ async def get_current_user(
         user = user_repo.get_by_id(user_id)
         if user is None or not user.is_admin:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
-        return {"id": user.id, "role": "ADMIN", "entity": user}
+        return user
     
     raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid role")
 
 
-def require_role(allowed_roles: list[str]):
+def _cache_principal(role: str, entity) -> dict:
+    """Store the entity-free view of a principal"""
+    principal = {
+        "id": entity.id,
+        "role": role,
+        "status": entity.status.value if role == "DRIVER" else None,
+    }
+    principal_cache.set(role, entity.id, principal)
+    return principal
+
+
+def invalidate_principal(role: str, principal_id: int):
+    """Drop a cached principal after its status or FCM token changes"""
+    principal_cache.invalidate(role, principal_id)
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+):
+    """Get current authenticated user from token, with the loaded entity"""
+    role, user_id = _get_token_principal(credentials)
+    request_principal.set(f"{role}:{user_id}")
+    entity = _load_entity(db, role, user_id)
+    _cache_principal(role, entity)
+    return {"id": entity.id, "role": role, "entity": entity}
+
+
+async def get_current_principal(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+):
+    """
+    Get current principal {"id", "role", "status"} without the entity
+    Served from the principal cache; the DB is only hit on a miss
+    """
+    role, user_id = _get_token_principal(credentials)
+    request_principal.set(f"{role}:{user_id}")
+    
+    principal = principal_cache.get(role, user_id)
+    if principal is None:
+        principal = _cache_principal(role, _load_entity(db, role, user_id))
+    return principal
+
+
+def require_role(allowed_roles: list[str], dependency=get_current_user):
     """Dependency to check if user has required role"""
-    async def role_checker(current_user = Depends(get_current_user)):
+    async def role_checker(current_user = Depends(dependency)):
         if current_user["role"] not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -130,3 +210,7 @@ require_user = require_role(["USER"])
 require_driver = require_role(["DRIVER"])
 require_admin = require_role(["ADMIN"])
 require_user_or_driver = require_role(["USER", "DRIVER"])
+
+# Entity-free variants for endpoints that only need id, role and status
+require_user_principal = require_role(["USER"], get_current_principal)
+require_driver_principal = require_role(["DRIVER"], get_current_principal)
@@ -6,7 +6,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from app.core.config import settings
-from app.core.database import init_db
+from app.core.database import init_db, get_async_engine, dispose_async_engine
 from app.workers.background_workers import workers
 from urllib.parse import urlparse
 
@@ -24,6 +24,30 @@ async def lifespan(app: FastAPI):
     init_db()
     print("✅ Database initialized")
     
+    if settings.DATABASE_ASYNC_ENABLED:
+        get_async_engine()
+        print("✅ Async database engine ready (asyncpg)")
+    
+    # Load the in-process driver geo index and keep it in sync with Redis
+    from app.services.geo_index_sync import geo_index_sync
+    await geo_index_sync.start()
+    
+    # Start notification outbox
+    from app.services.notification_outbox import notification_outbox
+    await notification_outbox.start()
+    
+    # Start matching wave scheduler
+    from app.services.wave_scheduler import wave_scheduler
+    await wave_scheduler.start()
+    
+    # Start trip request expiry timers
+    from app.services.expiry_scheduler import expiry_scheduler
+    await expiry_scheduler.start()
+    
+    # Start matching workers
+    from app.services.matching_queue import matching_queue
+    await matching_queue.start()
+    
     # Start background workers
     workers.start()
     
@@ -32,6 +56,15 @@ async def lifespan(app: FastAPI):
     # Shutdown
     print("🛑 Shutting down Rebu API...")
     workers.stop()
+    await geo_index_sync.stop()
+    await wave_scheduler.stop()
+    await matching_queue.stop()
+    await expiry_scheduler.stop()
+    await notification_outbox.stop()
+    
+    from app.core.redis_client import async_redis_client
+    await async_redis_client.close()
+    await dispose_async_engine()
 
 
 # Create FastAPI app
@@ -85,6 +118,14 @@ async def health_check():
     }
 
 
+
+@app.get("/metrics")
+async def get_metrics():
+    """Per-process counters, gauges and latency summaries"""
+    from app.core.metrics import metrics
+    
+    return metrics.snapshot()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
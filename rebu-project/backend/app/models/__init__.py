@@ -10,6 +10,7 @@ from app.models.trip import Trip, TripStatus
 from app.models.wallet_transaction import WalletTransaction, TransactionType
 from app.models.subscription import Subscription, SubscriptionTier, SubscriptionStatus
 from app.models.driver_availability_block import DriverAvailabilityBlock
+from app.models.trip_reminder import TripReminder
 
 __all__ = [
     "User",
@@ -30,4 +31,5 @@ __all__ = [
     "SubscriptionTier",
     "SubscriptionStatus",
     "DriverAvailabilityBlock",
+    "TripReminder",
 ]
@@ -1,7 +1,7 @@
 """
 Driver model - Conductores con wallet virtual y suscripción
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, Enum as SQLEnum, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, Numeric, Enum as SQLEnum, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -20,6 +20,10 @@ class DriverStatus(str, enum.Enum):
 
 class Driver(Base):
     __tablename__ = "drivers"
+    __table_args__ = (
+        # Bounding-box search of active drivers for scheduled matching
+        Index("ix_drivers_status_last_known_lat_lon", "status", "last_known_lat", "last_known_lon"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
@@ -42,7 +46,7 @@ class Driver(Base):
     current_subscription_id = Column(Integer, ForeignKey("subscriptions.id"), nullable=True)
     
     # Wallet balance (can be negative up to credit limit)
-    wallet_balance = Column(Float, default=0.0, nullable=False)
+    wallet_balance = Column(Numeric(12, 2), default=0, nullable=False)
     
     # Location (cached from Redis, for backup)
     last_known_lat = Column(Float, nullable=True)
@@ -1,7 +1,8 @@
 """
 DriverAvailabilityBlock model - Bloques de disponibilidad para evitar doble reserva
 """
-from sqlalchemy import Column, Integer, DateTime, ForeignKey, String
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, String, Computed, CheckConstraint, Index
+from sqlalchemy.dialects.postgresql import TSTZRANGE, ExcludeConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -13,14 +14,28 @@ class DriverAvailabilityBlock(Base):
     Used to prevent double-booking of scheduled trips.
     """
     __tablename__ = "driver_availability_blocks"
+    __table_args__ = (
+        CheckConstraint("end_time > start_time", name="ck_driver_availability_blocks_valid_range"),
+        # No two blocks of the same driver may overlap (needs btree_gist)
+        ExcludeConstraint(
+            ("driver_id", "="),
+            ("time_range", "&&"),
+            name="ex_driver_availability_blocks_no_overlap",
+            using="gist"
+        ),
+        # Batched cleanup of past blocks
+        Index("ix_driver_availability_blocks_end_time", "end_time"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     driver_id = Column(Integer, ForeignKey("drivers.id"), nullable=False, index=True)
     trip_request_id = Column(Integer, ForeignKey("trip_requests.id"), nullable=True, index=True)
     
     # Time block
-    start_time = Column(DateTime(timezone=True), nullable=False, index=True)
-    end_time = Column(DateTime(timezone=True), nullable=False, index=True)
+    start_time = Column(DateTime(timezone=True), nullable=False)
+    end_time = Column(DateTime(timezone=True), nullable=False)
+    # Half-open [start_time, end_time), maintained by Postgres for overlap queries
+    time_range = Column(TSTZRANGE, Computed("tstzrange(start_time, end_time, '[)')", persisted=True))
     
     # Reason (optional)
     reason = Column(String, nullable=True)  # e.g., "SCHEDULED_TRIP", "PERSONAL", "MAINTENANCE"
@@ -1,7 +1,7 @@
 """
 Trip model - Viajes activos y completados
 """
-from sqlalchemy import Column, Integer, String, DateTime, Float, Enum as SQLEnum, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Float, Numeric, Enum as SQLEnum, ForeignKey, Text, Boolean, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -19,9 +19,18 @@ class TripStatus(str, enum.Enum):
 
 class Trip(Base):
     __tablename__ = "trips"
+    __table_args__ = (
+        # One live trip per request; cancelled ones stay as history after an auto-rematch
+        Index(
+            "ix_trips_trip_request_id_live",
+            "trip_request_id",
+            unique=True,
+            postgresql_where=text("status <> 'CANCELLED'")
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    trip_request_id = Column(Integer, ForeignKey("trip_requests.id"), nullable=False, unique=True, index=True)
+    trip_request_id = Column(Integer, ForeignKey("trip_requests.id"), nullable=False, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     driver_id = Column(Integer, ForeignKey("drivers.id"), nullable=False, index=True)
     vehicle_id = Column(Integer, ForeignKey("vehicles.id"), nullable=False, index=True)
@@ -49,7 +58,7 @@ class Trip(Base):
     
     # Commission
     commission_rate = Column(Float, nullable=False)  # e.g., 0.15 for 15%
-    commission_amount = Column(Float, nullable=True)
+    commission_amount = Column(Numeric(12, 2), nullable=True)
     commission_charged = Column(Boolean, default=False)
     
     # Status
@@ -75,7 +84,7 @@ class Trip(Base):
     cancellation_reason = Column(Text, nullable=True)
     
     # Relationships
-    trip_request = relationship("TripRequest", back_populates="trip")
+    trip_request = relationship("TripRequest")
     user = relationship("User", back_populates="trips_as_user", foreign_keys=[user_id])
     driver = relationship("Driver", back_populates="trips_as_driver", foreign_keys=[driver_id])
     vehicle = relationship("Vehicle", back_populates="trips")
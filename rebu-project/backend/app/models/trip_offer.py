@@ -1,7 +1,7 @@
 """
 TripOffer model - Ofertas enviadas a conductores
 """
-from sqlalchemy import Column, Integer, DateTime, Float, Enum as SQLEnum, ForeignKey
+from sqlalchemy import Column, Integer, DateTime, Float, Enum as SQLEnum, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -17,21 +17,29 @@ class OfferStatus(str, enum.Enum):
 
 class TripOffer(Base):
     __tablename__ = "trip_offers"
+    __table_args__ = (
+        # Keyset pagination of driver history (newest first)
+        Index("ix_trip_offers_driver_id_created_at_id", "driver_id", "created_at", "id"),
+        Index("ix_trip_offers_driver_id_status_created_at_id", "driver_id", "status", "created_at", "id"),
+        # Monthly partitions (trip_offers_pYYYY_MM); queries should bound created_at to prune them
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)  # Explicit: composite primary key
     trip_request_id = Column(Integer, ForeignKey("trip_requests.id"), nullable=False, index=True)
-    driver_id = Column(Integer, ForeignKey("drivers.id"), nullable=False, index=True)
+    driver_id = Column(Integer, ForeignKey("drivers.id"), nullable=False)
     
     # Offer details
     offered_fare = Column(Float, nullable=False)
     estimated_arrival_minutes = Column(Integer, nullable=True)  # Time to reach pickup
     
     # Status
-    status = Column(SQLEnum(OfferStatus), default=OfferStatus.PENDING, index=True)
+    status = Column(SQLEnum(OfferStatus), default=OfferStatus.PENDING)
     
     # Timestamps
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
-    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    # Partition key, hence part of the primary key
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False)
     responded_at = Column(DateTime(timezone=True), nullable=True)
     
     # Relationships
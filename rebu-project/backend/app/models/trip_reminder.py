@@ -0,0 +1,22 @@
+"""
+TripReminder model - Recordatorios enviados de viajes programados
+"""
+from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class TripReminder(Base):
+    """
+    One row per reminder sent for a scheduled trip request.
+    The primary key makes each (trip request, offset) reminder go out once.
+    """
+    __tablename__ = "trip_reminders"
+    
+    trip_request_id = Column(Integer, ForeignKey("trip_requests.id", ondelete="CASCADE"), primary_key=True)
+    offset_minutes = Column(Integer, primary_key=True)  # Minutes before scheduled_start_at
+    
+    sent_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    def __repr__(self):
+        return f"<TripReminder {self.trip_request_id}: T-{self.offset_minutes}min>"
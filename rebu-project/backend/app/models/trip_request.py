@@ -1,7 +1,7 @@
 """
 TripRequest model - Solicitudes de viaje (inmediato o programado)
 """
-from sqlalchemy import Column, Integer, String, DateTime, Float, Enum as SQLEnum, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Float, Enum as SQLEnum, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -22,6 +22,11 @@ class TripRequestStatus(str, enum.Enum):
 
 class TripRequest(Base):
     __tablename__ = "trip_requests"
+    __table_args__ = (
+        # Keyset pagination of user history (newest first)
+        Index("ix_trip_requests_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_trip_requests_user_id_status_created_at_id", "user_id", "status", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
@@ -61,10 +66,6 @@ class TripRequest(Base):
     # Pre-assigned driver for scheduled trips
     pre_assigned_driver_id = Column(Integer, ForeignKey("drivers.id"), nullable=True, index=True)
     
-    # Reminders sent (for scheduled trips)
-    reminder_60min_sent = Column(Boolean, default=False)
-    reminder_15min_sent = Column(Boolean, default=False)
-    
     # Status
     status = Column(SQLEnum(TripRequestStatus), default=TripRequestStatus.PENDING, index=True)
     
@@ -80,7 +81,13 @@ class TripRequest(Base):
     user = relationship("User", back_populates="trip_requests")
     pre_assigned_driver = relationship("Driver", foreign_keys=[pre_assigned_driver_id])
     trip_offers = relationship("TripOffer", back_populates="trip_request", cascade="all, delete-orphan")
-    trip = relationship("Trip", back_populates="trip_request", uselist=False)
+    # The live trip; cancelled trips of an auto-rematched request are left out
+    trip = relationship(
+        "Trip",
+        primaryjoin="and_(TripRequest.id == Trip.trip_request_id, Trip.status != 'CANCELLED')",
+        uselist=False,
+        viewonly=True
+    )
     
     def __repr__(self):
         return f"<TripRequest {self.id}: {self.mode.value} - {self.status.value}>"
@@ -1,7 +1,7 @@
 """
 WalletTransaction model - Transacciones de wallet del conductor
 """
-from sqlalchemy import Column, Integer, String, DateTime, Float, Enum as SQLEnum, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, Numeric, Enum as SQLEnum, ForeignKey, Text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -25,10 +25,10 @@ class WalletTransaction(Base):
     
     # Transaction details
     type = Column(SQLEnum(TransactionType), nullable=False, index=True)
-    amount = Column(Float, nullable=False)  # Positive = credit, Negative = debit
+    amount = Column(Numeric(12, 2), nullable=False)  # Positive = credit, Negative = debit
     
     # Balance after transaction
-    balance_after = Column(Float, nullable=False)
+    balance_after = Column(Numeric(12, 2), nullable=False)
     
     # Related trip (if applicable)
     trip_id = Column(Integer, ForeignKey("trips.id"), nullable=True, index=True)
@@ -1,17 +1,52 @@
 """
 Repository implementations for all models
 """
+import math
 from typing import Optional, List
+from sqlalchemy import (
+    select, insert, update, delete, values, column, tuple_, func, case, exists, and_, literal_column, true, text,
+    Integer, Float, DateTime
+)
+from sqlalchemy.dialects.postgresql import TSTZRANGE, insert as pg_insert
 from sqlalchemy.orm import Session
-from datetime import datetime
+from sqlalchemy.orm.attributes import set_committed_value
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
 
+from app.core.config import settings
+from app.core.geo_index import EARTH_RADIUS_KM, KM_PER_DEGREE_LAT
 from app.models import (
     User, Driver, Vehicle, TripRequest, TripOffer, 
-    Trip, WalletTransaction, Subscription, DriverAvailabilityBlock,
-    TripRequestStatus, OfferStatus, TripStatus, DriverStatus
+    Trip, WalletTransaction, Subscription, DriverAvailabilityBlock, TripReminder,
+    TripMode, TripRequestStatus, OfferStatus, TripStatus, DriverStatus
 )
 
 
+# Trip statuses that still hold the driver
+LIVE_TRIP_STATUSES = (TripStatus.CONFIRMED, TripStatus.DRIVER_ARRIVING, TripStatus.ARRIVED, TripStatus.IN_PROGRESS)
+
+
+def _haversine_km_sql(lat_column, lon_column, lat: float, lon: float):
+    """SQL expression for the great-circle distance to (lat, lon) in km"""
+    d_lat = func.radians(lat_column - lat)
+    d_lon = func.radians(lon_column - lon)
+    a = (
+        func.power(func.sin(d_lat / 2), 2)
+        + math.cos(math.radians(lat)) * func.cos(func.radians(lat_column)) * func.power(func.sin(d_lon / 2), 2)
+    )
+    return 2 * EARTH_RADIUS_KM * func.asin(func.sqrt(func.least(a, 1.0)))
+
+
+def _time_range_sql(start_time, end_time):
+    """Half-open tstzrange matching DriverAvailabilityBlock.time_range"""
+    return func.tstzrange(start_time, end_time, "[)", type_=TSTZRANGE)
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
 class UserRepository:
     def __init__(self, db: Session):
         self.db = db
@@ -56,6 +91,48 @@ class DriverRepository:
             Driver.status == DriverStatus.ACTIVE
         ).all()
     
+    def find_available_for_window(self, lat: float, lon: float, radius_km: float,
+                                  start_time: datetime, end_time: datetime,
+                                  limit: Optional[int] = None,
+                                  exclude_driver_ids: Optional[List[int]] = None) -> List[Driver]:
+        """
+        ACTIVE drivers within radius_km of (lat, lon) and within their credit limit,
+        with no availability block overlapping [start_time, end_time); nearest first
+        """
+        lat_span = radius_km / KM_PER_DEGREE_LAT
+        lon_span = radius_km / (KM_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 0.01))
+        distance_km = _haversine_km_sql(Driver.last_known_lat, Driver.last_known_lon, lat, lon)
+        
+        # Same tiers as Driver.credit_limit
+        credit_limit = case(
+            (Subscription.tier == "PRO", settings.WALLET_CREDIT_LIMIT_PRO),
+            (Subscription.tier == "PREMIUM", settings.WALLET_CREDIT_LIMIT_PREMIUM),
+            else_=settings.WALLET_CREDIT_LIMIT_FREE
+        )
+        has_conflict = exists().where(
+            DriverAvailabilityBlock.driver_id == Driver.id,
+            DriverAvailabilityBlock.time_range.overlaps(_time_range_sql(start_time, end_time))
+        )
+        
+        query = self.db.query(Driver).outerjoin(
+            Subscription, Subscription.id == Driver.current_subscription_id
+        ).filter(
+            Driver.status == DriverStatus.ACTIVE,
+            # Bounding box first so the index narrows rows before the distance math
+            Driver.last_known_lat.between(lat - lat_span, lat + lat_span),
+            Driver.last_known_lon.between(lon - lon_span, lon + lon_span),
+            distance_km <= radius_km,
+            Driver.wallet_balance >= -credit_limit,
+            ~has_conflict
+        ).order_by(distance_km)
+        
+        if exclude_driver_ids:
+            query = query.filter(Driver.id.notin_(exclude_driver_ids))
+        
+        if limit:
+            query = query.limit(limit)
+        return query.all()
+    
     def create(self, email: str, phone: str, password_hash: str, 
                full_name: str, license_number: str, license_expiry_date: datetime) -> Driver:
         driver = Driver(
@@ -71,6 +148,40 @@ class DriverRepository:
         self.db.refresh(driver)
         return driver
     
+    def bulk_update_locations(self, locations: List[tuple[int, float, float, datetime]]) -> int:
+        """
+        Write many last known positions with one UPDATE ... FROM (VALUES ...)
+        locations: [(driver_id, lat, lon, recorded_at), ...]
+        Older positions never overwrite newer ones
+        """
+        if not locations:
+            return 0
+        
+        v = values(
+            column("id", Integer),
+            column("lat", Float),
+            column("lon", Float),
+            column("recorded_at", DateTime(timezone=True)),
+            name="v"
+        ).data(locations)
+        
+        result = self.db.execute(
+            update(Driver)
+            .where(Driver.id == v.c.id)
+            .where(
+                (Driver.last_location_update.is_(None))
+                | (Driver.last_location_update < v.c.recorded_at)
+            )
+            .values(
+                last_known_lat=v.c.lat,
+                last_known_lon=v.c.lon,
+                last_location_update=v.c.recorded_at
+            )
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return result.rowcount
+    
     def update_wallet_balance(self, driver_id: int, new_balance: float):
         driver = self.get_by_id(driver_id)
         if driver:
@@ -119,11 +230,17 @@ class TripRequestRepository:
     def get_by_id(self, trip_request_id: int) -> Optional[TripRequest]:
         return self.db.query(TripRequest).filter(TripRequest.id == trip_request_id).first()
     
-    def get_by_user_id(self, user_id: int, status: Optional[str] = None) -> List[TripRequest]:
+    def get_by_user_id(self, user_id: int, status: Optional[str] = None, limit: int = 50,
+                       before: Optional[tuple[datetime, int]] = None) -> List[TripRequest]:
+        """Newest first, keyset-paginated: rows strictly older than before=(created_at, id)"""
         query = self.db.query(TripRequest).filter(TripRequest.user_id == user_id)
         if status:
             query = query.filter(TripRequest.status == status)
-        return query.order_by(TripRequest.created_at.desc()).all()
+        if before:
+            query = query.filter(tuple_(TripRequest.created_at, TripRequest.id) < tuple_(*before))
+        return query.order_by(
+            TripRequest.created_at.desc(), TripRequest.id.desc()
+        ).limit(limit).all()
     
     def create(self, user_id: int, mode: str, pickup_data: dict, 
                dropoff_data: dict, estimated_fare: float, **kwargs) -> TripRequest:
@@ -143,26 +260,150 @@ class TripRequestRepository:
         self.db.commit()
         self.db.refresh(trip_request)
         return trip_request
+    
+    def expire_due(self, trip_request_ids: Optional[List[int]] = None,
+                   limit: int = 500) -> List[tuple[int, Optional[str]]]:
+        """
+        Mark PENDING requests past expires_at EXPIRED in one statement
+        Limited to trip_request_ids when given, otherwise the `limit` oldest due requests
+        Returns (trip_request_id, user fcm_token) for each expired request
+        """
+        requests = TripRequest.__table__
+        users = User.__table__
+        due = select(requests.c.id).where(
+            requests.c.status == TripRequestStatus.PENDING.name,
+            requests.c.expires_at <= func.now()
+        )
+        if trip_request_ids is not None:
+            due = due.where(requests.c.id.in_(trip_request_ids))
+        else:
+            due = due.order_by(requests.c.expires_at).limit(limit)
+        # Rows being matched right now are skipped; the accept path decides them
+        due = due.with_for_update(skip_locked=True)
+        
+        rows = self.db.execute(
+            update(requests).where(
+                requests.c.id.in_(due.scalar_subquery()),
+                users.c.id == requests.c.user_id
+            ).values(
+                status=TripRequestStatus.EXPIRED.name
+            ).returning(requests.c.id, users.c.fcm_token)
+        ).all()
+        self.db.commit()
+        return [tuple(row) for row in rows]
+    
+    def cancel_unmatched_rematches(self, start_before: datetime,
+                                   trip_request_ids: Optional[List[int]] = None) -> List[tuple[int, Optional[str]]]:
+        """
+        Cancel auto-rematched SCHEDULED requests (reopened after their trip was
+        cancelled) still PENDING and starting before start_before, in one statement
+        Returns (trip_request_id, user fcm_token) for each cancelled request
+        """
+        requests = TripRequest.__table__
+        users = User.__table__
+        trips = Trip.__table__
+        due = select(requests.c.id).where(
+            requests.c.mode == TripMode.SCHEDULED.name,
+            requests.c.status == TripRequestStatus.PENDING.name,
+            requests.c.scheduled_start_at <= start_before,
+            exists().where(trips.c.trip_request_id == requests.c.id)
+        )
+        if trip_request_ids is not None:
+            due = due.where(requests.c.id.in_(trip_request_ids))
+        # Rows being matched right now are skipped; the accept path decides them
+        due = due.with_for_update(skip_locked=True)
+        
+        rows = self.db.execute(
+            update(requests).where(
+                requests.c.id.in_(due.scalar_subquery()),
+                users.c.id == requests.c.user_id
+            ).values(
+                status=TripRequestStatus.CANCELLED.name
+            ).returning(requests.c.id, users.c.fcm_token)
+        ).all()
+        self.db.commit()
+        return [tuple(row) for row in rows]
+    
+    def reopen_match(self, trip_request_id: int, driver_id: int):
+        """Undo a match whose trip could not be created: the request is PENDING again, the offer rejected"""
+        self.db.execute(
+            update(TripRequest).where(
+                TripRequest.id == trip_request_id,
+                TripRequest.status == TripRequestStatus.MATCHED
+            ).values(status=TripRequestStatus.PENDING, matched_at=None)
+        )
+        self.db.execute(
+            update(TripOffer).where(
+                TripOffer.trip_request_id == trip_request_id,
+                TripOffer.driver_id == driver_id,
+                TripOffer.status == OfferStatus.ACCEPTED,
+                TripOffer.created_at >= TripOfferRepository._lookup_since()
+            ).values(status=OfferStatus.REJECTED, responded_at=func.now())
+        )
+        self.db.commit()
+    
+    def get_pending_ids(self, trip_request_ids: List[int]) -> List[int]:
+        """The subset of trip_request_ids still PENDING"""
+        if not trip_request_ids:
+            return []
+        return list(self.db.scalars(
+            select(TripRequest.id).where(
+                TripRequest.id.in_(trip_request_ids),
+                TripRequest.status == TripRequestStatus.PENDING
+            )
+        ))
 
 
 class TripOfferRepository:
+    """
+    trip_offers is partitioned by month on created_at: every query bounds
+    created_at so Postgres only touches the partitions that can match
+    """
+    
+    PARTITION_PREFIX = "trip_offers_p"
+    
     def __init__(self, db: Session):
         self.db = db
     
+    @staticmethod
+    def _lookup_since() -> datetime:
+        """Oldest offer reachable by id (accept, reject)"""
+        return datetime.now(timezone.utc) - timedelta(hours=settings.TRIP_OFFER_LOOKUP_HOURS)
+    
+    @staticmethod
+    def _live_since() -> datetime:
+        """Offers created before this are past expires_at (with a minute of clock slack)"""
+        return datetime.now(timezone.utc) - timedelta(seconds=settings.OFFER_EXPIRY_SECONDS + 60)
+    
     def get_by_id(self, offer_id: int) -> Optional[TripOffer]:
-        return self.db.query(TripOffer).filter(TripOffer.id == offer_id).first()
+        """Offers older than TRIP_OFFER_LOOKUP_HOURS are not looked up"""
+        return self.db.query(TripOffer).filter(
+            TripOffer.id == offer_id,
+            TripOffer.created_at >= self._lookup_since()
+        ).first()
     
-    def get_by_driver_id(self, driver_id: int, status: Optional[str] = None) -> List[TripOffer]:
+    def get_by_driver_id(self, driver_id: int, status: Optional[str] = None, limit: int = 50,
+                         before: Optional[tuple[datetime, int]] = None) -> List[TripOffer]:
+        """Newest first, keyset-paginated: rows strictly older than before=(created_at, id)"""
         query = self.db.query(TripOffer).filter(TripOffer.driver_id == driver_id)
         if status:
             query = query.filter(TripOffer.status == status)
-        return query.order_by(TripOffer.created_at.desc()).all()
+        if before:
+            query = query.filter(tuple_(TripOffer.created_at, TripOffer.id) < tuple_(*before))
+        return query.order_by(
+            TripOffer.created_at.desc(), TripOffer.id.desc()
+        ).limit(limit).all()
     
-    def has_offer_for_driver(self, trip_request_id: int, driver_id: int) -> bool:
-        return self.db.query(TripOffer).filter(
+    def has_offer_for_driver(self, trip_request_id: int, driver_id: int,
+                             since: Optional[datetime] = None) -> bool:
+        """since: the trip request's created_at; its offers can't be older"""
+        query = self.db.query(TripOffer).filter(
             TripOffer.trip_request_id == trip_request_id,
             TripOffer.driver_id == driver_id
-        ).first() is not None
+        )
+        if since is not None:
+            query = query.filter(TripOffer.created_at >= since)
+        return query.first() is not None
     
     def create(self, trip_request_id: int, driver_id: int, 
                offered_fare: float, expires_at: datetime) -> TripOffer:
@@ -177,6 +418,86 @@ class TripOfferRepository:
         self.db.refresh(offer)
         return offer
     
+    def create_many(self, trip_request_id: int, driver_ids: List[int],
+                    offered_fare: float, expires_at: datetime) -> List[TripOffer]:
+        """Create one offer per driver with a single multi-row INSERT ... RETURNING"""
+        if not driver_ids:
+            return []
+        
+        offers = self.db.scalars(
+            insert(TripOffer).returning(TripOffer, sort_by_parameter_order=True),
+            [
+                {
+                    "trip_request_id": trip_request_id,
+                    "driver_id": driver_id,
+                    "offered_fare": offered_fare,
+                    "expires_at": expires_at,
+                }
+                for driver_id in driver_ids
+            ]
+        ).all()
+        
+        # Detach so the RETURNING values survive commit without a refresh per offer
+        for offer in offers:
+            self.db.expunge(offer)
+        self.db.commit()
+        return offers
+    
+    def accept_pending(self, offer_id: int, driver_id: int) -> Optional[int]:
+        """
+        Accept a still-pending, unexpired offer and match its pending trip request
+        in one statement (two data-modifying CTEs)
+        Returns the trip_request_id, or None when nothing was updated
+        """
+        accepted = update(TripOffer).where(
+            TripOffer.id == offer_id,
+            TripOffer.driver_id == driver_id,
+            TripOffer.status == OfferStatus.PENDING,
+            TripOffer.created_at >= self._live_since(),
+            TripOffer.expires_at > func.now(),
+            exists().where(
+                TripRequest.id == TripOffer.trip_request_id,
+                TripRequest.status == TripRequestStatus.PENDING
+            )
+        ).values(
+            status=OfferStatus.ACCEPTED,
+            responded_at=func.now()
+        ).returning(TripOffer.trip_request_id).cte("accepted")
+        
+        matched = update(TripRequest).where(
+            TripRequest.id == accepted.c.trip_request_id
+        ).values(
+            status=TripRequestStatus.MATCHED,
+            matched_at=func.now()
+        ).returning(TripRequest.id).cte("matched")
+        
+        trip_request_id = self.db.scalar(select(matched.c.id))
+        self.db.commit()
+        return trip_request_id
+    
+    def expire_pending_for_trip_request(self, trip_request_id: int) -> List[tuple[int, int, Optional[str]]]:
+        """
+        Mark every still-pending offer of a trip request EXPIRED in one statement
+        Returns (offer_id, driver_id, driver fcm_token) for each revoked offer
+        """
+        offers = TripOffer.__table__
+        drivers = Driver.__table__
+        # Core UPDATE ... FROM drivers: the ORM variant can't RETURN columns of another table
+        rows = self.db.execute(
+            update(offers).where(
+                offers.c.trip_request_id == trip_request_id,
+                offers.c.status == OfferStatus.PENDING.name,
+                # Older pending offers already expired on their own
+                offers.c.created_at >= self._live_since(),
+                drivers.c.id == offers.c.driver_id
+            ).values(
+                status=OfferStatus.EXPIRED.name,
+                responded_at=func.now()
+            ).returning(offers.c.id, offers.c.driver_id, drivers.c.fcm_token)
+        ).all()
+        self.db.commit()
+        return [tuple(row) for row in rows]
+    
     def update_status(self, offer_id: int, status: str) -> Optional[TripOffer]:
         offer = self.get_by_id(offer_id)
         if offer:
@@ -185,6 +506,56 @@ class TripOfferRepository:
             self.db.commit()
             self.db.refresh(offer)
         return offer
+    
+    # Partition maintenance
+    def _partition_months(self) -> List[date]:
+        names = self.db.execute(text("""
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'trip_offers'::regclass
+        """)).scalars().all()
+        return sorted(
+            datetime.strptime(name[len(self.PARTITION_PREFIX):], "%Y_%m").date()
+            for name in names if name.startswith(self.PARTITION_PREFIX)
+        )
+    
+    def ensure_partitions(self, months_ahead: int) -> List[str]:
+        """Create any missing monthly partition from the current month to months_ahead; returns the new ones"""
+        existing = set(self._partition_months())
+        current = datetime.now(timezone.utc).date().replace(day=1)
+        created = []
+        for offset in range(months_ahead + 1):
+            month = _add_months(current, offset)
+            if month in existing:
+                continue
+            name = f"{self.PARTITION_PREFIX}{month:%Y_%m}"
+            self.db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF trip_offers "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+            ))
+            created.append(name)
+        self.db.commit()
+        return created
+    
+    def drop_partitions_older_than(self, retention_months: int, archive: bool = False) -> List[str]:
+        """
+        Remove whole monthly partitions before the last retention_months months, one short transaction each
+        archive=True detaches them as archived_<partition> tables instead of dropping them
+        """
+        current = datetime.now(timezone.utc).date().replace(day=1)
+        month = _add_months(current, -retention_months)
+        removed = []
+        for partition_month in self._partition_months():
+            if partition_month >= month:
+                break
+            name = f"{self.PARTITION_PREFIX}{partition_month:%Y_%m}"
+            if archive:
+                self.db.execute(text(f"ALTER TABLE trip_offers DETACH PARTITION {name}"))
+                self.db.execute(text(f"ALTER TABLE {name} RENAME TO archived_{name}"))
+            else:
+                self.db.execute(text(f"DROP TABLE {name}"))
+            self.db.commit()
+            removed.append(name)
+        return removed
 
 
 class TripRepository:
@@ -219,21 +590,181 @@ class TripRepository:
         self.db.commit()
         self.db.refresh(trip)
         return trip
+    
+    def find_confirmed_scheduled(self, start_from: datetime, start_until: datetime) -> List[tuple]:
+        """
+        (trip_id, driver_id, driver's last_location_update) of CONFIRMED scheduled
+        trips starting within [start_from, start_until]
+        """
+        rows = self.db.execute(
+            select(Trip.id, Trip.driver_id, Driver.last_location_update).join(
+                TripRequest, TripRequest.id == Trip.trip_request_id
+            ).join(
+                Driver, Driver.id == Trip.driver_id
+            ).where(
+                TripRequest.mode == TripMode.SCHEDULED,
+                Trip.status == TripStatus.CONFIRMED,
+                TripRequest.scheduled_start_at.between(start_from, start_until)
+            )
+        ).all()
+        return [tuple(row) for row in rows]
+    
+    def cancel_for_rematch(self, trip_ids: List[int], reason: str) -> List[tuple[int, int]]:
+        """
+        Cancel trips that are still CONFIRMED, reopen their requests, drop the
+        drivers' availability blocks and free drivers left without a live trip,
+        all in one transaction
+        Returns (trip_request_id, driver_id) of the reopened requests
+        """
+        if not trip_ids:
+            return []
+        trips = Trip.__table__
+        requests = TripRequest.__table__
+        blocks = DriverAvailabilityBlock.__table__
+        drivers = Driver.__table__
+        
+        cancelled = self.db.execute(
+            update(trips).where(
+                trips.c.id.in_(trip_ids),
+                trips.c.status == TripStatus.CONFIRMED.name
+            ).values(
+                status=TripStatus.CANCELLED.name,
+                cancelled_by="SYSTEM",
+                cancellation_reason=reason,
+                cancelled_at=func.now()
+            ).returning(trips.c.trip_request_id, trips.c.driver_id)
+        ).all()
+        
+        if cancelled:
+            trip_request_ids = [trip_request_id for trip_request_id, _ in cancelled]
+            self.db.execute(
+                update(requests).where(requests.c.id.in_(trip_request_ids)).values(
+                    status=TripRequestStatus.PENDING.name,
+                    pre_assigned_driver_id=None
+                )
+            )
+            self.db.execute(delete(blocks).where(blocks.c.trip_request_id.in_(trip_request_ids)))
+            # Drivers went BUSY when they took the trip; release them unless another trip is live
+            self.db.execute(
+                update(drivers).where(
+                    drivers.c.id.in_({driver_id for _, driver_id in cancelled}),
+                    drivers.c.status == DriverStatus.BUSY.name,
+                    ~exists().where(
+                        trips.c.driver_id == drivers.c.id,
+                        trips.c.status.in_([status.name for status in LIVE_TRIP_STATUSES])
+                    )
+                ).values(status=DriverStatus.ACTIVE.name)
+            )
+        self.db.commit()
+        return [tuple(row) for row in cancelled]
+    
+    def get_driver_ids_for_request(self, trip_request_id: int) -> List[int]:
+        """Drivers that already had a trip for this request (e.g. before an auto-rematch)"""
+        return self.db.execute(
+            select(Trip.driver_id).where(Trip.trip_request_id == trip_request_id)
+        ).scalars().all()
+
+
+class TripReminderRepository:
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def claim_due(self, offsets_minutes: List[int], grace_minutes: int, limit: int = 500,
+                  commit: bool = True):
+        """
+        Record every reminder that is due and not sent yet, in one statement
+        A reminder is due from scheduled_start_at - offset until grace_minutes later;
+        ON CONFLICT keeps concurrent or repeated runs from claiming it twice
+        (with commit=False a concurrent claim waits for this transaction)
+        Returns rows of (trip_request_id, offset_minutes, trip_id, pickup_address,
+        dropoff_address, driver_fcm_token, user_fcm_token)
+        """
+        offsets = values(column("offset_minutes", Integer), name="offsets").data(
+            [(offset,) for offset in sorted(set(offsets_minutes))]
+        )
+        remind_at = TripRequest.scheduled_start_at - literal_column("interval '1 minute'") * offsets.c.offset_minutes
+        now = func.now()
+        
+        due = select(
+            TripRequest.id.label("trip_request_id"),
+            offsets.c.offset_minutes,
+            Trip.id.label("trip_id"),
+            Trip.pickup_address,
+            Trip.dropoff_address,
+            Driver.fcm_token.label("driver_fcm_token"),
+            User.fcm_token.label("user_fcm_token")
+        ).select_from(TripRequest).join(
+            Trip, Trip.trip_request_id == TripRequest.id
+        ).join(
+            Driver, Driver.id == Trip.driver_id
+        ).join(
+            User, User.id == TripRequest.user_id
+        ).join(
+            offsets, true()
+        ).where(
+            TripRequest.mode == TripMode.SCHEDULED,
+            TripRequest.status == TripRequestStatus.MATCHED,
+            Trip.status != TripStatus.CANCELLED,
+            TripRequest.scheduled_start_at > now,
+            remind_at <= now,
+            remind_at > now - literal_column("interval '1 minute'") * grace_minutes,
+            ~exists().where(
+                TripReminder.trip_request_id == TripRequest.id,
+                TripReminder.offset_minutes == offsets.c.offset_minutes
+            )
+        ).limit(limit).cte("due")
+        
+        sent = pg_insert(TripReminder).from_select(
+            ["trip_request_id", "offset_minutes"],
+            select(due.c.trip_request_id, due.c.offset_minutes)
+        ).on_conflict_do_nothing().returning(
+            TripReminder.trip_request_id, TripReminder.offset_minutes
+        ).cte("sent")
+        
+        rows = self.db.execute(
+            select(due).join(sent, and_(
+                sent.c.trip_request_id == due.c.trip_request_id,
+                sent.c.offset_minutes == due.c.offset_minutes
+            ))
+        ).all()
+        if commit:
+            self.db.commit()
+        return rows
+    
+    def get_sent_offsets(self, trip_request_id: int) -> List[int]:
+        """Offsets (minutes) of the reminders already sent for a trip request"""
+        return self.db.execute(
+            select(TripReminder.offset_minutes).where(TripReminder.trip_request_id == trip_request_id)
+        ).scalars().all()
 
 
 class WalletTransactionRepository:
     def __init__(self, db: Session):
         self.db = db
     
-    def create(self, driver_id: int, type: str, amount: float, 
+    def create(self, driver_id: int, type: str, amount: Decimal, 
                trip_id: Optional[int] = None, description: Optional[str] = None,
-               reference: Optional[str] = None) -> WalletTransaction:
+               reference: Optional[str] = None, commit: bool = True) -> WalletTransaction:
+        """
+        Append a ledger entry and apply it to the driver balance atomically
+        The balance is incremented in SQL under the row lock, so concurrent
+        operations never overwrite each other. Pass commit=False to add more
+        changes to the same transaction.
+        """
+        balance_after = self.db.execute(
+            update(Driver)
+            .where(Driver.id == driver_id)
+            .values(wallet_balance=Driver.wallet_balance + amount)
+            .returning(Driver.wallet_balance)
+            .execution_options(synchronize_session=False)
+        ).scalar_one_or_none()
+        if balance_after is None:
+            raise ValueError("Driver not found")
         
-        # Get current balance
-        from app.repositories import DriverRepository
-        driver_repo = DriverRepository(self.db)
-        driver = driver_repo.get_by_id(driver_id)
-        balance_after = driver.wallet_balance + amount
+        # Keep an already loaded driver in step with the new balance
+        driver = self.db.identity_map.get(self.db.identity_key(Driver, driver_id))
+        if driver is not None:
+            set_committed_value(driver, "wallet_balance", balance_after)
         
         transaction = WalletTransaction(
             driver_id=driver_id,
@@ -246,11 +777,11 @@ class WalletTransactionRepository:
         )
         self.db.add(transaction)
         
-        # Update driver balance
-        driver.wallet_balance = balance_after
-        
-        self.db.commit()
-        self.db.refresh(transaction)
+        if commit:
+            self.db.commit()
+            self.db.refresh(transaction)
+        else:
+            self.db.flush()
         return transaction
     
     def get_by_driver_id(self, driver_id: int, limit: int = 50, offset: int = 0) -> List[WalletTransaction]:
@@ -267,15 +798,52 @@ class DriverAvailabilityRepository:
     
     def has_conflict(self, driver_id: int, start_time: datetime, end_time: datetime) -> bool:
         """Check if driver has conflicting availability blocks"""
-        conflicts = self.db.query(DriverAvailabilityBlock).filter(
+        return self.db.query(exists().where(
             DriverAvailabilityBlock.driver_id == driver_id,
-            DriverAvailabilityBlock.start_time < end_time,
-            DriverAvailabilityBlock.end_time > start_time
-        ).first()
-        return conflicts is not None
+            DriverAvailabilityBlock.time_range.overlaps(_time_range_sql(start_time, end_time))
+        )).scalar()
+    
+    def has_conflicts(self, windows: List[tuple[int, datetime, datetime]]) -> List[bool]:
+        """
+        Check many (driver_id, start_time, end_time) windows in one query
+        Returns one flag per window, in input order
+        """
+        if not windows:
+            return []
+        
+        candidates = values(
+            column("idx", Integer),
+            column("driver_id", Integer),
+            column("start_time", DateTime(timezone=True)),
+            column("end_time", DateTime(timezone=True)),
+            name="w"
+        ).data([(idx, *window) for idx, window in enumerate(windows)])
+        
+        conflicting = {
+            idx for (idx,) in self.db.query(candidates.c.idx).filter(exists().where(
+                DriverAvailabilityBlock.driver_id == candidates.c.driver_id,
+                DriverAvailabilityBlock.time_range.overlaps(
+                    _time_range_sql(candidates.c.start_time, candidates.c.end_time)
+                )
+            ))
+        }
+        return [idx in conflicting for idx in range(len(windows))]
+    
+    def has_block_for(self, driver_id: int, trip_request_id: int) -> bool:
+        """Whether the driver's calendar already holds this trip request (e.g. pre-assigned)"""
+        return self.db.query(exists().where(
+            DriverAvailabilityBlock.driver_id == driver_id,
+            DriverAvailabilityBlock.trip_request_id == trip_request_id
+        )).scalar()
     
     def create(self, driver_id: int, trip_request_id: int, 
-               start_time: datetime, end_time: datetime, reason: str) -> DriverAvailabilityBlock:
+               start_time: datetime, end_time: datetime, reason: str,
+               commit: bool = True) -> DriverAvailabilityBlock:
+        """
+        Raises IntegrityError when the block overlaps another block of the driver
+        (ex_driver_availability_blocks_no_overlap), even under concurrent inserts
+        With commit=False the block is only flushed, into the caller's transaction
+        """
         block = DriverAvailabilityBlock(
             driver_id=driver_id,
             trip_request_id=trip_request_id,
@@ -284,8 +852,11 @@ class DriverAvailabilityRepository:
             reason=reason
         )
         self.db.add(block)
-        self.db.commit()
-        self.db.refresh(block)
+        if commit:
+            self.db.commit()
+            self.db.refresh(block)
+        else:
+            self.db.flush()
         return block
     
     def delete_by_trip_request(self, trip_request_id: int):
@@ -293,3 +864,19 @@ class DriverAvailabilityRepository:
             DriverAvailabilityBlock.trip_request_id == trip_request_id
         ).delete()
         self.db.commit()
+    
+    def delete_ended_before(self, cutoff: datetime, limit: int = 1000) -> int:
+        """
+        Delete up to `limit` blocks that ended before cutoff, oldest first, in their own transaction
+        Keeps each delete's locks and WAL small; returns the number of rows deleted
+        """
+        blocks = DriverAvailabilityBlock.__table__
+        batch = select(blocks.c.id).where(
+            blocks.c.end_time < cutoff
+        ).order_by(blocks.c.end_time).limit(limit).with_for_update(skip_locked=True)
+        
+        deleted = self.db.execute(
+            delete(blocks).where(blocks.c.id.in_(batch.scalar_subquery()))
+        ).rowcount
+        self.db.commit()
+        return deleted
@@ -0,0 +1,69 @@
+"""
+Async repository variants used by the async endpoints
+Reuse the sync repositories: on an AsyncSession they run through run_sync (asyncpg),
+on a sync Session they run in the threadpool, so the event loop never blocks on the DB
+"""
+from datetime import datetime
+from typing import List, Optional, Union
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models import TripRequest, TripOffer, Trip
+from app.repositories import TripRequestRepository, TripOfferRepository, TripRepository
+
+
+class AsyncRepository:
+    """Runs a sync repository call on whichever session flavour it was given"""
+
+    repository_class = None
+
+    def __init__(self, db: Union[AsyncSession, Session]):
+        self.db = db
+
+    async def _call(self, method: str, *args, **kwargs):
+        def call(session: Session):
+            return getattr(self.repository_class(session), method)(*args, **kwargs)
+
+        if isinstance(self.db, AsyncSession):
+            return await self.db.run_sync(call)
+        return await run_in_threadpool(call, self.db)
+
+
+class AsyncTripRequestRepository(AsyncRepository):
+    repository_class = TripRequestRepository
+
+    async def get_by_id(self, trip_request_id: int) -> Optional[TripRequest]:
+        return await self._call("get_by_id", trip_request_id)
+
+    async def get_by_user_id(self, user_id: int, status: Optional[str] = None, limit: int = 50,
+                             before: Optional[tuple[datetime, int]] = None) -> List[TripRequest]:
+        return await self._call("get_by_user_id", user_id, status=status, limit=limit, before=before)
+
+
+class AsyncTripOfferRepository(AsyncRepository):
+    repository_class = TripOfferRepository
+
+    async def get_by_id(self, offer_id: int) -> Optional[TripOffer]:
+        return await self._call("get_by_id", offer_id)
+
+    async def get_by_driver_id(self, driver_id: int, status: Optional[str] = None, limit: int = 50,
+                               before: Optional[tuple[datetime, int]] = None) -> List[TripOffer]:
+        return await self._call("get_by_driver_id", driver_id, status=status, limit=limit, before=before)
+
+    async def has_offer_for_driver(self, trip_request_id: int, driver_id: int,
+                                   since: Optional[datetime] = None) -> bool:
+        return await self._call("has_offer_for_driver", trip_request_id, driver_id, since=since)
+
+    async def update_status(self, offer_id: int, status: str) -> Optional[TripOffer]:
+        return await self._call("update_status", offer_id, status)
+
+
+class AsyncTripRepository(AsyncRepository):
+    repository_class = TripRepository
+
+    async def get_by_id(self, trip_id: int) -> Optional[Trip]:
+        return await self._call("get_by_id", trip_id)
+
+    async def get_by_driver_id(self, driver_id: int) -> List[Trip]:
+        return await self._call("get_by_driver_id", driver_id)
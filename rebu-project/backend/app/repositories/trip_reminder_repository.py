@@ -0,0 +1 @@
+from app.repositories import TripReminderRepository
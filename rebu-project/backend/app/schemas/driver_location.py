@@ -0,0 +1,15 @@
+"""
+Driver location schemas
+"""
+from pydantic import BaseModel, Field
+from datetime import datetime
+
+
+class LocationPoint(BaseModel):
+    lat: float = Field(..., ge=-90, le=90)
+    lon: float = Field(..., ge=-180, le=180)
+    recorded_at: datetime  # When the device took the fix (UTC if no offset)
+
+
+class LocationBatchRequest(BaseModel):
+    points: list[LocationPoint] = Field(..., min_length=1, max_length=1000)
@@ -78,3 +78,4 @@ class TripRequestResponse(BaseModel):
 class TripRequestListResponse(BaseModel):
     total: int
     items: list[TripRequestResponse]
+    next_cursor: Optional[str] = None
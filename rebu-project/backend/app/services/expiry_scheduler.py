@@ -0,0 +1,97 @@
+"""
+Expiry Scheduler - Expires ON_DEMAND trip requests when their Redis timer fires
+"""
+import asyncio
+import time
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import metrics
+from app.core.redis_client import async_redis_client
+from app.repositories import TripRequestRepository
+
+
+class ExpiryScheduler:
+    """
+    Redis sorted set of trip request ids scored by expires_at.
+    Every process polls it; due ids are popped atomically and expired in
+    one bulk UPDATE per batch. Popped ids that are still PENDING afterwards
+    (row locked by an accept, DB clock behind ours, failed UPDATE) are put
+    back with a short delay. The background sweep catches timers lost in Redis.
+    """
+
+    def __init__(self, poll_seconds: float = 1.0, batch_size: int = 500, retry_seconds: float = 5.0):
+        self.poll_seconds = poll_seconds
+        self.batch_size = batch_size
+        self.retry_seconds = retry_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None
+
+    async def start(self):
+        """Start polling for due expiries on the running event loop"""
+        if self.is_running:
+            return
+        self._task = asyncio.create_task(self._run(), name="expiry-scheduler")
+        print("✅ Expiry scheduler started")
+
+    async def stop(self):
+        if not self.is_running:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        while True:
+            due = []
+            try:
+                due = await async_redis_client.take_due_trip_expiries(time.time(), self.batch_size)
+                if due:
+                    await self.expire_batch(due)
+            except Exception as e:
+                print(f"❌ Expiry scheduler failed: {e}")
+
+            # A full batch means more may already be due
+            if len(due) < self.batch_size:
+                await asyncio.sleep(self.poll_seconds)
+
+    async def expire_batch(self, trip_request_ids: list[int]):
+        """Expire popped timers; re-arm the ones that are still pending"""
+        try:
+            retry = await run_in_threadpool(self.expire, trip_request_ids)
+        except Exception as e:
+            print(f"❌ Failed to expire {len(trip_request_ids)} trip requests, retrying: {e}")
+            retry = trip_request_ids
+
+        if retry:
+            metrics.incr("trip_requests.expiry_retried", len(retry))
+            await async_redis_client.schedule_trip_expiries(retry, time.time() + self.retry_seconds)
+
+    @staticmethod
+    def expire(trip_request_ids: list[int]) -> list[int]:
+        """Expire the given requests; returns those still PENDING"""
+        from app.services.trip_service import TripService
+
+        db = SessionLocal()
+        try:
+            TripService(db).expire_pending_requests(trip_request_ids)
+            return TripRequestRepository(db).get_pending_ids(trip_request_ids)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+# Singleton instance
+expiry_scheduler = ExpiryScheduler(
+    poll_seconds=settings.TRIP_EXPIRY_POLL_SECONDS,
+    batch_size=settings.TRIP_EXPIRY_BATCH_SIZE,
+    retry_seconds=settings.TRIP_EXPIRY_RETRY_SECONDS
+)
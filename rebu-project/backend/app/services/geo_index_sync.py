@@ -0,0 +1,56 @@
+"""
+Geo Index Sync - Periodically resyncs the in-process driver geo index with Redis
+"""
+import asyncio
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.geo_index import driver_geo_index
+
+
+class GeoIndexSync:
+    """
+    Rebuilds the driver grid from Redis drivers:online on the running event loop.
+    Runs in every process that matches (API or worker), independent of the
+    background workers, so drivers that went offline leave every grid.
+    """
+
+    def __init__(self, interval_seconds: float = 30):
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None
+
+    async def start(self):
+        """Load the index once, then keep it in sync"""
+        if self.is_running or not settings.DRIVER_GEO_INDEX_ENABLED:
+            return
+        try:
+            count = await run_in_threadpool(driver_geo_index.rebuild_from_redis)
+            print(f"✅ Driver geo index loaded ({count} drivers)")
+        except Exception as e:
+            print(f"❌ Failed to load driver geo index: {e}")
+        self._task = asyncio.create_task(self._run(), name="geo-index-sync")
+
+    async def stop(self):
+        if not self.is_running:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await run_in_threadpool(driver_geo_index.rebuild_from_redis)
+            except Exception as e:
+                print(f"❌ Failed to resync driver geo index: {e}")
+
+
+# Singleton instance
+geo_index_sync = GeoIndexSync(interval_seconds=settings.DRIVER_GEO_INDEX_REBUILD_SECONDS)
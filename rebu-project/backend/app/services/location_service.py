@@ -0,0 +1,160 @@
+"""
+Location Service - Driver location ingestion with write-behind to Postgres
+"""
+import time
+from datetime import datetime, timezone
+from typing import Optional
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.geo_index import driver_geo_index, haversine_km
+from app.core.metrics import metrics
+from app.core.redis_client import (
+    redis_client, async_redis_client,
+    LOCATION_BUFFERED, LOCATION_COALESCED, LOCATION_DROPPED_STALE, LOCATION_DROPPED_FULL
+)
+from app.repositories.driver_repository import DriverRepository
+
+
+_BUFFER_OUTCOME_METRICS = {
+    LOCATION_BUFFERED: "locations.buffered",
+    LOCATION_COALESCED: "locations.coalesced",
+    LOCATION_DROPPED_STALE: "locations.dropped_stale",
+    LOCATION_DROPPED_FULL: "locations.dropped_buffer_full",
+}
+
+
+class LocationService:
+    """
+    Redis is the live store for driver positions; pings are buffered there
+    and flushed to drivers.last_known_* in periodic bulk batches
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.driver_repo = DriverRepository(db)
+
+    async def record_location(
+        self,
+        driver_id: int,
+        status: str,
+        lat: float,
+        lon: float,
+        recorded_at: Optional[float] = None
+    ) -> int:
+        """Store a location ping in Redis and queue it for the DB flush"""
+        recorded_at = recorded_at or time.time()
+        return await self._record(driver_id, status, [(lat, lon, recorded_at)])
+
+    async def record_location_batch(
+        self,
+        driver_id: int,
+        status: str,
+        points: list[tuple[float, float, datetime]]
+    ) -> int:
+        """
+        Store buffered GPS points [(lat, lon, recorded_at)] replayed by a driver app
+        Only the newest point updates the live position; all of them go to the trail
+        """
+        now = time.time()
+        trail = sorted(
+            ((lat, lon, min(_to_epoch(recorded_at), now))  # Clamp device clock skew
+             for lat, lon, recorded_at in points),
+            key=lambda p: p[2]
+        )
+        metrics.incr("locations.batch_points", len(trail))
+        return await self._record(driver_id, status, trail)
+
+    async def _record(self, driver_id: int, status: str, trail: list[tuple[float, float, float]]) -> int:
+        lat, lon, recorded_at = trail[-1]
+        outcome = await async_redis_client.update_driver_location(
+            driver_id,
+            lat,
+            lon,
+            status,
+            recorded_at=recorded_at,
+            buffer_max_size=settings.DRIVER_LOCATION_BUFFER_MAX_SIZE,
+            trail=trail,
+            trail_max_points=settings.DRIVER_TRAIL_MAX_POINTS,
+            trail_ttl_seconds=settings.DRIVER_TRAIL_TTL_SECONDS
+        )
+        metrics.incr(_BUFFER_OUTCOME_METRICS[outcome])
+
+        # Keep the in-process geo index current (a stale ping must not move it back)
+        if settings.DRIVER_GEO_INDEX_ENABLED and outcome != LOCATION_DROPPED_STALE:
+            driver_geo_index.upsert(driver_id, lat, lon)
+
+        return outcome
+
+    @staticmethod
+    def remove_offline_drivers() -> int:
+        """
+        Remove drivers whose last ping is older than DRIVER_ONLINE_WINDOW_SECONDS
+        from Redis and the in-process geo index
+        Returns the number of drivers removed
+        """
+        removed = redis_client.remove_offline_drivers(time.time() - settings.DRIVER_ONLINE_WINDOW_SECONDS)
+        for driver_id in removed:
+            driver_geo_index.remove(driver_id)
+        metrics.incr("drivers.went_offline", len(removed))
+        return len(removed)
+
+    def flush_buffered_locations(self) -> int:
+        """
+        Write the latest buffered position per driver to Postgres
+        Returns the number of drivers updated
+        """
+        buffered = redis_client.take_buffered_driver_locations()
+        if not buffered:
+            return 0
+
+        rows = [
+            (driver_id, lat, lon, datetime.fromtimestamp(recorded_at, timezone.utc))
+            for driver_id, (lat, lon, recorded_at) in buffered.items()
+        ]
+        batch_size = settings.DRIVER_LOCATION_FLUSH_BATCH_SIZE
+        updated = 0
+
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            try:
+                with metrics.timer("locations.flush_batch_ms"):
+                    updated += self.driver_repo.bulk_update_locations(batch)
+            except Exception:
+                self.db.rollback()
+                remaining = {driver_id: buffered[driver_id] for driver_id, *_ in rows[start:]}
+                redis_client.restore_buffered_driver_locations(remaining)
+                raise
+
+        metrics.incr("locations.flushed", len(rows))
+        return updated
+
+    def get_trail_distance_km(
+        self,
+        driver_id: int,
+        since: datetime,
+        until: Optional[datetime] = None
+    ) -> Optional[float]:
+        """
+        Distance covered along the driver's GPS trail between two instants
+        Returns None when the trail has no points in that window
+        """
+        until_ts = _to_epoch(until) if until else None
+        points = [
+            (lat, lon)
+            for lat, lon, recorded_at in redis_client.get_driver_trail(driver_id, since=_to_epoch(since))
+            if until_ts is None or recorded_at <= until_ts
+        ]
+        if not points:
+            return None
+        return sum(
+            haversine_km(lat1, lon1, lat2, lon2)
+            for (lat1, lon1), (lat2, lon2) in zip(points, points[1:])
+        )
+
+
+def _to_epoch(value: datetime) -> float:
+    """Epoch seconds, treating naive datetimes as UTC"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
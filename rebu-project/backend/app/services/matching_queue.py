@@ -0,0 +1,137 @@
+"""
+Matching Queue - Redis stream of matching jobs consumed by a worker pool
+"""
+import asyncio
+import os
+import socket
+import time
+from typing import Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis_client import async_redis_client
+
+
+class MatchingQueueFull(Exception):
+    """The matching backlog reached MATCHING_QUEUE_MAX_LENGTH"""
+
+
+class MatchingQueue:
+    """
+    Producers add (trip_request_id, wave) jobs to a stream; consumers in a
+    group run them, so each job is handled by one worker across all processes.
+    Unacknowledged jobs of dead consumers are reclaimed after claim_idle_seconds.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        max_length: int = 10000,
+        block_ms: int = 1000,
+        claim_idle_seconds: int = 60
+    ):
+        self.workers = workers
+        self.max_length = max_length
+        self.block_ms = block_ms
+        self.claim_idle_seconds = claim_idle_seconds
+        self._consumer_prefix = f"{socket.gethostname()}-{os.getpid()}"
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._tasks)
+
+    async def depth(self) -> int:
+        """Jobs waiting or in progress"""
+        depth = await async_redis_client.get_matching_stream_length()
+        metrics.set_gauge("matching.queue.depth", depth)
+        return depth
+
+    async def has_capacity(self) -> bool:
+        return await self.depth() < self.max_length
+
+    async def enqueue(self, trip_request_id: int, wave_number: int = 1):
+        """Queue a matching wave; raises MatchingQueueFull when the backlog is at capacity"""
+        if not await self.has_capacity():
+            metrics.incr("matching.queue.rejected_full")
+            raise MatchingQueueFull()
+
+        await async_redis_client.add_matching_job({
+            "trip_request_id": trip_request_id,
+            "wave": wave_number,
+            "enqueued_at": time.time(),
+        })
+        metrics.incr("matching.queue.enqueued")
+
+    async def start(self, workers: Optional[int] = None):
+        """Start the consumers on the running event loop"""
+        workers = self.workers if workers is None else workers
+        if self.is_running or workers <= 0:
+            return
+        await async_redis_client.ensure_matching_stream_group()
+        self._tasks = [
+            asyncio.create_task(self._worker(f"{self._consumer_prefix}-{i}"), name=f"matching-worker-{i}")
+            for i in range(workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._reclaimer(), name="matching-reclaimer"))
+        print(f"✅ Matching queue started ({workers} workers)")
+
+    async def stop(self):
+        if not self.is_running:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self, consumer: str):
+        while True:
+            try:
+                jobs = await async_redis_client.read_matching_jobs(consumer, count=1, block_ms=self.block_ms)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Matching worker {consumer} failed to read jobs: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            for message_id, fields in jobs:
+                await self._process(message_id, fields)
+
+    async def _reclaimer(self):
+        consumer = f"{self._consumer_prefix}-reclaimer"
+        while True:
+            await asyncio.sleep(self.claim_idle_seconds)
+            try:
+                jobs = await async_redis_client.claim_stale_matching_jobs(
+                    consumer, min_idle_ms=self.claim_idle_seconds * 1000, count=100
+                )
+            except Exception as e:
+                print(f"❌ Failed to reclaim matching jobs: {e}")
+                continue
+
+            metrics.incr("matching.queue.reclaimed", len(jobs))
+            for message_id, fields in jobs:
+                await self._process(message_id, fields)
+
+    async def _process(self, message_id: str, fields: dict):
+        from app.services.wave_scheduler import wave_scheduler
+
+        started = time.time()
+        metrics.observe("matching.queue.wait_ms", (started - float(fields["enqueued_at"])) * 1000)
+        try:
+            await wave_scheduler.run_wave(int(fields["trip_request_id"]), int(fields["wave"]))
+            metrics.incr("matching.queue.processed")
+        finally:
+            metrics.observe("matching.job_ms", (time.time() - started) * 1000)
+            await async_redis_client.ack_matching_job(message_id)
+            await self.depth()
+
+
+# Singleton instance
+matching_queue = MatchingQueue(
+    workers=settings.MATCHING_WORKERS,
+    max_length=settings.MATCHING_QUEUE_MAX_LENGTH,
+    block_ms=settings.MATCHING_QUEUE_BLOCK_MS,
+    claim_idle_seconds=settings.MATCHING_QUEUE_CLAIM_IDLE_SECONDS
+)
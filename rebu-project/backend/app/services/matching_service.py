@@ -1,26 +1,31 @@
 """
 Matching Service - Handles driver-trip matching logic
 """
+import time
 from typing import Optional
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
-from app.core.redis_client import redis_client
-from app.models import TripRequest, Driver, TripOffer, DriverStatus
+from app.core.redis_client import async_redis_client, CLAIM_TAKEN, CLAIM_NO_OFFER
+from app.core.geo_index import driver_geo_index
+from app.core.metrics import metrics
+from app.models import TripRequest, Driver, TripOffer, DriverStatus, OfferStatus
 from app.repositories.driver_repository import DriverRepository
 from app.repositories.trip_offer_repository import TripOfferRepository
-from app.services.notification_service import NotificationService
+from app.services.notification_service import NotificationService, get_notification_service
 
 
 class MatchingService:
     """Service for matching drivers with trip requests"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, notification_service: Optional[NotificationService] = None):
         self.db = db
         self.driver_repo = DriverRepository(db)
         self.offer_repo = TripOfferRepository(db)
-        self.notification_service = NotificationService()
+        self.notification_service = notification_service or get_notification_service()
     
     async def find_drivers_for_on_demand_trip(
         self,
@@ -39,35 +44,42 @@ class MatchingService:
         }
         radius_km = radius_map.get(wave_number, settings.MATCHING_RADIUS_KM)
         
-        # Get nearby drivers from Redis
-        nearby = redis_client.get_nearby_drivers(
-            trip_request.pickup_lat,
-            trip_request.pickup_lon,
-            radius_km,
-            count=10  # Limit to 10 drivers per wave
-        )
-        
-        if not nearby:
-            return []
-        
-        # Get driver IDs that already have pending offers
-        pending_offer_driver_ids = redis_client.get_pending_offers(trip_request.id)
+        # Get nearby drivers (in-process index or Redis) and drivers already offered
+        if settings.DRIVER_GEO_INDEX_ENABLED:
+            nearby = driver_geo_index.get_nearby_drivers(
+                trip_request.pickup_lat,
+                trip_request.pickup_lon,
+                radius_km,
+                count=10  # Limit to 10 drivers per wave
+            )
+            if not nearby:
+                return []
+            pending_offer_driver_ids = await async_redis_client.get_pending_offers(trip_request.id)
+        else:
+            nearby, pending_offer_driver_ids = await async_redis_client.get_nearby_drivers_with_pending_offers(
+                trip_request.id,
+                trip_request.pickup_lat,
+                trip_request.pickup_lon,
+                radius_km,
+                count=10  # Limit to 10 drivers per wave
+            )
+            if not nearby:
+                return []
         
-        # Fetch driver details from DB and filter
+        # Fetch driver details from DB and filter, off the event loop
         driver_ids = [n["driver_id"] for n in nearby]
-        drivers = self.driver_repo.get_by_ids(driver_ids)
-        
-        # Filter: must be ACTIVE, not already sent offer, within credit limit
-        available_drivers = []
-        for driver in drivers:
+        return await run_in_threadpool(self._filter_available_drivers, driver_ids, pending_offer_driver_ids)
+    
+    def _filter_available_drivers(self, driver_ids: list[int], pending_offer_driver_ids) -> list[Driver]:
+        """Drivers that are ACTIVE, not already sent an offer and within their credit limit"""
+        return [
+            driver for driver in self.driver_repo.get_by_ids(driver_ids)
             if (
                 driver.status == DriverStatus.ACTIVE
                 and driver.id not in pending_offer_driver_ids
                 and driver.is_within_credit_limit
-            ):
-                available_drivers.append(driver)
-        
-        return available_drivers
+            )
+        ]
     
     async def send_offers_to_drivers(
         self,
@@ -76,40 +88,79 @@ class MatchingService:
     ) -> list[TripOffer]:
         """
         Send trip offers to drivers
-        Creates TripOffer records and sends FCM notifications
+        One bulk INSERT for the offers, one Redis pipeline, notifications queued
         """
         if not drivers:
             return []
         
-        offers = []
+        started = time.perf_counter()
+        trip_request_id = trip_request.id
+        created_at = trip_request.created_at
         expires_at = datetime.utcnow() + timedelta(seconds=settings.OFFER_EXPIRY_SECONDS)
+        driver_ids = [driver.id for driver in drivers]
+        fcm_tokens = {driver.id: driver.fcm_token for driver in drivers}
         
-        for driver in drivers:
-            # Create offer
-            offer = self.offer_repo.create(
-                trip_request_id=trip_request.id,
-                driver_id=driver.id,
-                offered_fare=trip_request.estimated_fare,
-                expires_at=expires_at
-            )
-            offers.append(offer)
-            
-            # Track in Redis
-            redis_client.add_pending_offer(
-                trip_request.id,
-                driver.id,
-                settings.OFFER_EXPIRY_SECONDS
-            )
-            
-            # Send FCM notification
-            if driver.fcm_token:
-                await self.notification_service.send_trip_offer_notification(
-                    driver.fcm_token,
+        # Create offers
+        offers = await run_in_threadpool(
+            self.offer_repo.create_many,
+            trip_request_id=trip_request_id,
+            driver_ids=driver_ids,
+            offered_fare=trip_request.estimated_fare,
+            expires_at=expires_at
+        )
+        insert_done = time.perf_counter()
+        
+        # Track in Redis
+        await async_redis_client.add_pending_offers(
+            trip_request_id,
+            driver_ids,
+            settings.OFFER_EXPIRY_SECONDS
+        )
+        redis_done = time.perf_counter()
+        
+        # Queue FCM notifications (reading the committed trip request reloads it)
+        await run_in_threadpool(self._notify_offers, trip_request, offers, fcm_tokens)
+        notify_done = time.perf_counter()
+        
+        self._record_fanout_latency(
+            trip_request_id,
+            len(offers),
+            created_at,
+            insert_ms=(insert_done - started) * 1000,
+            redis_ms=(redis_done - insert_done) * 1000,
+            notify_ms=(notify_done - redis_done) * 1000,
+            total_ms=(notify_done - started) * 1000,
+        )
+        
+        return offers
+    
+    def _notify_offers(self, trip_request: TripRequest, offers: list[TripOffer], fcm_tokens: dict[int, str]):
+        for offer in offers:
+            if fcm_tokens[offer.driver_id]:
+                self.notification_service.send_trip_offer_notification(
+                    fcm_tokens[offer.driver_id],
                     trip_request,
                     offer
                 )
+    
+    def _record_fanout_latency(
+        self,
+        trip_request_id: int,
+        offer_count: int,
+        created_at: Optional[datetime],
+        **stages_ms: float
+    ):
+        """Record per-stage fan-out latency and time since the trip request was created"""
+        for stage, value in stages_ms.items():
+            metrics.observe(f"offers.fanout.{stage}", value)
         
-        return offers
+        if created_at is not None:
+            now = datetime.now(timezone.utc) if created_at.tzinfo else datetime.utcnow()
+            stages_ms["since_created_ms"] = (now - created_at).total_seconds() * 1000
+            metrics.observe("offers.fanout.since_created_ms", stages_ms["since_created_ms"])
+        
+        timings = " ".join(f"{stage}={value:.1f}" for stage, value in stages_ms.items())
+        print(f"⏱️  Sent {offer_count} offers for trip request {trip_request_id}: {timings}")
     
     async def accept_offer(
         self,
@@ -118,74 +169,122 @@ class MatchingService:
     ) -> Optional[TripOffer]:
         """
         Driver accepts an offer
-        Uses Redis lock to prevent double acceptance
+        A Redis claim picks exactly one winner; Postgres is then updated with one conditional UPDATE
         """
-        offer = self.offer_repo.get_by_id(offer_id)
+        started = time.perf_counter()
         
+        offer = await run_in_threadpool(self.offer_repo.get_by_id, offer_id)
         if not offer or offer.driver_id != driver_id:
             return None
         
-        if offer.is_expired:
-            return None
+        if offer.status == OfferStatus.ACCEPTED:
+            # Retry of an accept that already went through (even if the claim has lapsed)
+            metrics.incr("offers.accept.repeated")
+            return offer
         
-        # Try to acquire lock
-        lock_acquired = redis_client.acquire_trip_lock(
-            offer.trip_request_id,
-            timeout_seconds=10
+        trip_request_id = offer.trip_request_id
+        outcome, other_driver_ids = await async_redis_client.claim_trip_offer(
+            trip_request_id,
+            driver_id,
+            claim_ttl_seconds=settings.OFFER_CLAIM_TTL_SECONDS
         )
+        metrics.observe("offers.accept.claim_ms", (time.perf_counter() - started) * 1000)
         
-        if not lock_acquired:
+        if outcome == CLAIM_TAKEN:
             # Another driver already accepted
+            metrics.incr("offers.accept.lost")
+            return None
+        if outcome == CLAIM_NO_OFFER:
+            metrics.incr("offers.accept.no_pending_offer")
             return None
         
         try:
-            # Update offer status
-            offer = self.offer_repo.update_status(offer.id, "ACCEPTED")
-            
-            # Update trip request status
-            trip_request = offer.trip_request
-            trip_request.status = "MATCHED"
-            trip_request.matched_at = datetime.utcnow()
-            self.db.commit()
-            
-            # Clear pending offers from Redis
-            redis_client.clear_pending_offers(offer.trip_request_id)
-            
-            return offer
+            matched_trip_request_id = await run_in_threadpool(self.offer_repo.accept_pending, offer.id, driver_id)
+        except Exception:
+            await run_in_threadpool(self.db.rollback)
+            await async_redis_client.release_trip_claim(
+                trip_request_id, driver_id, [driver_id, *other_driver_ids], settings.OFFER_EXPIRY_SECONDS
+            )
+            raise
         
+        if matched_trip_request_id is None:
+            await run_in_threadpool(self.db.refresh, offer)
+            if offer.status == OfferStatus.ACCEPTED:
+                # Retry of an accept that already went through; keep the claim
+                metrics.incr("offers.accept.repeated")
+                return offer
+            # Offer expired or trip no longer pending: let the other drivers try
+            await async_redis_client.release_trip_claim(
+                trip_request_id, driver_id, other_driver_ids, settings.OFFER_EXPIRY_SECONDS
+            )
+            metrics.incr("offers.accept.stale")
+            return None
+        
+        metrics.incr("offers.accept.won")
+        metrics.observe("offers.accept.total_ms", (time.perf_counter() - started) * 1000)
+        
+        await run_in_threadpool(self.revoke_losing_offers, trip_request_id)
+        await run_in_threadpool(self.db.refresh, offer)
+        return offer
+    
+    def revoke_losing_offers(self, trip_request_id: int) -> int:
+        """
+        Expire the other drivers' pending offers after a match and tell them it was taken
+        so their apps stop polling and retrying the accept
+        """
+        try:
+            revoked = self.offer_repo.expire_pending_for_trip_request(trip_request_id)
         except Exception as e:
-            redis_client.release_trip_lock(offer.trip_request_id)
-            raise e
+            # Offers still expire on their own; the accept already succeeded
+            self.db.rollback()
+            print(f"⚠️  Failed to revoke offers for trip request {trip_request_id}: {e}")
+            return 0
+        
+        for offer_id, _, fcm_token in revoked:
+            if fcm_token:
+                self.notification_service.send_offer_taken_notification(fcm_token, trip_request_id, offer_id)
+        
+        metrics.incr("offers.revoked", len(revoked))
+        return len(revoked)
     
     async def find_available_drivers_for_scheduled_trip(
         self,
         trip_request: TripRequest,
-        radius_km: float = 50.0
+        radius_km: float = 50.0,
+        limit: Optional[int] = None,
+        exclude_driver_ids: Optional[list[int]] = None
     ) -> list[Driver]:
         """
-        Find drivers available for scheduled trip
-        Checks driver_availability_blocks to avoid conflicts
+        Find drivers available for scheduled trip, nearest first
+        One query: radius, credit limit and driver_availability_blocks conflicts in SQL
         """
-        from app.repositories.driver_availability_repository import DriverAvailabilityRepository
-        
-        availability_repo = DriverAvailabilityRepository(self.db)
-        
-        # Get all active drivers
-        all_drivers = self.driver_repo.get_active_drivers()
-        
-        available_drivers = []
-        for driver in all_drivers:
-            # Check if driver has conflicting availability blocks
-            has_conflict = availability_repo.has_conflict(
-                driver.id,
-                trip_request.scheduled_start_at,
-                trip_request.scheduled_end_at
-            )
-            
-            if not has_conflict and driver.is_within_credit_limit:
-                available_drivers.append(driver)
+        return await run_in_threadpool(
+            self.driver_repo.find_available_for_window,
+            trip_request.pickup_lat,
+            trip_request.pickup_lon,
+            radius_km,
+            trip_request.scheduled_start_at,
+            trip_request.scheduled_end_at,
+            limit=limit,
+            exclude_driver_ids=exclude_driver_ids
+        )
+    
+    async def find_drivers_for_scheduled_rematch(self, trip_request: TripRequest) -> list[Driver]:
+        """
+        Replacement drivers for an auto-rematched scheduled trip
+        Nearest drivers free for the trip window, minus the ones that already had it
+        """
+        from app.repositories import TripRepository
         
-        return available_drivers
+        exclude_driver_ids = await run_in_threadpool(
+            TripRepository(self.db).get_driver_ids_for_request, trip_request.id
+        )
+        return await self.find_available_drivers_for_scheduled_trip(
+            trip_request,
+            radius_km=settings.SCHEDULED_REMATCH_RADIUS_KM,
+            limit=settings.SCHEDULED_REMATCH_OFFER_COUNT,
+            exclude_driver_ids=exclude_driver_ids
+        )
     
     async def pre_assign_driver_to_scheduled_trip(
         self,
@@ -214,14 +313,18 @@ class MatchingService:
         if has_conflict:
             return False
         
-        # Create availability block
-        availability_repo.create(
-            driver_id=driver_id,
-            trip_request_id=trip_request.id,
-            start_time=trip_request.scheduled_start_at,
-            end_time=trip_request.scheduled_end_at,
-            reason="SCHEDULED_TRIP"
-        )
+        # Create availability block; the exclusion constraint rejects a concurrent double booking
+        try:
+            availability_repo.create(
+                driver_id=driver_id,
+                trip_request_id=trip_request.id,
+                start_time=trip_request.scheduled_start_at,
+                end_time=trip_request.scheduled_end_at,
+                reason="SCHEDULED_TRIP"
+            )
+        except IntegrityError:
+            self.db.rollback()
+            return False
         
         # Update trip request
         trip_request.pre_assigned_driver_id = driver_id
@@ -229,7 +332,7 @@ class MatchingService:
         
         # Send notification
         if driver.fcm_token:
-            await self.notification_service.send_scheduled_trip_assignment(
+            self.notification_service.send_scheduled_trip_assignment(
                 driver.fcm_token,
                 trip_request
             )
@@ -0,0 +1,231 @@
+"""
+Notification Outbox - Bounded queue of push messages drained by a worker pool
+"""
+import asyncio
+import random
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+
+# Delivery outcomes reported by transports
+SENT = "SENT"
+RETRY = "RETRY"  # Transient failure, send again with backoff
+DROP = "DROP"    # Permanent failure (e.g. unregistered token)
+
+
+@dataclass
+class PushMessage:
+    token: str
+    title: str
+    body: str
+    data: dict = field(default_factory=dict)
+    attempts: int = 0
+
+
+class NotificationTransport(ABC):
+    """Delivers a batch of push messages, one outcome per message"""
+
+    @abstractmethod
+    def send_batch(self, messages: list[PushMessage]) -> list[str]:
+        ...
+
+
+class FCMTransport(NotificationTransport):
+    """Firebase Cloud Messaging transport using send_each batches"""
+
+    def send_batch(self, messages: list[PushMessage]) -> list[str]:
+        from firebase_admin import messaging, exceptions
+
+        response = messaging.send_each([
+            messaging.Message(
+                notification=messaging.Notification(title=m.title, body=m.body),
+                data=m.data,
+                token=m.token
+            )
+            for m in messages
+        ])
+
+        outcomes = []
+        for result in response.responses:
+            if result.success:
+                outcomes.append(SENT)
+            elif isinstance(result.exception, (
+                messaging.UnregisteredError,
+                messaging.SenderIdMismatchError,
+                exceptions.InvalidArgumentError,
+            )):
+                outcomes.append(DROP)
+            else:
+                outcomes.append(RETRY)
+        return outcomes
+
+
+class StubTransport(NotificationTransport):
+    """Local transport for load tests: simulated latency and failures, no network"""
+
+    def __init__(self, latency_ms: float = 0, failure_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.failure_rate = failure_rate
+        self.sent = 0
+
+    def send_batch(self, messages: list[PushMessage]) -> list[str]:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        outcomes = [RETRY if random.random() < self.failure_rate else SENT for _ in messages]
+        self.sent += outcomes.count(SENT)
+        return outcomes
+
+
+def build_transport() -> NotificationTransport:
+    """Create the transport selected by NOTIFICATION_TRANSPORT"""
+    if settings.NOTIFICATION_TRANSPORT == "stub":
+        return StubTransport(
+            latency_ms=settings.NOTIFICATION_STUB_LATENCY_MS,
+            failure_rate=settings.NOTIFICATION_STUB_FAILURE_RATE
+        )
+    return FCMTransport()
+
+
+class NotificationOutbox:
+    """
+    Callers enqueue and return right away; workers group queued messages into
+    transport batches and retry transient failures with exponential backoff
+    """
+
+    def __init__(
+        self,
+        transport: NotificationTransport,
+        max_size: int = 10000,
+        workers: int = 4,
+        batch_size: int = 500,
+        max_retries: int = 3,
+        retry_base_seconds: float = 1.0
+    ):
+        self.transport = transport
+        self.max_size = max_size
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.queue: Optional[asyncio.Queue] = None
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        """Start the worker pool on the running event loop"""
+        if self.is_running:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.max_size)
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"notification-worker-{i}")
+            for i in range(self.workers)
+        ]
+        print(f"✅ Notification outbox started ({self.workers} workers)")
+
+    async def stop(self, drain_timeout_seconds: float = 5.0):
+        """Drain what is queued (bounded by timeout) and stop the workers"""
+        if not self.is_running:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=drain_timeout_seconds)
+        except asyncio.TimeoutError:
+            print(f"⚠️  Notification outbox stopped with {self.queue.qsize()} queued messages")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, message: PushMessage) -> bool:
+        """
+        Enqueue a message; safe to call from the event loop or any thread
+        Without a running outbox the message is sent inline
+        """
+        if not self.is_running:
+            return self._send_inline(message)
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if running_loop is self.loop:
+            return self._put(message)
+
+        self.loop.call_soon_threadsafe(self._put, message)
+        return True
+
+    def _put(self, message: PushMessage) -> bool:
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            metrics.incr("notifications.dropped_queue_full")
+            return False
+        metrics.set_gauge("notifications.queue_depth", self.queue.qsize())
+        return True
+
+    def _send_inline(self, message: PushMessage) -> bool:
+        try:
+            return self.transport.send_batch([message])[0] == SENT
+        except Exception as e:
+            print(f"❌ Failed to send notification: {e}")
+            return False
+
+    async def _worker(self):
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            try:
+                await self._deliver(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+                metrics.set_gauge("notifications.queue_depth", self.queue.qsize())
+
+    async def _deliver(self, batch: list[PushMessage]):
+        started = time.perf_counter()
+        try:
+            outcomes = await asyncio.to_thread(self.transport.send_batch, batch)
+        except Exception as e:
+            print(f"❌ Notification batch failed: {e}")
+            outcomes = [RETRY] * len(batch)
+        metrics.observe("notifications.batch_send_ms", (time.perf_counter() - started) * 1000)
+
+        for message, outcome in zip(batch, outcomes):
+            if outcome == SENT:
+                metrics.incr("notifications.sent")
+            elif outcome == RETRY:
+                self._schedule_retry(message)
+            else:
+                metrics.incr("notifications.dropped_permanent")
+
+    def _schedule_retry(self, message: PushMessage):
+        message.attempts += 1
+        if message.attempts > self.max_retries:
+            metrics.incr("notifications.dropped_retries_exhausted")
+            return
+        metrics.incr("notifications.retried")
+        delay = self.retry_base_seconds * 2 ** (message.attempts - 1)
+        self.loop.call_later(delay, self._put, message)
+
+
+# Singleton instance
+notification_outbox = NotificationOutbox(
+    transport=build_transport(),
+    max_size=settings.NOTIFICATION_QUEUE_MAX_SIZE,
+    workers=settings.NOTIFICATION_WORKERS,
+    batch_size=settings.NOTIFICATION_BATCH_SIZE,
+    max_retries=settings.NOTIFICATION_MAX_RETRIES,
+    retry_base_seconds=settings.NOTIFICATION_RETRY_BASE_SECONDS
+)
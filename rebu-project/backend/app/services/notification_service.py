@@ -1,37 +1,56 @@
 """
 Notification Service - Firebase Cloud Messaging
 """
+import threading
 import firebase_admin
-from firebase_admin import credentials, messaging
+from firebase_admin import credentials
 from typing import Optional
 from app.core.config import settings
+from app.services.notification_outbox import notification_outbox, PushMessage
 
 
-class NotificationService:
-    """Service for sending push notifications via FCM"""
+_firebase_lock = threading.Lock()
+_firebase_initialized: Optional[bool] = None
+
+
+def ensure_firebase() -> bool:
+    """Initialize Firebase Admin SDK once per process, on first use"""
+    global _firebase_initialized
     
-    def __init__(self):
-        self.initialized = False
-        self._initialize_firebase()
+    if _firebase_initialized is not None:
+        return _firebase_initialized
     
-    def _initialize_firebase(self):
-        """Initialize Firebase Admin SDK"""
+    with _firebase_lock:
+        if _firebase_initialized is not None:
+            return _firebase_initialized
+        
+        _firebase_initialized = False
         try:
             if not settings.FIREBASE_CREDENTIALS_PATH:
                 print("⚠️  Firebase credentials not configured")
-                return
+                return False
             
             if not firebase_admin._apps:
                 cred = credentials.Certificate(settings.FIREBASE_CREDENTIALS_PATH)
                 firebase_admin.initialize_app(cred)
             
-            self.initialized = True
+            _firebase_initialized = True
             print("✅ Firebase initialized")
         
         except Exception as e:
             print(f"❌ Failed to initialize Firebase: {e}")
+        
+        return _firebase_initialized
+
+
+class NotificationService:
+    """Service for sending push notifications via FCM"""
+    
+    @property
+    def initialized(self) -> bool:
+        return ensure_firebase()
     
-    async def send_notification(
+    def send_notification(
         self,
         fcm_token: str,
         title: str,
@@ -39,32 +58,24 @@ class NotificationService:
         data: Optional[dict] = None
     ) -> bool:
         """
-        Send a push notification to a device
+        Queue a push notification to a device
+        Returns right away; delivery happens on the notification outbox
         """
-        if not self.initialized:
+        if not self.initialized and settings.NOTIFICATION_TRANSPORT == "fcm":
             return False
         
-        try:
-            message = messaging.Message(
-                notification=messaging.Notification(
-                    title=title,
-                    body=body
-                ),
-                data=data or {},
-                token=fcm_token
+        return notification_outbox.submit(
+            PushMessage(
+                token=fcm_token,
+                title=title,
+                body=body,
+                data=data or {}
             )
-            
-            response = messaging.send(message)
-            print(f"✅ Notification sent: {response}")
-            return True
-        
-        except Exception as e:
-            print(f"❌ Failed to send notification: {e}")
-            return False
+        )
     
-    async def send_trip_offer_notification(self, fcm_token: str, trip_request, offer):
+    def send_trip_offer_notification(self, fcm_token: str, trip_request, offer):
         """Send notification when driver receives trip offer"""
-        return await self.send_notification(
+        return self.send_notification(
             fcm_token,
             title="🚚 Nueva solicitud de flete",
             body=f"De {trip_request.pickup_address} a {trip_request.dropoff_address}. Tarifa estimada: ${trip_request.estimated_fare}",
@@ -75,9 +86,22 @@ class NotificationService:
             }
         )
     
-    async def send_scheduled_trip_assignment(self, fcm_token: str, trip_request):
+    def send_offer_taken_notification(self, fcm_token: str, trip_request_id: int, offer_id: int):
+        """Tell a driver their offer is gone because another driver accepted"""
+        return self.send_notification(
+            fcm_token,
+            title="Solicitud tomada",
+            body="Otro conductor aceptó este flete.",
+            data={
+                "type": "OFFER_TAKEN",
+                "trip_request_id": str(trip_request_id),
+                "offer_id": str(offer_id)
+            }
+        )
+    
+    def send_scheduled_trip_assignment(self, fcm_token: str, trip_request):
         """Send notification when driver is pre-assigned to scheduled trip"""
-        return await self.send_notification(
+        return self.send_notification(
             fcm_token,
             title="📅 Viaje programado asignado",
             body=f"Tienes un viaje programado para {trip_request.scheduled_start_at.strftime('%d/%m/%Y %H:%M')}",
@@ -87,44 +111,56 @@ class NotificationService:
             }
         )
     
-    async def send_trip_reminder(self, fcm_token: str, trip, minutes_before: int):
+    def send_trip_reminder(self, fcm_token: str, trip_id: int, dropoff_address: str, minutes_before: int):
         """Send reminder before scheduled trip"""
-        return await self.send_notification(
+        return self.send_notification(
             fcm_token,
             title=f"⏰ Recordatorio: Viaje en {minutes_before} minutos",
-            body=f"Tu viaje a {trip.dropoff_address} comienza pronto",
+            body=f"Tu viaje a {dropoff_address} comienza pronto",
             data={
                 "type": "TRIP_REMINDER",
-                "trip_id": str(trip.id),
+                "trip_id": str(trip_id),
                 "minutes_before": str(minutes_before)
             }
         )
     
-    async def send_trip_reminder_to_user(self, fcm_token: str, trip, minutes_before: int):
+    def send_trip_reminder_to_user(self, fcm_token: str, trip_id: int, pickup_address: str, minutes_before: int):
         """Send reminder to user before scheduled trip"""
-        return await self.send_notification(
+        return self.send_notification(
             fcm_token,
             title=f"⏰ Tu flete llega en {minutes_before} minutos",
-            body=f"El conductor llegará pronto a {trip.pickup_address}",
+            body=f"El conductor llegará pronto a {pickup_address}",
             data={
                 "type": "TRIP_REMINDER",
-                "trip_id": str(trip.id)
+                "trip_id": str(trip_id)
+            }
+        )
+    
+    def send_scheduled_trip_cancelled(self, fcm_token: str, trip_request_id: int):
+        """Tell the user no replacement driver took their scheduled trip in time"""
+        return self.send_notification(
+            fcm_token,
+            title="❌ Viaje programado cancelado",
+            body="Tu conductor no estaba disponible y no encontramos otro a tiempo.",
+            data={
+                "type": "SCHEDULED_TRIP_CANCELLED",
+                "trip_request_id": str(trip_request_id)
             }
         )
     
-    async def send_trip_expired_notification(self, fcm_token: str, trip_request):
+    def send_trip_expired_notification(self, fcm_token: str, trip_request_id: int):
         """Send notification when trip request expires"""
-        return await self.send_notification(
+        return self.send_notification(
             fcm_token,
             title="❌ No se encontró conductor",
             body="Tu solicitud de flete expiró. Por favor intenta nuevamente.",
             data={
                 "type": "TRIP_EXPIRED",
-                "trip_request_id": str(trip_request.id)
+                "trip_request_id": str(trip_request_id)
             }
         )
     
-    async def send_trip_status_update(self, fcm_token: str, trip, new_status: str):
+    def send_trip_status_update(self, fcm_token: str, trip, new_status: str):
         """Send notification on trip status change"""
         status_messages = {
             "DRIVER_ARRIVING": "🚗 El conductor va en camino",
@@ -134,7 +170,7 @@ class NotificationService:
             "CANCELLED": "❌ Viaje cancelado"
         }
         
-        return await self.send_notification(
+        return self.send_notification(
             fcm_token,
             title="Actualización de viaje",
             body=status_messages.get(new_status, f"Estado: {new_status}"),
@@ -144,3 +180,15 @@ class NotificationService:
                 "status": new_status
             }
         )
+
+
+# Process-wide instance shared by endpoints, services and workers
+notification_service = NotificationService()
+
+
+def get_notification_service() -> NotificationService:
+    """
+    Dependency to get the shared notification service
+    Usage: notification_service: NotificationService = Depends(get_notification_service)
+    """
+    return notification_service
@@ -1,30 +1,36 @@
 """
 Trip Service - Business logic for trip management
 """
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
 
 from app.core.config import settings
-from app.models import TripRequest, Trip, TripMode, TripStatus
+from app.core.metrics import metrics
+from app.core.principal_cache import principal_cache
+from app.core.redis_client import redis_client
+from app.models import TripRequest, Trip, TripMode, TripStatus, TripRequestStatus
 from app.repositories import (
     TripRequestRepository, TripRepository, DriverRepository,
-    VehicleRepository, WalletTransactionRepository
+    VehicleRepository, WalletTransactionRepository, TripReminderRepository,
+    DriverAvailabilityRepository
 )
 from app.services.wallet_service import WalletService
-from app.services.notification_service import NotificationService
+from app.services.location_service import LocationService
+from app.services.notification_service import NotificationService, get_notification_service
 
 
 class TripService:
     """Service for trip operations"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, notification_service: Optional[NotificationService] = None):
         self.db = db
         self.trip_request_repo = TripRequestRepository(db)
         self.trip_repo = TripRepository(db)
         self.driver_repo = DriverRepository(db)
         self.wallet_service = WalletService(db)
-        self.notification_service = NotificationService()
+        self.notification_service = notification_service or get_notification_service()
     
     def create_on_demand_trip(
         self,
@@ -51,8 +57,56 @@ class TripService:
             **kwargs
         )
         
+        try:
+            redis_client.schedule_trip_expiry(
+                trip_request.id,
+                expires_at.replace(tzinfo=timezone.utc).timestamp()
+            )
+        except Exception as e:
+            # The fallback sweep still expires it, just later
+            print(f"⚠️ Failed to schedule expiry of trip request {trip_request.id}: {e}")
+        
         return trip_request
     
+    def cancel_pending_request(self, trip_request: TripRequest):
+        """Cancel a new request that could not be handed to matching"""
+        trip_request.status = TripRequestStatus.CANCELLED
+        self.db.commit()
+    
+    def expire_pending_requests(self, trip_request_ids: Optional[List[int]] = None,
+                                limit: int = 500) -> int:
+        """
+        Expire due PENDING trip requests in bulk, clear their Redis state and notify the users
+        Returns the number of requests expired
+        """
+        expired = self.trip_request_repo.expire_due(trip_request_ids, limit=limit)
+        redis_client.clear_expired_trip_requests([trip_request_id for trip_request_id, _ in expired])
+        
+        for trip_request_id, fcm_token in expired:
+            if fcm_token:
+                self.notification_service.send_trip_expired_notification(fcm_token, trip_request_id)
+        
+        metrics.incr("trip_requests.expired", len(expired))
+        return len(expired)
+    
+    def cancel_unmatched_rematches(self, trip_request_ids: Optional[List[int]] = None) -> int:
+        """
+        Cancel auto-rematched scheduled requests nobody took by
+        SCHEDULED_REMATCH_CUTOFF_MINUTES before their start, and tell the users
+        Returns the number of requests cancelled
+        """
+        start_before = datetime.now(timezone.utc) + timedelta(minutes=settings.SCHEDULED_REMATCH_CUTOFF_MINUTES)
+        cancelled = self.trip_request_repo.cancel_unmatched_rematches(start_before, trip_request_ids)
+        # Same Redis state as an expired request: claims, pending offers, rounds
+        redis_client.clear_expired_trip_requests([trip_request_id for trip_request_id, _ in cancelled])
+        
+        for trip_request_id, fcm_token in cancelled:
+            if fcm_token:
+                self.notification_service.send_scheduled_trip_cancelled(fcm_token, trip_request_id)
+        
+        metrics.incr("trip_requests.rematch_cancelled", len(cancelled))
+        return len(cancelled)
+    
     def create_scheduled_trip(
         self,
         user_id: int,
@@ -90,11 +144,15 @@ class TripService:
         """
         Create Trip from accepted TripRequest
         Determines commission rate based on driver's subscription
+        Idempotent for the matched driver: a retried accept gets the existing trip
         """
         trip_request = self.trip_request_repo.get_by_id(trip_request_id)
         if not trip_request:
             raise ValueError("Trip request not found")
         
+        if trip_request.trip:
+            return self._own_live_trip(trip_request, driver_id)
+        
         driver = self.driver_repo.get_by_id(driver_id)
         if not driver:
             raise ValueError("Driver not found")
@@ -106,17 +164,28 @@ class TripService:
         # Determine commission rate
         commission_rate = self._get_commission_rate(driver)
         
-        # Create trip
-        trip = self.trip_repo.create(
-            trip_request=trip_request,
-            driver_id=driver_id,
-            vehicle_id=vehicle_id,
-            commission_rate=commission_rate
-        )
+        # Create trip; the live-trip unique index rejects a concurrent retry
+        try:
+            if trip_request.is_scheduled:
+                self._book_driver(trip_request, driver_id)
+            trip = self.trip_repo.create(
+                trip_request=trip_request,
+                driver_id=driver_id,
+                vehicle_id=vehicle_id,
+                commission_rate=commission_rate
+            )
+        except IntegrityError:
+            self.db.rollback()
+            if trip_request.is_scheduled and not trip_request.trip:
+                # The driver booked an overlapping trip since the offer: let the request be matched again
+                self.trip_request_repo.reopen_match(trip_request.id, driver_id)
+                raise ValueError("Driver already has a trip in this time window")
+            return self._own_live_trip(trip_request, driver_id)
         
         # Update driver status
         driver.status = "BUSY"
         self.db.commit()
+        principal_cache.invalidate("DRIVER", driver_id)
         
         # Send notification to user
         user = trip_request.user
@@ -127,6 +196,48 @@ class TripService:
                 "MATCHED"
             )
         
+        if trip_request.is_scheduled:
+            self._send_missed_reminders(trip_request, trip, driver)
+        
+        return trip
+    
+    def _book_driver(self, trip_request: TripRequest, driver_id: int):
+        """
+        Block the driver's calendar for a scheduled trip in the trip's transaction
+        The exclusion constraint raises IntegrityError on an overlapping booking
+        """
+        availability_repo = DriverAvailabilityRepository(self.db)
+        if availability_repo.has_block_for(driver_id, trip_request.id):
+            return  # Pre-assigned
+        availability_repo.create(
+            driver_id=driver_id,
+            trip_request_id=trip_request.id,
+            start_time=trip_request.scheduled_start_at,
+            end_time=trip_request.scheduled_end_at,
+            reason="SCHEDULED_TRIP",
+            commit=False
+        )
+    
+    def _send_missed_reminders(self, trip_request: TripRequest, trip: Trip, driver):
+        """
+        An auto-rematched trip's replacement driver missed the reminders already
+        recorded for the request; send one with the time actually left
+        """
+        if not driver.fcm_token or not TripReminderRepository(self.db).get_sent_offsets(trip_request.id):
+            return
+        minutes_left = (trip_request.scheduled_start_at - datetime.now(timezone.utc)).total_seconds() // 60
+        self.notification_service.send_trip_reminder(
+            driver.fcm_token,
+            trip.id,
+            trip.dropoff_address,
+            minutes_before=max(int(minutes_left), 0)
+        )
+    
+    def _own_live_trip(self, trip_request: TripRequest, driver_id: int) -> Trip:
+        """The request's live trip, provided it belongs to this driver"""
+        trip = trip_request.trip
+        if not trip or trip.driver_id != driver_id:
+            raise ValueError("Trip request already matched to another driver")
         return trip
     
     def start_trip(self, trip_id: int, driver_id: int) -> Trip:
@@ -175,13 +286,22 @@ class TripService:
         trip.final_fare = final_fare
         trip.completed_at = datetime.utcnow()
         
-        # Charge commission
-        self.wallet_service.charge_trip_commission(trip)
+        # Distance from the driver's GPS trail since pickup
+        if trip.actual_distance_km is None and trip.picked_up_at:
+            trip.actual_distance_km = LocationService(self.db).get_trail_distance_km(
+                driver_id,
+                since=trip.picked_up_at,
+                until=trip.completed_at
+            )
         
-        # Update driver status back to ACTIVE
+        # Update driver status back to ACTIVE (the commission may still limit it)
         trip.driver.status = "ACTIVE"
         
+        # Charge commission in the same transaction as the completion
+        self.wallet_service.charge_trip_commission(trip, commit=False)
+        
         self.db.commit()
+        principal_cache.invalidate("DRIVER", trip.driver_id)
         
         # Notify user
         if trip.user.fcm_token:
@@ -2,12 +2,22 @@
 Wallet Service - Manage driver wallet and commissions
 """
 from sqlalchemy.orm import Session
-from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
 
 from app.models import Driver, WalletTransaction, TransactionType, Trip, DriverStatus
 from app.repositories.wallet_repository import WalletTransactionRepository
 from app.repositories.driver_repository import DriverRepository
 from app.core.config import settings
+from app.core.principal_cache import principal_cache
+
+CENT = Decimal("0.01")
+
+
+def to_money(value) -> Decimal:
+    """Exact amount rounded to cents (floats go through str to avoid binary noise)"""
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
 
 
 class WalletService:
@@ -18,7 +28,7 @@ class WalletService:
         self.wallet_repo = WalletTransactionRepository(db)
         self.driver_repo = DriverRepository(db)
     
-    def charge_trip_commission(self, trip: Trip) -> WalletTransaction:
+    def charge_trip_commission(self, trip: Trip, commit: bool = True) -> WalletTransaction:
         """
         Charge commission when trip is completed
         Returns the created transaction
@@ -30,7 +40,7 @@ class WalletService:
         
         # Get commission rate from driver's subscription
         commission_rate = self._get_commission_rate(driver)
-        commission_amount = trip.final_fare * commission_rate
+        commission_amount = to_money(to_money(trip.final_fare) * Decimal(str(commission_rate)))
         
         # Create negative transaction (debit)
         transaction = self.wallet_repo.create(
@@ -38,12 +48,10 @@ class WalletService:
             type=TransactionType.TRIP_COMMISSION,
             amount=-commission_amount,
             trip_id=trip.id,
-            description=f"Commission for trip #{trip.id}"
+            description=f"Commission for trip #{trip.id}",
+            commit=False
         )
         
-        # Update driver wallet balance
-        driver.wallet_balance -= commission_amount
-        
         # Check if driver exceeded credit limit
         if not driver.is_within_credit_limit:
             driver.status = DriverStatus.LIMITED
@@ -54,7 +62,8 @@ class WalletService:
         trip.commission_rate = commission_rate
         trip.commission_amount = commission_amount
         
-        self.db.commit()
+        if commit:
+            self._commit(driver.id)
         
         return transaction
     
@@ -68,31 +77,27 @@ class WalletService:
         """
         Add payment from driver (credit to wallet)
         """
+        amount = to_money(amount)
         if amount <= 0:
             raise ValueError("Payment amount must be positive")
         
-        driver = self.driver_repo.get_by_id(driver_id)
-        if not driver:
-            raise ValueError("Driver not found")
-        
         # Create positive transaction (credit)
         transaction = self.wallet_repo.create(
             driver_id=driver_id,
             type=TransactionType.PAYMENT,
             amount=amount,
             reference=reference,
-            description=description or f"Payment: {reference}"
+            description=description or f"Payment: {reference}",
+            commit=False
         )
         
-        # Update balance
-        driver.wallet_balance += amount
-        
         # If driver was LIMITED and now within limit, reactivate
+        driver = self.driver_repo.get_by_id(driver_id)
         if driver.status == DriverStatus.LIMITED and driver.is_within_credit_limit:
             driver.status = DriverStatus.ACTIVE
             print(f"✅ Driver {driver_id} reactivated after payment")
         
-        self.db.commit()
+        self._commit(driver_id)
         
         return transaction
     
@@ -103,22 +108,19 @@ class WalletService:
         description: str
     ) -> WalletTransaction:
         """Add bonus to driver wallet"""
+        amount = to_money(amount)
         if amount <= 0:
             raise ValueError("Bonus amount must be positive")
         
-        driver = self.driver_repo.get_by_id(driver_id)
-        if not driver:
-            raise ValueError("Driver not found")
-        
         transaction = self.wallet_repo.create(
             driver_id=driver_id,
             type=TransactionType.BONUS,
             amount=amount,
-            description=description
+            description=description,
+            commit=False
         )
         
-        driver.wallet_balance += amount
-        self.db.commit()
+        self._commit(driver_id)
         
         return transaction
     
@@ -129,31 +131,28 @@ class WalletService:
         description: str
     ) -> WalletTransaction:
         """Add penalty to driver wallet"""
+        amount = to_money(amount)
         if amount <= 0:
             raise ValueError("Penalty amount must be positive")
         
-        driver = self.driver_repo.get_by_id(driver_id)
-        if not driver:
-            raise ValueError("Driver not found")
-        
         transaction = self.wallet_repo.create(
             driver_id=driver_id,
             type=TransactionType.PENALTY,
             amount=-amount,  # Negative
-            description=description
+            description=description,
+            commit=False
         )
         
-        driver.wallet_balance -= amount
-        
         # Check credit limit
+        driver = self.driver_repo.get_by_id(driver_id)
         if not driver.is_within_credit_limit:
             driver.status = DriverStatus.LIMITED
         
-        self.db.commit()
+        self._commit(driver_id)
         
         return transaction
     
-    def get_wallet_balance(self, driver_id: int) -> float:
+    def get_wallet_balance(self, driver_id: int) -> Decimal:
         """Get current wallet balance"""
         driver = self.driver_repo.get_by_id(driver_id)
         if not driver:
@@ -173,6 +172,15 @@ class WalletService:
             offset=offset
         )
     
+    def _commit(self, driver_id: int):
+        """Commit the ledger entry and balance together, or neither"""
+        try:
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        principal_cache.invalidate("DRIVER", driver_id)
+    
     def _get_commission_rate(self, driver: Driver) -> float:
         """Get commission rate based on driver's subscription"""
         if not driver.current_subscription:
@@ -0,0 +1,155 @@
+"""
+Wave Scheduler - Queues matching waves for unmatched trip requests
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import metrics
+from app.core.redis_client import async_redis_client
+from app.models import TripRequestStatus
+from app.repositories import TripRequestRepository
+
+
+class WaveScheduler:
+    """
+    Redis sorted set delay queue of upcoming waves, scored by due time.
+    Every API process runs a scheduler; due entries are popped atomically
+    and handed to the matching queue, so each wave runs once on a worker.
+    Auto-rematched scheduled requests get a round every rematch_round_seconds
+    until a driver accepts or the cutoff before their start cancels them.
+    """
+
+    def __init__(
+        self,
+        max_wave: int = 3,
+        delay_seconds: float = 30,
+        poll_seconds: float = 1.0,
+        batch_size: int = 100,
+        rematch_round_seconds: float = 60,
+        rematch_cutoff: timedelta = timedelta(minutes=10)
+    ):
+        self.max_wave = max_wave
+        self.delay_seconds = delay_seconds
+        self.rematch_round_seconds = rematch_round_seconds
+        self.rematch_cutoff = rematch_cutoff
+        self.poll_seconds = poll_seconds
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None
+
+    async def schedule(self, trip_request_id: int, wave_number: int, delay_seconds: Optional[float] = None):
+        """Queue a wave to run after delay_seconds (MATCHING_WAVE_DELAY_SECONDS by default)"""
+        delay = self.delay_seconds if delay_seconds is None else delay_seconds
+        await async_redis_client.schedule_matching_wave(trip_request_id, wave_number, time.time() + delay)
+
+    async def cancel(self, trip_request_id: int):
+        """Stop further waves for a trip request"""
+        await async_redis_client.cancel_matching_waves(trip_request_id)
+
+    async def start(self):
+        """Start polling for due waves on the running event loop"""
+        if self.is_running:
+            return
+        self._task = asyncio.create_task(self._run(), name="wave-scheduler")
+        print(f"✅ Wave scheduler started (waves up to {self.max_wave})")
+
+    async def stop(self):
+        if not self.is_running:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        from app.services.matching_queue import matching_queue, MatchingQueueFull
+
+        while True:
+            try:
+                due = await async_redis_client.take_due_matching_waves(time.time(), self.batch_size)
+            except Exception as e:
+                print(f"❌ Wave scheduler failed to read due waves: {e}")
+                due = []
+
+            if due:
+                metrics.incr("matching.waves.due", len(due))
+                for trip_request_id, wave_number in due:
+                    try:
+                        await matching_queue.enqueue(trip_request_id, wave_number)
+                    except MatchingQueueFull:
+                        # Workers are saturated: retry once the backlog drains
+                        await self.schedule(trip_request_id, wave_number, delay_seconds=self.poll_seconds)
+                    except Exception as e:
+                        print(f"❌ Failed to enqueue wave {wave_number} for trip request {trip_request_id}: {e}")
+                        await self.schedule(trip_request_id, wave_number, delay_seconds=self.poll_seconds)
+
+            # A full batch means more may already be due
+            if len(due) < self.batch_size:
+                await asyncio.sleep(self.poll_seconds)
+
+    async def run_wave(self, trip_request_id: int, wave_number: int):
+        """Send the offers of one wave and queue the next one while still unmatched"""
+        from app.services.matching_service import MatchingService
+        from app.services.trip_service import TripService
+
+        try:
+            if await async_redis_client.is_trip_claimed(trip_request_id):
+                metrics.incr("matching.waves.skipped_matched")
+                return
+
+            # Sync DB work runs in the threadpool, never on the event loop
+            db = SessionLocal()
+            try:
+                trip_request = await run_in_threadpool(TripRequestRepository(db).get_by_id, trip_request_id)
+                if not trip_request or trip_request.status != TripRequestStatus.PENDING:
+                    metrics.incr("matching.waves.skipped_matched")
+                    return
+                if trip_request.expires_at and trip_request.expires_at <= datetime.now(timezone.utc):
+                    metrics.incr("matching.waves.skipped_expired")
+                    return
+
+                is_scheduled = trip_request.is_scheduled
+                matching_service = MatchingService(db)
+                if is_scheduled:
+                    # Auto-rematch hand-off: offers to drivers free for the window, round after round
+                    cutoff = trip_request.scheduled_start_at - self.rematch_cutoff
+                    if datetime.now(timezone.utc) >= cutoff:
+                        await run_in_threadpool(TripService(db).cancel_unmatched_rematches, [trip_request_id])
+                        return
+                    drivers = await matching_service.find_drivers_for_scheduled_rematch(trip_request)
+                else:
+                    drivers = await matching_service.find_drivers_for_on_demand_trip(trip_request, wave_number)
+                if drivers:
+                    await matching_service.send_offers_to_drivers(trip_request, drivers)
+                metrics.incr("matching.waves.run")
+            finally:
+                await run_in_threadpool(db.close)
+
+            if is_scheduled:
+                # The last round lands on the cutoff, which cancels the request if still unmatched
+                next_round_at = min(time.time() + self.rematch_round_seconds, cutoff.timestamp())
+                await self.schedule(trip_request_id, wave_number + 1, delay_seconds=next_round_at - time.time())
+            elif wave_number < self.max_wave:
+                await self.schedule(trip_request_id, wave_number + 1)
+        except Exception as e:
+            metrics.incr("matching.waves.failed")
+            print(f"❌ Wave {wave_number} failed for trip request {trip_request_id}: {e}")
+
+
+# Singleton instance
+wave_scheduler = WaveScheduler(
+    max_wave=settings.MATCHING_WAVE_COUNT,
+    delay_seconds=settings.MATCHING_WAVE_DELAY_SECONDS,
+    poll_seconds=settings.MATCHING_WAVE_POLL_SECONDS,
+    batch_size=settings.MATCHING_WAVE_BATCH_SIZE,
+    rematch_round_seconds=settings.SCHEDULED_REMATCH_ROUND_SECONDS,
+    rematch_cutoff=timedelta(minutes=settings.SCHEDULED_REMATCH_CUTOFF_MINUTES)
+)
@@ -0,0 +1,50 @@
+"""
+Standalone Worker - Background jobs and matching without the HTTP API
+Run with: python -m app.worker
+Scale it separately from the API; set ENABLE_BACKGROUND_WORKERS=false and
+MATCHING_WORKERS=0 on the API processes to leave this work to the worker tier
+"""
+import asyncio
+import signal
+
+from app.core.database import dispose_async_engine
+from app.core.redis_client import async_redis_client
+from app.services.expiry_scheduler import expiry_scheduler
+from app.services.geo_index_sync import geo_index_sync
+from app.services.matching_queue import matching_queue
+from app.services.notification_outbox import notification_outbox
+from app.services.wave_scheduler import wave_scheduler
+from app.workers.background_workers import workers
+
+
+async def run():
+    print("🚀 Starting Rebu worker...")
+
+    await geo_index_sync.start()
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    await notification_outbox.start()
+    await wave_scheduler.start()
+    await expiry_scheduler.start()
+    await matching_queue.start()
+    workers.start()
+
+    await stop_event.wait()
+
+    print("🛑 Shutting down Rebu worker...")
+    workers.stop()
+    await geo_index_sync.stop()
+    await wave_scheduler.stop()
+    await matching_queue.stop()
+    await expiry_scheduler.stop()
+    await notification_outbox.stop()
+    await async_redis_client.close()
+    await dispose_async_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
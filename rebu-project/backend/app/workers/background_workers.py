@@ -1,135 +1,200 @@
 """
 Background Workers - Scheduled jobs for reminders, expiry, and cleanup
 """
+import functools
+import os
+import socket
+import time
+import uuid
 from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 
 from app.core.database import SessionLocal
 from app.core.config import settings
+from app.core.principal_cache import principal_cache
 from app.core.redis_client import redis_client
-from app.models import TripRequest, TripRequestStatus, Trip, TripStatus, DriverStatus
-from app.services.notification_service import NotificationService
+from app.services.notification_service import get_notification_service
 
 
+LEADER_LEASE = "background_workers"
+
 class BackgroundWorkers:
-    """Background workers for Rebu platform"""
+    """
+    Background workers for Rebu platform
+    Every process runs the scheduler, but cluster-wide jobs only execute in the
+    process holding the leader lease in Redis; per-process jobs run everywhere
+    """
     
     def __init__(self):
         self.scheduler = BackgroundScheduler()
-        self.notification_service = NotificationService()
+        self.notification_service = get_notification_service()
+        self.leader_token = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
     
     def start(self):
         """Start all background jobs"""
         if not settings.ENABLE_BACKGROUND_WORKERS:
             return
         
-        # Reminder job: every 5 minutes
+        # Leader election: take or renew the lease well before it expires
+        self.leader_election_job()
+        self.scheduler.add_job(
+            self.leader_election_job,
+            'interval',
+            seconds=settings.WORKER_LEADER_RENEW_SECONDS,
+            id='leader_election_job'
+        )
+        
+        # Reminder job: every minute by default
         self.scheduler.add_job(
-            self.reminder_job,
+            self._leader_only(self.reminder_job),
             'interval',
-            minutes=5,
+            seconds=settings.SCHEDULED_REMINDER_INTERVAL_SECONDS,
             id='reminder_job'
         )
         
         # Auto-rematch job: every 10 minutes
         self.scheduler.add_job(
-            self.auto_rematch_job,
+            self._leader_only(self.auto_rematch_job),
             'interval',
             minutes=10,
             id='auto_rematch_job'
         )
         
-        # Expiry job: every 2 minutes
+        # Expiry sweep: fallback for timers lost in Redis (the expiry scheduler does the real work)
         self.scheduler.add_job(
-            self.expiry_job,
+            self._leader_only(self.expiry_job),
             'interval',
-            minutes=2,
+            minutes=settings.TRIP_EXPIRY_SWEEP_MINUTES,
             id='expiry_job'
         )
         
         # Availability cleanup: every hour
         self.scheduler.add_job(
-            self.availability_cleanup_job,
+            self._leader_only(self.availability_cleanup_job),
             'interval',
             hours=1,
             id='availability_cleanup_job'
         )
         
+        # trip_offers partitions: create upcoming months, drop expired ones (also right after startup)
+        self.scheduler.add_job(
+            self._leader_only(self.trip_offer_partition_job),
+            'interval',
+            hours=24,
+            next_run_time=datetime.now() + timedelta(minutes=1),
+            id='trip_offer_partition_job'
+        )
+        
+        # Driver location write-behind flush
+        self.scheduler.add_job(
+            self._leader_only(self.location_flush_job),
+            'interval',
+            seconds=settings.DRIVER_LOCATION_FLUSH_INTERVAL_SECONDS,
+            id='location_flush_job'
+        )
+        
+        # Drop drivers that stopped sending pings from drivers:online
+        self.scheduler.add_job(
+            self._leader_only(self.offline_drivers_job),
+            'interval',
+            seconds=settings.DRIVER_OFFLINE_SWEEP_SECONDS,
+            id='offline_drivers_job'
+        )
+        
         self.scheduler.start()
         print("✅ Background workers started")
     
     def stop(self):
         """Stop all background jobs"""
+        if not self.scheduler.running:
+            return
         self.scheduler.shutdown()
+        if self.is_leader:
+            # Hand over now instead of after the lease expires
+            try:
+                redis_client.release_lease(LEADER_LEASE, self.leader_token)
+            except Exception as e:
+                print(f"❌ Failed to release worker leader lease: {e}")
+            self.is_leader = False
         print("🛑 Background workers stopped")
     
+    def _leader_only(self, job):
+        """Wrap a cluster-wide job so it is skipped outside the leader process"""
+        @functools.wraps(job)
+        def run():
+            if self.is_leader:
+                job()
+        return run
+    
+    def leader_election_job(self):
+        """
+        Take or renew the leader lease
+        Leadership is dropped as soon as Redis can't confirm it, so a
+        partitioned process stops running cluster jobs before its lease expires
+        """
+        try:
+            is_leader = redis_client.acquire_lease(
+                LEADER_LEASE,
+                self.leader_token,
+                settings.WORKER_LEADER_LEASE_SECONDS
+            )
+        except Exception as e:
+            print(f"❌ Error in leader_election_job: {e}")
+            is_leader = False
+        
+        if is_leader != self.is_leader:
+            print(f"{'✅ Took' if is_leader else '⚠️ Lost'} background worker leadership ({self.leader_token})")
+        self.is_leader = is_leader
+    
     def reminder_job(self):
         """
-        Send reminders for scheduled trips
-        T-60min and T-15min before scheduled_start_at
+        Send reminders for scheduled trips at each SCHEDULED_REMINDER_MINUTES offset
+        before scheduled_start_at; trip_reminders records each one so it goes out once
+        Each batch is queued before its claim commits: a failed commit sends it again
+        on the next run (at-least-once) instead of losing it
         """
         db: Session = SessionLocal()
         
         try:
-            now = datetime.utcnow()
+            from app.repositories.trip_reminder_repository import TripReminderRepository
             
-            # Find scheduled trips that need reminders
-            for reminder_minutes in settings.SCHEDULED_REMINDER_MINUTES:
-                target_time = now + timedelta(minutes=reminder_minutes)
-                
-                # Query trips that start around target_time
-                trips = db.query(TripRequest).filter(
-                    TripRequest.mode == "SCHEDULED",
-                    TripRequest.status == TripRequestStatus.MATCHED,
-                    TripRequest.scheduled_start_at.between(
-                        target_time - timedelta(minutes=2),
-                        target_time + timedelta(minutes=2)
-                    )
-                ).all()
+            reminder_repo = TripReminderRepository(db)
+            batch_size = settings.SCHEDULED_REMINDER_BATCH_SIZE
+            sent = 0
+            
+            while True:
+                reminders = reminder_repo.claim_due(
+                    settings.SCHEDULED_REMINDER_MINUTES,
+                    grace_minutes=settings.SCHEDULED_REMINDER_GRACE_MINUTES,
+                    limit=batch_size,
+                    commit=False
+                )
                 
-                for trip_request in trips:
-                    # Check if reminder already sent
-                    if reminder_minutes == 60 and trip_request.reminder_60min_sent:
-                        continue
-                    if reminder_minutes == 15 and trip_request.reminder_15min_sent:
-                        continue
-                    
-                    # Get associated trip
-                    trip = db.query(Trip).filter(
-                        Trip.trip_request_id == trip_request.id
-                    ).first()
-                    
-                    if not trip:
-                        continue
-                    
-                    # Send reminder to driver
-                    driver = trip.driver
-                    if driver.fcm_token:
+                for reminder in reminders:
+                    if reminder.driver_fcm_token:
                         self.notification_service.send_trip_reminder(
-                            driver.fcm_token,
-                            trip,
-                            minutes_before=reminder_minutes
+                            reminder.driver_fcm_token,
+                            reminder.trip_id,
+                            reminder.dropoff_address,
+                            minutes_before=reminder.offset_minutes
                         )
-                    
-                    # Send reminder to user
-                    user = trip.user
-                    if user.fcm_token:
+                    if reminder.user_fcm_token:
                         self.notification_service.send_trip_reminder_to_user(
-                            user.fcm_token,
-                            trip,
-                            minutes_before=reminder_minutes
+                            reminder.user_fcm_token,
+                            reminder.trip_id,
+                            reminder.pickup_address,
+                            minutes_before=reminder.offset_minutes
                         )
-                    
-                    # Mark reminder as sent
-                    if reminder_minutes == 60:
-                        trip_request.reminder_60min_sent = True
-                    elif reminder_minutes == 15:
-                        trip_request.reminder_15min_sent = True
-                    
-                    db.commit()
+                db.commit()
+                
+                sent += len(reminders)
+                if len(reminders) < batch_size:
+                    break
             
-            print(f"✅ Reminder job completed at {now}")
+            if sent:
+                print(f"✅ Sent {sent} trip reminders")
         
         except Exception as e:
             print(f"❌ Error in reminder_job: {e}")
@@ -140,56 +205,53 @@ class BackgroundWorkers:
     
     def auto_rematch_job(self):
         """
-        Auto-rematch scheduled trips if driver doesn't confirm
-        Checks trips within SCHEDULED_CONFIRM_WINDOW_MINUTES
+        Auto-rematch scheduled trips whose driver is not online
+        Checks trips within SCHEDULED_CONFIRM_WINDOW_MINUTES; reopened requests
+        go straight to the matching queue for rounds of replacement offers
         """
         db: Session = SessionLocal()
         
         try:
+            from app.repositories import TripRepository
+            from app.services.trip_service import TripService
+            
+            # Rematches past the cutoff whose rounds were lost in Redis
+            TripService(db, self.notification_service).cancel_unmatched_rematches()
+            
             now = datetime.utcnow()
             confirm_window = timedelta(minutes=settings.SCHEDULED_CONFIRM_WINDOW_MINUTES)
+            trip_repo = TripRepository(db)
             
-            # Find scheduled trips that start soon but driver hasn't confirmed
-            trips = db.query(Trip).join(TripRequest).filter(
-                TripRequest.mode == "SCHEDULED",
-                Trip.status == TripStatus.CONFIRMED,
-                TripRequest.scheduled_start_at.between(
-                    now,
-                    now + confirm_window
-                )
-            ).all()
+            # Find scheduled trips that start soon
+            trips = trip_repo.find_confirmed_scheduled(now, now + confirm_window)
+            if not trips:
+                return
             
-            for trip in trips:
-                driver = trip.driver
-                
-                # Check if driver is online
-                driver_status = redis_client.get_driver_status(driver.id)
-                
-                if driver_status != "ONLINE":
-                    # Driver is offline, try to rematch
-                    print(f"🔄 Auto-rematching trip {trip.id} - driver {driver.id} is offline")
-                    
-                    # Cancel current trip
-                    trip.status = TripStatus.CANCELLED
-                    trip.cancelled_by = "SYSTEM"
-                    trip.cancellation_reason = "Driver unavailable, auto-rematched"
-                    trip.cancelled_at = now
-                    
-                    # Reset trip request to PENDING
-                    trip.trip_request.status = TripRequestStatus.PENDING
-                    trip.trip_request.pre_assigned_driver_id = None
-                    
-                    # Clear availability block
-                    from app.repositories.driver_availability_repository import DriverAvailabilityRepository
-                    availability_repo = DriverAvailabilityRepository(db)
-                    availability_repo.delete_by_trip_request(trip.trip_request_id)
-                    
-                    db.commit()
-                    
-                    # TODO: Trigger new matching process
-                    # This could be done via API call or message queue
+            # Online drivers keep sending location pings; the DB copy covers a Redis reset
+            last_seen = redis_client.get_driver_last_seen(list({driver_id for _, driver_id, _ in trips}))
+            online_since = time.time() - settings.DRIVER_ONLINE_WINDOW_SECONDS
+            offline_trip_ids = [
+                trip_id for trip_id, driver_id, last_location_update in trips
+                if max(
+                    last_seen.get(driver_id) or 0,
+                    last_location_update.timestamp() if last_location_update else 0
+                ) < online_since
+            ]
+            if not offline_trip_ids:
+                return
+            
+            cancelled = trip_repo.cancel_for_rematch(
+                offline_trip_ids,
+                reason="Driver unavailable, auto-rematched"
+            )
+            for driver_id in {driver_id for _, driver_id in cancelled}:
+                principal_cache.invalidate("DRIVER", driver_id)
             
-            print(f"✅ Auto-rematch job completed at {now}")
+            # Wave scheduler hands them to the matching workers within a poll interval
+            trip_request_ids = [trip_request_id for trip_request_id, _ in cancelled]
+            redis_client.schedule_matching_waves(trip_request_ids, wave_number=1, due_at=time.time())
+            
+            print(f"🔄 Auto-rematching {len(trip_request_ids)} scheduled trips with offline drivers")
         
         except Exception as e:
             print(f"❌ Error in auto_rematch_job: {e}")
@@ -200,38 +262,25 @@ class BackgroundWorkers:
     
     def expiry_job(self):
         """
-        Mark expired ON_DEMAND trip requests and release locks
+        Sweep PENDING trip requests past expires_at whose Redis timer never fired
         """
         db: Session = SessionLocal()
         
         try:
-            now = datetime.utcnow()
-            
-            # Find expired trip requests
-            expired_trips = db.query(TripRequest).filter(
-                TripRequest.status == TripRequestStatus.PENDING,
-                TripRequest.expires_at <= now
-            ).all()
+            from app.services.trip_service import TripService
             
-            for trip_request in expired_trips:
-                trip_request.status = TripRequestStatus.EXPIRED
-                
-                # Release Redis lock if exists
-                redis_client.release_trip_lock(trip_request.id)
-                redis_client.clear_pending_offers(trip_request.id)
-                
-                # Notify user
-                user = trip_request.user
-                if user.fcm_token:
-                    self.notification_service.send_trip_expired_notification(
-                        user.fcm_token,
-                        trip_request
-                    )
+            trip_service = TripService(db, self.notification_service)
+            batch_size = settings.TRIP_EXPIRY_BATCH_SIZE
+            total = 0
             
-            db.commit()
+            while True:
+                expired = trip_service.expire_pending_requests(limit=batch_size)
+                total += expired
+                if expired < batch_size:
+                    break
             
-            if expired_trips:
-                print(f"✅ Expired {len(expired_trips)} trip requests")
+            if total:
+                print(f"✅ Expiry sweep expired {total} trip requests")
         
         except Exception as e:
             print(f"❌ Error in expiry_job: {e}")
@@ -242,23 +291,25 @@ class BackgroundWorkers:
     
     def availability_cleanup_job(self):
         """
-        Remove past availability blocks to keep table clean
+        Remove past availability blocks in small paced batches
+        so cleanup never holds long locks or floods WAL during scheduled matching
         """
         db: Session = SessionLocal()
         
         try:
-            from app.models import DriverAvailabilityBlock
+            from app.repositories.driver_availability_repository import DriverAvailabilityRepository
             
-            now = datetime.utcnow()
-            
-            # Delete blocks that ended more than 24 hours ago
-            cutoff = now - timedelta(hours=24)
-            
-            deleted = db.query(DriverAvailabilityBlock).filter(
-                DriverAvailabilityBlock.end_time < cutoff
-            ).delete()
+            availability_repo = DriverAvailabilityRepository(db)
+            cutoff = datetime.utcnow() - timedelta(hours=settings.AVAILABILITY_RETENTION_HOURS)
+            batch_size = settings.AVAILABILITY_CLEANUP_BATCH_SIZE
+            deleted = 0
             
-            db.commit()
+            for _ in range(settings.AVAILABILITY_CLEANUP_MAX_BATCHES):
+                batch_deleted = availability_repo.delete_ended_before(cutoff, limit=batch_size)
+                deleted += batch_deleted
+                if batch_deleted < batch_size:
+                    break
+                time.sleep(settings.AVAILABILITY_CLEANUP_PAUSE_SECONDS)
             
             if deleted > 0:
                 print(f"✅ Cleaned up {deleted} old availability blocks")
@@ -270,6 +321,73 @@ class BackgroundWorkers:
         finally:
             db.close()
 
+    
+    def trip_offer_partition_job(self):
+        """
+        Keep monthly trip_offers partitions created ahead of time and
+        drop (or archive) the ones past TRIP_OFFER_RETENTION_MONTHS
+        """
+        db: Session = SessionLocal()
+        
+        try:
+            from app.repositories.trip_offer_repository import TripOfferRepository
+            
+            offer_repo = TripOfferRepository(db)
+            created = offer_repo.ensure_partitions(settings.TRIP_OFFER_PARTITIONS_AHEAD)
+            
+            removed = offer_repo.drop_partitions_older_than(
+                settings.TRIP_OFFER_RETENTION_MONTHS,
+                archive=settings.TRIP_OFFER_ARCHIVE_PARTITIONS
+            )
+            
+            if created or removed:
+                print(f"✅ trip_offers partitions created: {created}, removed: {removed}")
+        
+        except Exception as e:
+            print(f"❌ Error in trip_offer_partition_job: {e}")
+            db.rollback()
+        
+        finally:
+            db.close()
+    
+    def location_flush_job(self):
+        """
+        Flush buffered driver location pings to Postgres in bulk batches
+        """
+        db: Session = SessionLocal()
+        
+        try:
+            from app.services.location_service import LocationService
+            
+            updated = LocationService(db).flush_buffered_locations()
+            
+            if updated > 0:
+                print(f"✅ Flushed {updated} driver locations")
+        
+        except Exception as e:
+            print(f"❌ Error in location_flush_job: {e}")
+            db.rollback()
+        
+        finally:
+            db.close()
+    
+    def offline_drivers_job(self):
+        """
+        Take drivers without a ping in DRIVER_ONLINE_WINDOW_SECONDS offline:
+        out of Redis drivers:online and this process's geo index (other
+        processes drop them on their next geo index resync)
+        """
+        from app.services.location_service import LocationService
+        
+        try:
+            removed = LocationService.remove_offline_drivers()
+            
+            if removed:
+                print(f"✅ Took {removed} quiet drivers offline")
+        
+        except Exception as e:
+            print(f"❌ Error in offline_drivers_job: {e}")
+
 
 # Singleton instance
 workers = BackgroundWorkers()
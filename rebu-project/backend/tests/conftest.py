@@ -0,0 +1,164 @@
+"""
+Shared fixtures: an API client with auth and DB dependencies overridden,
+an in-memory Redis, a Postgres session and test rows
+"""
+import uuid
+from datetime import datetime, timedelta
+
+import fakeredis
+import fakeredis.aioredis
+import pytest
+from fastapi.testclient import TestClient
+from redis.commands.core import AsyncScript, Script
+from sqlalchemy import delete, text
+
+from app.core import redis_client as redis_module
+from app.core.database import SessionLocal, engine, get_db
+from app.core.security import get_current_principal, get_current_user
+from app.main import app
+from app.models import (
+    Driver, DriverAvailabilityBlock, DriverStatus, Trip, TripMode, TripOffer, TripReminder,
+    TripRequest, TripRequestStatus, User, Vehicle, VehicleType
+)
+
+
+@pytest.fixture
+def client():
+    """Client without the lifespan, so no background services are started"""
+    app.dependency_overrides[get_db] = lambda: None
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def login():
+    """Authenticate requests as the given role and id"""
+    def _login(role: str, principal_id: int = 1, status: str = "ACTIVE", entity=None):
+        principal = {"id": principal_id, "role": role, "status": status}
+        app.dependency_overrides[get_current_principal] = lambda: principal
+        app.dependency_overrides[get_current_user] = lambda: {**principal, "entity": entity}
+    return _login
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Point both Redis singletons at one in-memory server (Lua scripts included)"""
+    server = fakeredis.FakeServer()
+    clients = (
+        (redis_module.redis_client, fakeredis.FakeRedis(server=server, decode_responses=True)),
+        (redis_module.async_redis_client, fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)),
+    )
+    for wrapper, fake in clients:
+        monkeypatch.setattr(wrapper, "client", fake)
+        for name, value in list(vars(wrapper).items()):
+            if isinstance(value, (Script, AsyncScript)):
+                monkeypatch.setattr(wrapper, name, fake.register_script(value.script))
+    return clients[0][1]
+
+
+@pytest.fixture
+def db():
+    """Session on the configured Postgres; skipped when it is not reachable"""
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception as e:
+        pytest.skip(f"Postgres not available: {e}")
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+
+class Records:
+    """Creates rows with valid defaults and deletes them, and what hangs off them, afterwards"""
+
+    def __init__(self, db):
+        self.db = db
+        self.suffix = uuid.uuid4().hex[:12]
+        self.created = {User: [], Driver: [], Vehicle: [], TripRequest: [], Trip: []}
+
+    def _add(self, obj):
+        self.db.add(obj)
+        self.db.commit()
+        self.created[type(obj)].append(obj.id)
+        return obj
+
+    def _tag(self, kind: str) -> str:
+        return f"{kind}-{sum(map(len, self.created.values()))}-{self.suffix}"
+
+    def user(self, **fields):
+        return self._add(User(**{"email": f"{self._tag('user')}@test.local", "full_name": "Test User", **fields}))
+
+    def driver(self, **fields):
+        tag = self._tag("driver")
+        return self._add(Driver(**{
+            "email": f"{tag}@test.local",
+            "phone": f"+{tag}",
+            "password_hash": "x",
+            "full_name": "Test Driver",
+            "license_number": tag,
+            "license_expiry_date": datetime.utcnow() + timedelta(days=365),
+            "status": DriverStatus.ACTIVE,
+            **fields
+        }))
+
+    def vehicle(self, driver, **fields):
+        return self._add(Vehicle(**{
+            "driver_id": driver.id,
+            "vehicle_type": VehicleType.PICKUP,
+            "brand": "Ford", "model": "Ranger", "year": 2020, "color": "White",
+            "license_plate": self._tag("plate"),
+            "max_weight_kg": 1000.0,
+            **fields
+        }))
+
+    def trip_request(self, user, **fields):
+        return self._add(TripRequest(**{
+            "user_id": user.id,
+            "mode": TripMode.ON_DEMAND,
+            "pickup_address": "Origen", "pickup_lat": -34.60, "pickup_lon": -58.38,
+            "dropoff_address": "Destino", "dropoff_lat": -34.62, "dropoff_lon": -58.40,
+            "estimated_fare": 1000.0,
+            "status": TripRequestStatus.PENDING,
+            **fields
+        }))
+
+    def trip(self, trip_request, driver, vehicle, **fields):
+        return self._add(Trip(**{
+            "trip_request_id": trip_request.id,
+            "user_id": trip_request.user_id,
+            "driver_id": driver.id,
+            "vehicle_id": vehicle.id,
+            "pickup_address": trip_request.pickup_address,
+            "pickup_lat": trip_request.pickup_lat, "pickup_lon": trip_request.pickup_lon,
+            "dropoff_address": trip_request.dropoff_address,
+            "dropoff_lat": trip_request.dropoff_lat, "dropoff_lon": trip_request.dropoff_lon,
+            "estimated_fare": trip_request.estimated_fare,
+            "commission_rate": 0.15,
+            **fields
+        }))
+
+    def cleanup(self):
+        self.db.rollback()
+        request_ids = self.created[TripRequest]
+        driver_ids = self.created[Driver]
+        self.db.execute(delete(TripReminder).where(TripReminder.trip_request_id.in_(request_ids)))
+        self.db.execute(delete(DriverAvailabilityBlock).where(DriverAvailabilityBlock.driver_id.in_(driver_ids)))
+        self.db.execute(delete(TripOffer).where(TripOffer.trip_request_id.in_(request_ids)))
+        self.db.execute(delete(Trip).where(Trip.trip_request_id.in_(request_ids)))
+        for model in (TripRequest, Vehicle, Driver, User):
+            self.db.execute(delete(model).where(model.id.in_(self.created[model])))
+        self.db.commit()
+
+
+@pytest.fixture
+def records(db):
+    records = Records(db)
+    try:
+        yield records
+    finally:
+        records.cleanup()
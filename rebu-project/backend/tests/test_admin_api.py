@@ -0,0 +1,42 @@
+"""
+Admin endpoints are mounted under /admin and keep the principal cache in step
+"""
+from types import SimpleNamespace
+
+from app.core.database import get_db
+from app.core.principal_cache import principal_cache
+from app.main import app
+from app.models import DriverStatus
+from app.repositories import DriverRepository
+
+
+class FakeSession:
+    def __init__(self):
+        self.commits = 0
+
+    def commit(self):
+        self.commits += 1
+
+
+def test_approve_driver_evicts_cached_principal(client, login, monkeypatch):
+    driver = SimpleNamespace(id=7, status=DriverStatus.PENDING, is_verified=False)
+    monkeypatch.setattr(DriverRepository, "get_by_id", lambda self, driver_id: driver)
+    session = FakeSession()
+    app.dependency_overrides[get_db] = lambda: session
+    principal_cache.set("DRIVER", 7, {"id": 7, "role": "DRIVER", "status": "PENDING"})
+    login("ADMIN")
+
+    response = client.post("/api/v1/admin/drivers/7/approve")
+
+    assert response.status_code == 200
+    assert driver.status == DriverStatus.ACTIVE and driver.is_verified
+    assert session.commits == 1
+    assert principal_cache.get("DRIVER", 7) is None
+
+
+def test_approve_driver_requires_admin(client, login):
+    login("DRIVER")
+
+    response = client.post("/api/v1/admin/drivers/7/approve")
+
+    assert response.status_code == 403
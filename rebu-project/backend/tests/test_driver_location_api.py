@@ -0,0 +1,35 @@
+"""
+Driver location endpoints are mounted under /drivers and reach the location service
+"""
+from app.services.location_service import LocationService
+
+
+def test_location_batch_reaches_location_service(client, login, monkeypatch):
+    calls = []
+
+    async def record_location_batch(self, driver_id, status, points):
+        calls.append((driver_id, status, points))
+
+    monkeypatch.setattr(LocationService, "record_location_batch", record_location_batch)
+    login("DRIVER", principal_id=42)
+
+    response = client.post("/api/v1/drivers/location/batch", json={"points": [
+        {"lat": -34.60, "lon": -58.38, "recorded_at": "2026-10-17T12:00:00Z"},
+        {"lat": -34.61, "lon": -58.39, "recorded_at": "2026-10-17T12:00:05Z"},
+    ]})
+
+    assert response.status_code == 200
+    assert response.json()["accepted"] == 2
+    assert len(calls) == 1
+    driver_id, status, points = calls[0]
+    assert (driver_id, status, len(points)) == (42, "ACTIVE", 2)
+
+
+def test_location_batch_requires_driver(client, login):
+    login("USER")
+
+    response = client.post("/api/v1/drivers/location/batch", json={"points": [
+        {"lat": 0, "lon": 0, "recorded_at": "2026-10-17T12:00:00Z"},
+    ]})
+
+    assert response.status_code == 403
@@ -0,0 +1,75 @@
+"""
+Expiry timers: popped ids that were not expired go back into Redis
+"""
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+
+from app.core.database import SessionLocal
+from app.core.redis_client import TRIP_EXPIRY_KEY
+from app.models import TripRequest, TripRequestStatus
+from app.services.expiry_scheduler import ExpiryScheduler
+
+
+@pytest.fixture
+def scheduler():
+    return ExpiryScheduler(poll_seconds=0.1, batch_size=10, retry_seconds=5)
+
+
+def timers(fake_redis):
+    return {int(member): score for member, score in fake_redis.zrange(TRIP_EXPIRY_KEY, 0, -1, withscores=True)}
+
+
+@pytest.mark.asyncio
+async def test_still_pending_ids_are_rearmed(fake_redis, scheduler, monkeypatch):
+    monkeypatch.setattr(ExpiryScheduler, "expire", staticmethod(lambda ids: [2]))
+    before = time.time()
+
+    await scheduler.expire_batch([1, 2, 3])
+
+    rearmed = timers(fake_redis)
+    assert list(rearmed) == [2]
+    assert before + 5 <= rearmed[2] <= time.time() + 5
+
+
+@pytest.mark.asyncio
+async def test_failed_update_rearms_the_whole_batch(fake_redis, scheduler, monkeypatch):
+    def expire(ids):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(ExpiryScheduler, "expire", staticmethod(expire))
+
+    await scheduler.expire_batch([1, 2, 3])
+
+    assert sorted(timers(fake_redis)) == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_expired_batch_is_not_rearmed(fake_redis, scheduler, monkeypatch):
+    monkeypatch.setattr(ExpiryScheduler, "expire", staticmethod(lambda ids: []))
+
+    await scheduler.expire_batch([1, 2, 3])
+
+    assert timers(fake_redis) == {}
+
+
+@pytest.fixture
+def trip_request_id(records):
+    expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    return records.trip_request(records.user(), expires_at=expires_at).id
+
+
+def test_locked_request_is_skipped_then_expired(db, fake_redis, trip_request_id):
+    # An accept holding the row lock: SKIP LOCKED leaves it pending
+    accepting = SessionLocal()
+    try:
+        accepting.execute(select(TripRequest.id).where(TripRequest.id == trip_request_id).with_for_update())
+        assert ExpiryScheduler.expire([trip_request_id]) == [trip_request_id]
+    finally:
+        accepting.rollback()
+        accepting.close()
+
+    assert ExpiryScheduler.expire([trip_request_id]) == []
+    assert db.scalar(select(TripRequest.status).where(TripRequest.id == trip_request_id)) == TripRequestStatus.EXPIRED
@@ -0,0 +1,79 @@
+"""
+In-process driver grid: radius search, k-nearest and moves between cells
+"""
+import pytest
+
+from app.core.geo_index import DriverGeoIndex, KM_PER_DEGREE_LAT, haversine_km
+
+ORIGIN = (-34.60, -58.38)
+
+
+def north_of(km: float) -> tuple[float, float]:
+    return ORIGIN[0] + km / KM_PER_DEGREE_LAT, ORIGIN[1]
+
+
+@pytest.fixture
+def index():
+    return DriverGeoIndex(cell_size_km=1.0)
+
+
+def test_radius_search_is_exact_and_nearest_first(index):
+    index.upsert(1, *north_of(0.5))
+    index.upsert(2, *north_of(2.9))
+    index.upsert(3, *north_of(3.1))  # Just outside, in a scanned cell
+    index.upsert(4, *north_of(1.5))
+
+    results = index.get_nearby_drivers(*ORIGIN, radius_km=3)
+
+    assert [r["driver_id"] for r in results] == [1, 4, 2]
+    for r in results:
+        assert r["distance_km"] == pytest.approx(haversine_km(*ORIGIN, *index.get_location(r["driver_id"])))
+
+
+def test_radius_search_honours_count(index):
+    for driver_id, km in enumerate([0.2, 0.4, 0.6, 0.8], start=1):
+        index.upsert(driver_id, *north_of(km))
+
+    assert [r["driver_id"] for r in index.get_nearby_drivers(*ORIGIN, radius_km=5, count=2)] == [1, 2]
+
+
+def test_k_nearest_widens_the_ring(index):
+    index.upsert(1, *north_of(0.3))
+    index.upsert(2, *north_of(6))
+    index.upsert(3, *north_of(9))
+    index.upsert(4, *north_of(30))
+
+    assert [r["driver_id"] for r in index.get_k_nearest(*ORIGIN, k=3, max_radius_km=20)] == [1, 2, 3]
+    # The ring stops at max_radius_km even when fewer than k drivers are found
+    assert [r["driver_id"] for r in index.get_k_nearest(*ORIGIN, k=3, max_radius_km=5)] == [1]
+
+
+def test_moving_between_cells_leaves_no_trace_in_the_old_cell(index):
+    index.upsert(1, *north_of(0.1))
+    index.upsert(1, *north_of(10))
+
+    assert len(index) == 1
+    assert index.get_nearby_drivers(*ORIGIN, radius_km=1) == []
+    assert [r["driver_id"] for r in index.get_nearby_drivers(*north_of(10), radius_km=1)] == [1]
+    assert sum(len(members) for members in index._cells.values()) == 1
+
+
+def test_remove_takes_the_driver_out_of_searches(index):
+    index.upsert(1, *north_of(0.1))
+    index.upsert(2, *north_of(0.2))
+
+    index.remove(1)
+    index.remove(99)  # Unknown drivers are ignored
+
+    assert index.get_location(1) is None
+    assert [r["driver_id"] for r in index.get_nearby_drivers(*ORIGIN, radius_km=1)] == [2]
+
+
+def test_rebuild_replaces_every_position(index):
+    index.upsert(1, *north_of(0.1))
+
+    index.rebuild({2: north_of(0.2)})
+
+    assert index.get_location(1) is None
+    assert [r["driver_id"] for r in index.get_nearby_drivers(*ORIGIN, radius_km=1)] == [2]
+    assert index.last_rebuild_at is not None
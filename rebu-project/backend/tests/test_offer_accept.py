@@ -0,0 +1,206 @@
+"""
+Accepting an offer: the Redis claim, the conditional UPDATE in Postgres,
+the stale/release path and retries of an accept that already went through
+"""
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select
+
+from app.core.redis_client import CLAIM_NO_OFFER, CLAIM_TAKEN, CLAIM_WON, async_redis_client
+from app.models import OfferStatus, TripOffer, TripRequest, TripRequestStatus
+from app.repositories import TripOfferRepository
+from app.services.matching_service import MatchingService
+
+TRIP_REQUEST_ID = 7
+
+
+class FakeSession:
+    """Stands in for the Session: refresh() applies the status Postgres would return"""
+
+    def __init__(self, status_after_refresh=None):
+        self.status_after_refresh = status_after_refresh
+        self.rollbacks = 0
+
+    def refresh(self, obj):
+        if self.status_after_refresh:
+            obj.status = self.status_after_refresh
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class FakeOfferRepository:
+    def __init__(self, offer, accept_result=None, accept_error=None):
+        self.offer = offer
+        self.accept_result = accept_result
+        self.accept_error = accept_error
+        self.accept_calls = 0
+
+    def get_by_id(self, offer_id):
+        return self.offer if offer_id == self.offer.id else None
+
+    def accept_pending(self, offer_id, driver_id):
+        self.accept_calls += 1
+        if self.accept_error:
+            raise self.accept_error
+        return self.accept_result
+
+
+def make_service(offer, session=None, **repo_kwargs):
+    service = MatchingService(session or FakeSession(), notification_service=SimpleNamespace())
+    service.offer_repo = FakeOfferRepository(offer, **repo_kwargs)
+    service.revoked = []
+    service.revoke_losing_offers = service.revoked.append
+    return service
+
+
+def make_offer(driver_id=1, status=OfferStatus.PENDING):
+    return SimpleNamespace(id=100 + driver_id, driver_id=driver_id, trip_request_id=TRIP_REQUEST_ID, status=status)
+
+
+async def pending_drivers():
+    return sorted(await async_redis_client.get_pending_offers(TRIP_REQUEST_ID))
+
+
+# Claim script
+
+@pytest.mark.asyncio
+async def test_claim_picks_one_winner(fake_redis):
+    await async_redis_client.add_pending_offers(TRIP_REQUEST_ID, [1, 2, 3])
+
+    outcome, others = await async_redis_client.claim_trip_offer(TRIP_REQUEST_ID, 1, claim_ttl_seconds=30)
+    assert outcome == CLAIM_WON
+    assert sorted(others) == [2, 3]
+    assert await pending_drivers() == []
+
+    assert await async_redis_client.claim_trip_offer(TRIP_REQUEST_ID, 2, claim_ttl_seconds=30) == (CLAIM_TAKEN, [])
+    # The winner retrying keeps its claim
+    assert await async_redis_client.claim_trip_offer(TRIP_REQUEST_ID, 1, claim_ttl_seconds=30) == (CLAIM_WON, [])
+
+
+@pytest.mark.asyncio
+async def test_claim_without_pending_offer(fake_redis):
+    await async_redis_client.add_pending_offers(TRIP_REQUEST_ID, [1])
+
+    assert await async_redis_client.claim_trip_offer(TRIP_REQUEST_ID, 9, claim_ttl_seconds=30) == (CLAIM_NO_OFFER, [])
+    assert not await async_redis_client.is_trip_claimed(TRIP_REQUEST_ID)
+
+
+@pytest.mark.asyncio
+async def test_release_restores_pending_offers_for_holder_only(fake_redis):
+    await async_redis_client.add_pending_offers(TRIP_REQUEST_ID, [1, 2])
+    await async_redis_client.claim_trip_offer(TRIP_REQUEST_ID, 1, claim_ttl_seconds=30)
+
+    assert not await async_redis_client.release_trip_claim(TRIP_REQUEST_ID, 2, [2])
+    assert await async_redis_client.is_trip_claimed(TRIP_REQUEST_ID)
+
+    assert await async_redis_client.release_trip_claim(TRIP_REQUEST_ID, 1, [2])
+    assert not await async_redis_client.is_trip_claimed(TRIP_REQUEST_ID)
+    assert await pending_drivers() == [2]
+
+
+# MatchingService.accept_offer
+
+@pytest.mark.asyncio
+async def test_accept_wins_and_revokes_the_others(fake_redis):
+    await async_redis_client.add_pending_offers(TRIP_REQUEST_ID, [1, 2])
+    offer = make_offer()
+    service = make_service(offer, accept_result=TRIP_REQUEST_ID)
+
+    assert await service.accept_offer(offer.id, 1) is offer
+    assert service.revoked == [TRIP_REQUEST_ID]
+    assert await async_redis_client.is_trip_claimed(TRIP_REQUEST_ID)
+
+
+@pytest.mark.asyncio
+async def test_stale_offer_releases_the_claim(fake_redis):
+    await async_redis_client.add_pending_offers(TRIP_REQUEST_ID, [1, 2])
+    offer = make_offer()
+    service = make_service(offer, FakeSession(status_after_refresh=OfferStatus.EXPIRED), accept_result=None)
+
+    assert await service.accept_offer(offer.id, 1) is None
+    assert service.revoked == []
+    assert not await async_redis_client.is_trip_claimed(TRIP_REQUEST_ID)
+    # The others can still accept; the stale driver's offer is not restored
+    assert await pending_drivers() == [2]
+
+
+@pytest.mark.asyncio
+async def test_failed_update_rolls_back_and_restores_everyone(fake_redis):
+    await async_redis_client.add_pending_offers(TRIP_REQUEST_ID, [1, 2])
+    offer = make_offer()
+    session = FakeSession()
+    service = make_service(offer, session, accept_error=RuntimeError("db down"))
+
+    with pytest.raises(RuntimeError):
+        await service.accept_offer(offer.id, 1)
+
+    assert session.rollbacks == 1
+    assert not await async_redis_client.is_trip_claimed(TRIP_REQUEST_ID)
+    assert await pending_drivers() == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_retry_of_accepted_offer_returns_it(fake_redis):
+    offer = make_offer(status=OfferStatus.ACCEPTED)
+    service = make_service(offer)
+
+    assert await service.accept_offer(offer.id, 1) is offer
+    assert service.offer_repo.accept_calls == 0
+
+
+@pytest.mark.asyncio
+async def test_retry_racing_its_own_accept_keeps_the_claim(fake_redis):
+    await async_redis_client.add_pending_offers(TRIP_REQUEST_ID, [1, 2])
+    await async_redis_client.claim_trip_offer(TRIP_REQUEST_ID, 1, claim_ttl_seconds=30)
+    # First accept committed between this retry's lookup and its UPDATE
+    offer = make_offer()
+    service = make_service(offer, FakeSession(status_after_refresh=OfferStatus.ACCEPTED), accept_result=None)
+
+    assert await service.accept_offer(offer.id, 1) is offer
+    assert await async_redis_client.is_trip_claimed(TRIP_REQUEST_ID)
+
+
+@pytest.mark.asyncio
+async def test_offer_of_another_driver_is_rejected(fake_redis):
+    offer = make_offer(driver_id=2)
+    service = make_service(offer)
+
+    assert await service.accept_offer(offer.id, 1) is None
+    assert not await async_redis_client.is_trip_claimed(TRIP_REQUEST_ID)
+
+
+# TripOfferRepository.accept_pending against Postgres
+
+@pytest.fixture
+def trip_offers(db, records):
+    drivers = [records.driver() for _ in range(3)]
+    trip_request = records.trip_request(records.user())
+    now = datetime.now(timezone.utc)
+    offers = [
+        TripOffer(trip_request_id=trip_request.id, driver_id=driver.id, offered_fare=1000.0, expires_at=expires_at)
+        for driver, expires_at in zip(drivers, [now + timedelta(minutes=1)] * 2 + [now - timedelta(seconds=1)])
+    ]
+    db.add_all(offers)
+    db.commit()
+    return trip_request, offers
+
+
+def test_accept_pending_matches_once(db, trip_offers):
+    trip_request, (first, second, expired) = trip_offers
+    repo = TripOfferRepository(db)
+
+    assert repo.accept_pending(expired.id, expired.driver_id) is None
+    assert repo.accept_pending(first.id, second.driver_id) is None  # Not this driver's offer
+    assert repo.accept_pending(first.id, first.driver_id) == trip_request.id
+    # The request is no longer pending, so nobody else can match it
+    assert repo.accept_pending(second.id, second.driver_id) is None
+    assert repo.accept_pending(first.id, first.driver_id) is None
+
+    statuses = dict(db.execute(
+        select(TripOffer.id, TripOffer.status).where(TripOffer.trip_request_id == trip_request.id)
+    ).all())
+    assert statuses == {first.id: OfferStatus.ACCEPTED, second.id: OfferStatus.PENDING, expired.id: OfferStatus.PENDING}
+    assert db.scalar(select(TripRequest.status).where(TripRequest.id == trip_request.id)) == TripRequestStatus.MATCHED
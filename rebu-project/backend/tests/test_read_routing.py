@@ -0,0 +1,56 @@
+"""
+Read-only endpoints take their session from get_read_db (replica routing)
+"""
+from types import SimpleNamespace
+
+from app.core.database import get_read_db
+from app.main import app
+from app.services.wallet_service import WalletService
+
+
+class ReadSession:
+    """Stands in for a replica session and answers every count with 3"""
+
+    def query(self, *entities):
+        return self
+
+    def filter(self, *criteria):
+        return self
+
+    def count(self):
+        return 3
+
+
+def test_driver_wallet_reads_from_read_db(client, login, monkeypatch):
+    read_session = ReadSession()
+    sessions = []
+
+    def get_transaction_history(self, driver_id, limit=50, offset=0):
+        sessions.append(self.db)
+        return []
+
+    monkeypatch.setattr(WalletService, "get_transaction_history", get_transaction_history)
+    app.dependency_overrides[get_read_db] = lambda: read_session
+    driver = SimpleNamespace(wallet_balance=10, credit_limit=500, is_within_credit_limit=True)
+    login("DRIVER", principal_id=5, entity=driver)
+
+    response = client.get("/api/v1/drivers/wallet")
+
+    assert response.status_code == 200
+    assert response.json()["balance"] == 10
+    assert sessions == [read_session]
+
+
+def test_admin_dashboard_reads_from_read_db(client, login):
+    app.dependency_overrides[get_read_db] = lambda: ReadSession()
+    login("ADMIN")
+
+    response = client.get("/api/v1/admin/dashboard")
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "total_users": 3,
+        "total_drivers": 3,
+        "total_trips": 3,
+        "completed_trips": 3
+    }
@@ -0,0 +1,217 @@
+"""
+Scheduled trips whose driver goes offline: cancel_for_rematch, offline detection,
+rounds of replacement offers until the cutoff, and the booking made on accept
+Runs against the configured Postgres; skipped when it is not reachable
+"""
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from app.core.redis_client import DRIVER_LOCATION_LAST_TS_KEY, MATCHING_WAVE_NUMBERS_KEY, MATCHING_WAVES_KEY
+from app.models import (
+    DriverAvailabilityBlock, DriverStatus, OfferStatus, Trip, TripMode, TripOffer, TripRequest,
+    TripRequestStatus, TripStatus, Vehicle
+)
+from app.repositories import DriverAvailabilityRepository, TripRepository
+from app.services.matching_service import MatchingService
+from app.services.notification_service import NotificationService
+from app.services.trip_service import TripService
+from app.services.wave_scheduler import WaveScheduler
+from app.workers.background_workers import BackgroundWorkers
+
+# Far from any other test data, so radius searches only see this module's drivers
+PICKUP = {"pickup_lat": 10.0, "pickup_lon": 10.0, "dropoff_lat": 10.01, "dropoff_lon": 10.01}
+
+
+def starting_in(minutes: float) -> dict:
+    start = datetime.now(timezone.utc) + timedelta(minutes=minutes)
+    return {"scheduled_start_at": start, "scheduled_end_at": start + timedelta(hours=1)}
+
+
+@pytest.fixture
+def book(db, records):
+    """A confirmed scheduled trip: request MATCHED, driver BUSY with the window blocked"""
+    def _book(minutes: float, user=None):
+        driver = records.driver(status=DriverStatus.BUSY, last_known_lat=10.0, last_known_lon=10.0)
+        trip_request = records.trip_request(
+            user or records.user(), mode=TripMode.SCHEDULED, status=TripRequestStatus.MATCHED,
+            pre_assigned_driver_id=driver.id, **PICKUP, **starting_in(minutes)
+        )
+        db.add(DriverAvailabilityBlock(
+            driver_id=driver.id, trip_request_id=trip_request.id, reason="SCHEDULED_TRIP",
+            start_time=trip_request.scheduled_start_at, end_time=trip_request.scheduled_end_at
+        ))
+        db.commit()
+        return records.trip(trip_request, driver, records.vehicle(driver), status=TripStatus.CONFIRMED)
+    return _book
+
+
+@pytest.fixture
+def scheduler():
+    return WaveScheduler(rematch_round_seconds=60, rematch_cutoff=timedelta(minutes=10))
+
+
+@pytest.fixture
+def cancelled_notifications(monkeypatch):
+    sent = []
+    monkeypatch.setattr(
+        NotificationService, "send_scheduled_trip_cancelled",
+        lambda self, fcm_token, trip_request_id: sent.append((fcm_token, trip_request_id))
+    )
+    return sent
+
+
+def next_round(fake_redis, trip_request_id):
+    score = fake_redis.zscore(MATCHING_WAVES_KEY, str(trip_request_id))
+    wave = fake_redis.hget(MATCHING_WAVE_NUMBERS_KEY, str(trip_request_id))
+    return (int(wave), score) if score is not None else None
+
+
+def test_cancel_for_rematch_reopens_request_and_frees_driver(db, book):
+    trip = book(20)
+
+    assert TripRepository(db).cancel_for_rematch([trip.id], reason="test") == [(trip.trip_request_id, trip.driver_id)]
+    assert TripRepository(db).cancel_for_rematch([trip.id], reason="test") == []
+
+    db.expire_all()
+    assert trip.status == TripStatus.CANCELLED
+    assert (trip.trip_request.status, trip.trip_request.pre_assigned_driver_id) == (TripRequestStatus.PENDING, None)
+    assert trip.driver.status == DriverStatus.ACTIVE
+    assert not db.scalar(select(DriverAvailabilityBlock.id).where(
+        DriverAvailabilityBlock.trip_request_id == trip.trip_request_id
+    ))
+
+
+def test_auto_rematch_takes_only_offline_drivers(db, fake_redis, book):
+    online = book(20)
+    offline = book(20)
+    fake_redis.hset(DRIVER_LOCATION_LAST_TS_KEY, str(online.driver_id), time.time())
+
+    BackgroundWorkers().auto_rematch_job()
+
+    db.expire_all()
+    assert online.status == TripStatus.CONFIRMED
+    assert offline.status == TripStatus.CANCELLED
+    assert next_round(fake_redis, online.trip_request_id) is None
+    wave, due_at = next_round(fake_redis, offline.trip_request_id)
+    assert wave == 1 and due_at <= time.time()
+
+
+@pytest.mark.asyncio
+async def test_rematch_rounds_offer_replacements_until_matched(db, records, fake_redis, book, scheduler, monkeypatch):
+    trip = book(25)
+    replacement = records.driver(last_known_lat=10.0, last_known_lon=10.0)
+    TripRepository(db).cancel_for_rematch([trip.id], reason="test")
+    offered = []
+
+    async def send_offers_to_drivers(self, trip_request, drivers):
+        offered.append([driver.id for driver in drivers])
+
+    monkeypatch.setattr(MatchingService, "send_offers_to_drivers", send_offers_to_drivers)
+
+    # Past max_wave: scheduled rounds are not capped by the on-demand wave count
+    await scheduler.run_wave(trip.trip_request_id, 5)
+
+    # The driver that went offline is not offered the trip again
+    assert offered == [[replacement.id]]
+    wave, due_at = next_round(fake_redis, trip.trip_request_id)
+    assert wave == 6 and due_at == pytest.approx(time.time() + 60, abs=5)
+
+
+@pytest.mark.asyncio
+async def test_last_round_lands_on_the_cutoff(db, fake_redis, book, scheduler):
+    trip = book(10.5)
+    TripRepository(db).cancel_for_rematch([trip.id], reason="test")
+
+    await scheduler.run_wave(trip.trip_request_id, 1)
+
+    _, due_at = next_round(fake_redis, trip.trip_request_id)
+    cutoff = trip.trip_request.scheduled_start_at - timedelta(minutes=10)
+    assert due_at == pytest.approx(cutoff.timestamp(), abs=1)
+
+
+@pytest.mark.asyncio
+async def test_rematch_past_cutoff_is_cancelled(db, records, fake_redis, book, scheduler, cancelled_notifications):
+    trip = book(5, user=records.user(fcm_token=f"user-{records.suffix}"))
+    TripRepository(db).cancel_for_rematch([trip.id], reason="test")
+
+    await scheduler.run_wave(trip.trip_request_id, 3)
+
+    db.expire_all()
+    assert trip.trip_request.status == TripRequestStatus.CANCELLED
+    assert cancelled_notifications == [(f"user-{records.suffix}", trip.trip_request_id)]
+    assert next_round(fake_redis, trip.trip_request_id) is None
+
+
+def test_sweep_cancels_only_rematches_past_cutoff(db, records, fake_redis, book, cancelled_notifications):
+    late = book(5)
+    early = book(25)
+    never_matched = records.trip_request(records.user(), mode=TripMode.SCHEDULED, **PICKUP, **starting_in(5))
+    TripRepository(db).cancel_for_rematch([late.id, early.id], reason="test")
+
+    TripService(db).cancel_unmatched_rematches()
+
+    statuses = dict(db.execute(select(TripRequest.id, TripRequest.status).where(
+        TripRequest.id.in_([late.trip_request_id, early.trip_request_id, never_matched.id])
+    )).all())
+    assert statuses == {
+        late.trip_request_id: TripRequestStatus.CANCELLED,
+        early.trip_request_id: TripRequestStatus.PENDING,
+        never_matched.id: TripRequestStatus.PENDING,
+    }
+
+
+@pytest.fixture
+def placeholder_vehicle(db):
+    # create_trip_from_request still assigns vehicle 1
+    if not db.get(Vehicle, 1):
+        pytest.skip("create_trip_from_request needs vehicle 1")
+
+
+def accepted(db, records, driver, minutes):
+    """A scheduled request as accept_pending leaves it: MATCHED, with the driver's offer ACCEPTED"""
+    trip_request = records.trip_request(
+        records.user(), mode=TripMode.SCHEDULED, status=TripRequestStatus.MATCHED, **PICKUP, **starting_in(minutes)
+    )
+    db.add(TripOffer(
+        trip_request_id=trip_request.id, driver_id=driver.id, offered_fare=1000.0, status=OfferStatus.ACCEPTED,
+        expires_at=datetime.now(timezone.utc) + timedelta(minutes=1)
+    ))
+    db.commit()
+    return trip_request
+
+
+def test_scheduled_accept_books_the_driver(db, records, fake_redis, placeholder_vehicle):
+    driver = records.driver()
+    trip_request = accepted(db, records, driver, 120)
+
+    trip = TripService(db).create_trip_from_request(trip_request.id, driver.id)
+
+    block = db.scalar(select(DriverAvailabilityBlock).where(DriverAvailabilityBlock.trip_request_id == trip_request.id))
+    assert (block.driver_id, block.start_time, block.end_time) == (
+        driver.id, trip_request.scheduled_start_at, trip_request.scheduled_end_at
+    )
+    # A retried accept returns the same trip without booking twice
+    assert TripService(db).create_trip_from_request(trip_request.id, driver.id).id == trip.id
+
+
+def test_overlapping_booking_reopens_the_request(db, records, fake_redis, placeholder_vehicle, monkeypatch):
+    driver = records.driver()
+    trip_request = accepted(db, records, driver, 120)
+
+    def create(self, **kwargs):
+        # What ex_driver_availability_blocks_no_overlap raises for an overlapping block
+        raise IntegrityError("INSERT INTO driver_availability_blocks", {}, Exception("no_overlap"))
+
+    monkeypatch.setattr(DriverAvailabilityRepository, "create", create)
+
+    with pytest.raises(ValueError):
+        TripService(db).create_trip_from_request(trip_request.id, driver.id)
+
+    db.expire_all()
+    assert trip_request.status == TripRequestStatus.PENDING
+    assert db.scalar(select(Trip.id).where(Trip.trip_request_id == trip_request.id)) is None
+    assert db.scalar(select(TripOffer.status).where(TripOffer.trip_request_id == trip_request.id)) == OfferStatus.REJECTED
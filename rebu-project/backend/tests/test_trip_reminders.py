@@ -0,0 +1,80 @@
+"""
+Scheduled trip reminders are claimed once per offset and sent with the trip's id and addresses
+Runs against the configured Postgres; skipped when it is not reachable
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models import TripMode, TripRequestStatus
+from app.repositories import TripReminderRepository
+from app.workers.background_workers import BackgroundWorkers
+
+OFFSETS = [60, 15]
+GRACE_MINUTES = 10
+
+
+class RecordingNotifications:
+    def __init__(self):
+        self.sent = []
+
+    def send_trip_reminder(self, fcm_token, trip_id, dropoff_address, minutes_before):
+        self.sent.append(("driver", fcm_token, trip_id, dropoff_address, minutes_before))
+
+    def send_trip_reminder_to_user(self, fcm_token, trip_id, pickup_address, minutes_before):
+        self.sent.append(("user", fcm_token, trip_id, pickup_address, minutes_before))
+
+
+@pytest.fixture
+def trip(records):
+    """Matched scheduled trip starting in 14 minutes: only the 15-minute reminder is due"""
+    driver = records.driver(fcm_token=f"driver-{records.suffix}")
+    trip_request = records.trip_request(
+        records.user(fcm_token=f"user-{records.suffix}"),
+        mode=TripMode.SCHEDULED,
+        status=TripRequestStatus.MATCHED,
+        scheduled_start_at=datetime.now(timezone.utc) + timedelta(minutes=14),
+        scheduled_end_at=datetime.now(timezone.utc) + timedelta(minutes=74)
+    )
+    return records.trip(trip_request, driver, records.vehicle(driver))
+
+
+def own(rows, trip):
+    return [row for row in rows if row.trip_id == trip.id]
+
+
+def test_claim_due_returns_each_reminder_once(db, records, trip):
+    repo = TripReminderRepository(db)
+
+    rows = own(repo.claim_due(OFFSETS, grace_minutes=GRACE_MINUTES), trip)
+
+    assert len(rows) == 1
+    row = rows[0]
+    assert (row.trip_request_id, row.offset_minutes) == (trip.trip_request_id, 15)
+    assert (row.pickup_address, row.dropoff_address) == (trip.pickup_address, trip.dropoff_address)
+    assert (row.driver_fcm_token, row.user_fcm_token) == (f"driver-{records.suffix}", f"user-{records.suffix}")
+    assert own(repo.claim_due(OFFSETS, grace_minutes=GRACE_MINUTES), trip) == []
+    assert repo.get_sent_offsets(trip.trip_request_id) == [15]
+
+
+def test_uncommitted_claim_is_claimed_again_after_rollback(db, trip):
+    repo = TripReminderRepository(db)
+
+    assert len(own(repo.claim_due(OFFSETS, grace_minutes=GRACE_MINUTES, commit=False), trip)) == 1
+    db.rollback()
+
+    assert len(own(repo.claim_due(OFFSETS, grace_minutes=GRACE_MINUTES), trip)) == 1
+
+
+def test_reminder_job_sends_trip_id_and_addresses(records, trip):
+    workers = BackgroundWorkers()
+    workers.notification_service = RecordingNotifications()
+
+    workers.reminder_job()
+    workers.reminder_job()
+
+    sent = [message for message in workers.notification_service.sent if message[2] == trip.id]
+    assert sorted(sent) == [
+        ("driver", f"driver-{records.suffix}", trip.id, trip.dropoff_address, 15),
+        ("user", f"user-{records.suffix}", trip.id, trip.pickup_address, 15),
+    ]
@@ -0,0 +1,84 @@
+"""
+On-demand requests are refused with 503 whenever matching cannot take them
+"""
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.matching_queue import MatchingQueueFull, matching_queue
+from app.services.trip_service import TripService
+
+REQUEST = {
+    "pickup": {"address": "Origen", "lat": -34.60, "lon": -58.38},
+    "dropoff": {"address": "Destino", "lat": -34.62, "lon": -58.40},
+    "estimated_fare": 1500,
+}
+
+
+def _stored_request():
+    return SimpleNamespace(
+        id=11, user_id=1, mode="ON_DEMAND", status="PENDING",
+        pickup_address="Origen", pickup_lat=-34.60, pickup_lon=-58.38,
+        dropoff_address="Destino", dropoff_lat=-34.62, dropoff_lon=-58.40,
+        estimated_fare=1500.0, estimated_distance_km=None, estimated_duration_minutes=None,
+        scheduled_start_at=None, scheduled_end_at=None, pre_assigned_driver_id=None,
+        created_at=datetime(2026, 1, 1), expires_at=None
+    )
+
+
+@pytest.fixture
+def cancelled(monkeypatch):
+    """Stub request creation; collects the ids of requests cancelled by the endpoint"""
+    cancelled = []
+    monkeypatch.setattr(TripService, "create_on_demand_trip", lambda self, **kwargs: SimpleNamespace(id=11))
+    monkeypatch.setattr(
+        TripService, "cancel_pending_request", lambda self, trip_request: cancelled.append(trip_request.id)
+    )
+    return cancelled
+
+
+def test_queue_full_returns_503(client, login, monkeypatch, cancelled):
+    async def enqueue(trip_request_id, wave_number=1):
+        raise MatchingQueueFull()
+
+    monkeypatch.setattr(matching_queue, "enqueue", enqueue)
+    login("USER")
+
+    response = client.post("/api/v1/trips/request/on-demand", json=REQUEST)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+    assert cancelled == [11]
+
+
+def test_redis_outage_returns_503(client, login, monkeypatch, cancelled):
+    async def enqueue(trip_request_id, wave_number=1):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(matching_queue, "enqueue", enqueue)
+    login("USER")
+
+    response = client.post("/api/v1/trips/request/on-demand", json=REQUEST)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+    assert cancelled == [11]
+
+
+def test_queued_request_is_returned(client, login, monkeypatch, cancelled):
+    enqueued = []
+
+    async def enqueue(trip_request_id, wave_number=1):
+        enqueued.append((trip_request_id, wave_number))
+
+    monkeypatch.setattr(matching_queue, "enqueue", enqueue)
+    monkeypatch.setattr(TripService, "create_on_demand_trip", lambda self, **kwargs: _stored_request())
+    login("USER")
+
+    response = client.post("/api/v1/trips/request/on-demand", json=REQUEST)
+
+    assert response.status_code == 200
+    assert response.json()["id"] == 11
+    assert enqueued == [(11, 1)]
+    assert cancelled == []
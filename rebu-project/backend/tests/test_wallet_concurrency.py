@@ -0,0 +1,102 @@
+"""
+Concurrent wallet operations on one driver keep the balance equal to the ledger
+Runs against the configured Postgres; skipped when it is not reachable
+"""
+import threading
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import delete, select, text
+
+from app.core.database import SessionLocal, engine
+from app.models import Driver, DriverStatus, WalletTransaction
+from app.services.wallet_service import WalletService
+
+THREADS = 8
+OPERATIONS_PER_THREAD = 25
+PAYMENT = Decimal("0.10")
+PENALTY = Decimal("0.30")
+
+
+@pytest.fixture
+def driver_id():
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception as e:
+        pytest.skip(f"Postgres not available: {e}")
+
+    suffix = uuid.uuid4().hex[:12]
+    db = SessionLocal()
+    driver = Driver(
+        email=f"wallet-{suffix}@test.local",
+        phone=f"+wallet-{suffix}",
+        password_hash="x",
+        full_name="Wallet Test",
+        license_number=f"WALLET-{suffix}",
+        license_expiry_date=datetime.utcnow() + timedelta(days=365),
+        status=DriverStatus.ACTIVE,
+        wallet_balance=Decimal("0.00")
+    )
+    db.add(driver)
+    db.commit()
+    try:
+        yield driver.id
+    finally:
+        db.execute(delete(WalletTransaction).where(WalletTransaction.driver_id == driver.id))
+        db.execute(delete(Driver).where(Driver.id == driver.id))
+        db.commit()
+        db.close()
+
+
+def test_concurrent_payments_and_penalties_match_ledger(driver_id):
+    errors = []
+    start = threading.Barrier(THREADS)
+
+    def operate(worker: int):
+        db = SessionLocal()
+        wallet_service = WalletService(db)
+        try:
+            start.wait()
+            for i in range(OPERATIONS_PER_THREAD):
+                if i % 2:
+                    wallet_service.add_payment(driver_id, PAYMENT, reference=f"stress-{worker}-{i}")
+                else:
+                    wallet_service.add_penalty(driver_id, PENALTY, description="stress")
+        except Exception as e:
+            errors.append(e)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=operate, args=(worker,)) for worker in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+
+    db = SessionLocal()
+    try:
+        balance = db.scalar(select(Driver.wallet_balance).where(Driver.id == driver_id))
+        ledger = db.execute(
+            select(WalletTransaction.amount, WalletTransaction.balance_after)
+            .where(WalletTransaction.driver_id == driver_id)
+            .order_by(WalletTransaction.id)
+        ).all()
+    finally:
+        db.close()
+
+    payments = OPERATIONS_PER_THREAD // 2
+    penalties = OPERATIONS_PER_THREAD - payments
+    assert len(ledger) == THREADS * OPERATIONS_PER_THREAD
+    assert balance == sum(amount for amount, _ in ledger)
+    assert balance == THREADS * (payments * PAYMENT - penalties * PENALTY)
+
+    # Entries were applied one at a time: each balance_after builds on the previous one
+    running = Decimal("0.00")
+    for amount, balance_after in ledger:
+        running += amount
+        assert balance_after == running